@@ -5,10 +5,15 @@ import tempfile
 import time
 
 from utils.document_loaders import DocumentLoader
-from utils.preprocessor import DocumentPreprocessor
-from utils.vector_store import VectorStore
+from utils.preprocessor import DocumentPreprocessor, CHUNKING_STRATEGIES
+from utils.vector_store import VectorStore, BACKENDS
+from utils.incremental import IncrementalIndexer
+from utils.pdf_backends import PDF_BACKENDS
 from utils.retriever import Retriever
 from utils.generator import Generator
+from utils.embeddings import EmbeddingGenerator
+from utils.index_version import IndexVersion
+from components.resources import get_embeddings_model, get_retriever, get_answer_cache, invalidate_index, COMPRESSION_TEMPERATURE
 
 # Load environment variables
 load_dotenv()
@@ -721,11 +726,10 @@ local_css()
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
-if "retriever" not in st.session_state:
-    st.session_state.retriever = None
-
-if "vector_store" not in st.session_state:
-    st.session_state.vector_store = None
+# Index this session has processed; the vector store, keyword index and
+# retriever themselves are shared resources (see components/resources.py)
+if "active_index" not in st.session_state:
+    st.session_state.active_index = None
 
 if "processing" not in st.session_state:
     st.session_state.processing = False
@@ -757,6 +761,11 @@ with st.sidebar:
     if embedding_model_type == "bge":
         embedding_model_name = "BAAI/bge-small-en-v1.5"
     
+    # Load and warm up the embeddings model once per process, so the first
+    # query doesn't pay for it
+    model_metrics = get_embeddings_model(embedding_model_type, embedding_model_name)
+    st.caption(f"Model loaded in {model_metrics['load_seconds']:.1f}s (warm-up {model_metrics['warmup_seconds']:.2f}s)")
+    
     st.subheader("LLM Model")
     llm_model = st.selectbox(
         "Select model",
@@ -767,19 +776,76 @@ with st.sidebar:
     
     # Vector store settings
     st.markdown('<div class="sidebar-header">Vector Store</div>', unsafe_allow_html=True)
-    index_name = st.text_input("Index Name", "personal-knowledge-assistant", help="Name of your Pinecone vector index")
+    vector_backend = st.selectbox(
+        "Backend",
+        options=BACKENDS,
+        index=0,
+        help="Store vectors in Pinecone or in a local embedded index (no network round-trips)"
+    )
+    index_name = st.text_input("Index Name", "personal-knowledge-assistant", help="Name of your vector index")
     recreate_index = st.checkbox("Recreate Index", False, help="Delete and recreate the index even if it exists")
     
     # Chunking settings
     st.markdown('<div class="sidebar-header">Document Processing</div>', unsafe_allow_html=True)
     st.subheader("Chunking")
-    chunk_size = st.slider("Chunk Size", 256, 1024, 512, 64, help="Size of each document chunk in characters")
+    chunk_size = st.slider("Chunk Size", 128, 512, 512, 32, help="Size of each document chunk in tokens, up to the embedding model's 512-token window")
     chunk_overlap = st.slider("Chunk Overlap", 0, 256, 50, 8, help="Overlap between consecutive chunks")
+    chunking = st.selectbox(
+        "Chunking Strategy",
+        options=CHUNKING_STRATEGIES,
+        index=0,
+        help="Cut fixed token windows, or follow Markdown headings, PDF pages and paragraphs"
+    )
+    semantic_merge = st.checkbox(
+        "Merge Sentences by Meaning",
+        False,
+        disabled=chunking != "structure",
+        help="Start a new chunk where adjacent sentences change topic (embeds every sentence while indexing)"
+    )
+    semantic_threshold = st.slider(
+        "Topic Similarity Threshold",
+        0.0, 1.0, 0.5, 0.05,
+        disabled=not semantic_merge or chunking != "structure",
+        help="Minimum similarity between adjacent sentences kept in one chunk"
+    )
+    pdf_backend = st.selectbox(
+        "PDF Extraction",
+        options=list(PDF_BACKENDS),
+        index=0,
+        help="pypdf is pure Python; pdfium reads the text layer natively and is much faster on long PDFs"
+    )
+    split_pdfs = st.checkbox("Split Large PDFs", False, help="Extract the pages of large PDFs in parallel across all CPU cores")
+    file_timeout = st.slider("File Timeout (s)", 10, 600, 300, 10, help="Skip files whose text takes longer than this to extract")
     
     # Retrieval settings
     st.subheader("Retrieval")
     num_results = st.slider("Number of Results", 1, 10, 5, 1, help="Number of document chunks to retrieve per query")
     use_compression = st.checkbox("Use Context Compression", False, help="Enable to filter and compress retrieved chunks")
+    compression_mode = st.selectbox(
+        "Compression Mode",
+        options=["extractive", "llm"],
+        index=0,
+        help="Extractive keeps the sentences closest to the question using the local embeddings model; LLM asks Gemini to extract the relevant parts of each chunk",
+        disabled=not use_compression
+    )
+    use_diversity = st.checkbox("Diversify Results", False, help="Prefer chunks that add new information (maximal marginal relevance) and limit chunks per file")
+    mmr_lambda = st.slider("Relevance vs. Diversity", 0.0, 1.0, 0.5, 0.05, help="1 ranks by relevance only, 0 by diversity only", disabled=not use_diversity)
+    max_per_source = st.slider("Max Chunks per File", 1, 10, 3, 1, help="Maximum number of chunks taken from a single file", disabled=not use_diversity)
+    use_rerank = st.checkbox("Rerank Results", False, help="Over-fetch candidates and keep the best ones by cross-encoder score")
+    rerank_budget_ms = st.slider("Rerank Budget (ms)", 50, 2000, 300, 50, help="Retrieval latency after which reranking stops", disabled=not use_rerank)
+    
+    # Answer cache settings
+    st.subheader("Answer Cache")
+    use_answer_cache = st.checkbox("Cache Answers", True, help="Reuse answers to repeated or near-duplicate questions over the same documents")
+    cache_threshold = st.slider("Similarity Threshold", 0.80, 1.00, 0.95, 0.01, help="Minimum similarity between questions to reuse an answer")
+    cache_ttl_minutes = st.slider("Cache TTL (minutes)", 1, 1440, 60, 1, help="How long a cached answer stays valid")
+    query_cache_stats = EmbeddingGenerator.get_query_cache_stats().get(embedding_model_name)
+    result_cache_stats = Retriever.get_result_cache_stats()
+    if query_cache_stats and query_cache_stats["hits"] + query_cache_stats["misses"]:
+        st.caption(
+            f"Query embedding cache {query_cache_stats['hit_rate']:.0%} hits · "
+            f"search result cache {result_cache_stats['hit_rate']:.0%} hits"
+        )
     
     # File upload section
     st.markdown('<div class="sidebar-header">Document Upload</div>', unsafe_allow_html=True)
@@ -807,53 +873,44 @@ with st.sidebar:
                     # Process the documents with step-by-step progress
                     progress_bar = st.progress(0)
                     
-                    # Step 1: Load documents
-                    st.info("Step 1/4: Loading documents...")
-                    documents = DocumentLoader.load_from_directory(temp_dir)
-                    st.success(f"✅ Loaded {len(documents)} documents")
-                    progress_bar.progress(25)
-                    
-                    # Step 2: Preprocess and chunk
-                    st.info("Step 2/4: Preprocessing and chunking...")
-                    chunked_documents = DocumentPreprocessor.chunk_documents(
-                        documents, 
-                        chunk_size=chunk_size, 
-                        chunk_overlap=chunk_overlap
-                    )
-                    st.success(f"✅ Created {len(chunked_documents)} chunks")
-                    progress_bar.progress(50)
-                    
-                    # Step 3: Delete existing index if requested
+                    # Sync the uploads with the index, embedding only new or changed files
                     if recreate_index:
-                        st.info("Step 3/4: Recreating vector index...")
-                        VectorStore.delete_index(index_name)
-                        st.success("✅ Deleted existing index")
+                        st.info("Recreating vector index and embedding documents...")
                     else:
-                        st.info("Step 3/4: Setting up vector store...")
-                    progress_bar.progress(75)
-                    
-                    # Step 4: Create vector store
-                    st.info("Step 4/4: Creating vector embeddings...")
-                    vector_store = VectorStore.create_vector_store(
-                        chunked_documents,
+                        st.info("Embedding new and changed documents...")
+                    progress_bar.progress(25)
+                    status = st.empty()
+                    vector_store, stats = IncrementalIndexer.sync_directory(
+                        temp_dir,
                         embedding_model_type=embedding_model_type,
                         embedding_model_name=embedding_model_name,
-                        index_name=index_name
+                        index_name=index_name,
+                        chunk_size=chunk_size,
+                        chunk_overlap=chunk_overlap,
+                        workers=(os.cpu_count() or 1) if split_pdfs else min(len(uploaded_files), os.cpu_count() or 1),
+                        rebuild=recreate_index,
+                        on_progress=status.text,
+                        backend=vector_backend,
+                        chunking=chunking,
+                        semantic_threshold=semantic_threshold if semantic_merge and chunking == "structure" else None,
+                        pdf_backend=pdf_backend,
+                        pdf_pages_per_task=32 if split_pdfs else None,
+                        file_timeout=file_timeout
                     )
-                    
-                    # Store in session state
-                    st.session_state.vector_store = vector_store
-                    
-                    # Create the retriever
-                    retriever = Retriever.build_hybrid_retriever(
-                        vector_store,
-                        k=num_results,
-                        use_compression=use_compression,
-                        llm_model_name=llm_model
+                    status.empty()
+                    for file_path, error in stats["failures"].items():
+                        st.warning(f"⚠️ Could not load {os.path.basename(file_path)}: {error}")
+                    st.success(
+                        f"✅ {stats['added']} new, {stats['modified']} modified, "
+                        f"{stats['removed']} removed, {stats['unchanged']} unchanged documents "
+                        f"({stats['chunks_written']} chunks embedded)"
                     )
+                    progress_bar.progress(75)
                     
-                    # Store the retriever in session state
-                    st.session_state.retriever = retriever
+                    # Reopen the shared index handles on the next rerun and
+                    # remember which index this session queries
+                    invalidate_index()
+                    st.session_state.active_index = {"index_name": index_name, "backend": vector_backend}
                     
                     progress_bar.progress(100)
                     st.success("✅ Documents processed successfully!")
@@ -904,7 +961,7 @@ with col2:
     ''', unsafe_allow_html=True)
     
     # Display introduction if no vector store
-    if not st.session_state.vector_store:
+    if not st.session_state.active_index:
         st.markdown("""
         <div style="text-align: center; padding: 2rem; background-color: #141d2f; border-radius: 10px; box-shadow: 0 10px 30px rgba(0, 0, 0, 0.3); border: 1px solid rgba(0, 255, 170, 0.2);">
             <div style="font-size: 64px; margin-bottom: 1rem; text-shadow: 0 0 10px rgba(0, 255, 170, 0.7), 0 0 20px rgba(0, 255, 170, 0.3);">🧠</div>
@@ -941,6 +998,14 @@ with col2:
                     st.markdown(f'<div class="user-message">{message["content"]}</div>', unsafe_allow_html=True)
                 else:
                     st.markdown(f'<div class="assistant-message">{message["content"]}</div>', unsafe_allow_html=True)
+                    if "latency" in message:
+                        latency = message["latency"]
+                        st.caption(
+                            f"First token {latency['first_token_seconds']:.2f}s · "
+                            f"total {latency['total_seconds']:.2f}s "
+                            f"(retrieval {latency['retrieval_seconds']:.2f}s)"
+                            + (" · cached" if latency.get("cache_hit") else "")
+                        )
         st.markdown('</div>', unsafe_allow_html=True)
         
         # Auto-scroll to bottom of chat (JavaScript)
@@ -977,45 +1042,105 @@ with col2:
         if st.session_state.waiting_for_answer and st.session_state.messages and st.session_state.messages[-1]["role"] == "user":
             user_query = st.session_state.messages[-1]["content"]
             
-            # Display typing indicator
-            with st.spinner(""):
-                st.markdown(
-                    """
-                    <div class="assistant-message" style="width: auto; padding: 10px;">
-                        <div class="typing-indicator">
-                            <span></span>
-                            <span></span>
-                            <span></span>
-                        </div>
+            # Display typing indicator until the first chunk arrives
+            answer_placeholder = st.empty()
+            answer_placeholder.markdown(
+                """
+                <div class="assistant-message" style="width: auto; padding: 10px;">
+                    <div class="typing-indicator">
+                        <span></span>
+                        <span></span>
+                        <span></span>
                     </div>
-                    """, 
-                    unsafe_allow_html=True
+                </div>
+                """, 
+                unsafe_allow_html=True
+            )
+            
+            try:
+                start = time.perf_counter()
+                active_index = st.session_state.active_index
+                index_version = IndexVersion.get(active_index["index_name"], active_index["backend"])
+                
+                # Shared retriever, rebuilt only when the retrieval settings change
+                retriever = get_retriever(
+                    embedding_model_type,
+                    embedding_model_name,
+                    active_index["index_name"],
+                    active_index["backend"],
+                    k=num_results,
+                    use_compression=use_compression,
+                    llm_model_name=llm_model,
+                    compression_mode=compression_mode,
+                    rerank=use_rerank,
+                    rerank_budget_ms=rerank_budget_ms,
+                    diversify=use_diversity,
+                    mmr_lambda=mmr_lambda,
+                    max_per_source=max_per_source,
+                    index_version=index_version
                 )
                 
-                try:
-                    # Retrieve relevant documents
-                    docs = Retriever.retrieve_documents(
-                        user_query,
-                        st.session_state.retriever
+                # Retrieve relevant documents, reusing the results of the same
+                # query against the same index version and settings
+                docs = Retriever.retrieve_documents(
+                    user_query,
+                    retriever,
+                    cache_key=(
+                        active_index["backend"],
+                        active_index["index_name"],
+                        index_version,
+                        num_results,
+                        use_compression and compression_mode,
+                        use_compression and compression_mode == "llm" and (llm_model, COMPRESSION_TEMPERATURE),
+                        use_rerank and rerank_budget_ms,
+                        use_diversity and (mmr_lambda, max_per_source)
                     )
-                    
-                    # Generate answer
-                    answer = Generator.generate_answer(
-                        user_query,
-                        docs,
-                        model_name=llm_model
-                    )
-                    
-                    # Add assistant message to chat
-                    st.session_state.messages.append({"role": "assistant", "content": answer})
-                    
-                except Exception as e:
-                    error_message = f"Error: {str(e)}"
-                    st.session_state.messages.append({"role": "assistant", "content": error_message})
+                )
+                retrieval_seconds = time.perf_counter() - start
                 
-                # Reset waiting flag
-                st.session_state.waiting_for_answer = False
-                st.rerun()
+                # Answer repeated questions over the same chunks from the cache
+                answer_cache, query_embedding = None, None
+                if use_answer_cache:
+                    answer_cache = get_answer_cache(cache_threshold, cache_ttl_minutes * 60.0, index_version=index_version)
+                    query_embedding = EmbeddingGenerator.get_embeddings_model(
+                        model_type=embedding_model_type,
+                        model_name=embedding_model_name
+                    ).embed_query(user_query)
+                
+                # Render the answer as it is generated
+                answer = ""
+                metrics = {}
+                for chunk in Generator.stream_answer(
+                    user_query,
+                    docs,
+                    model_name=llm_model,
+                    metrics=metrics,
+                    answer_cache=answer_cache,
+                    query_embedding=query_embedding,
+                    index_version=index_version
+                ):
+                    answer += chunk
+                    answer_placeholder.markdown(f'<div class="assistant-message">{answer}▌</div>', unsafe_allow_html=True)
+                
+                # Add assistant message to chat, with latencies measured from the question
+                st.session_state.messages.append({
+                    "role": "assistant",
+                    "content": answer,
+                    "latency": {
+                        "retrieval_seconds": retrieval_seconds,
+                        "first_token_seconds": retrieval_seconds + metrics["first_token_seconds"],
+                        "total_seconds": retrieval_seconds + metrics["total_seconds"],
+                        "cache_hit": metrics["cache_hit"],
+                    }
+                })
+                
+            except Exception as e:
+                error_message = f"Error: {str(e)}"
+                st.session_state.messages.append({"role": "assistant", "content": error_message})
+            
+            # Reset waiting flag
+            st.session_state.waiting_for_answer = False
+            st.rerun()
         
         # Add a clear chat button
         if st.session_state.messages:
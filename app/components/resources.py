@@ -0,0 +1,194 @@
+"""
+Process-wide resources shared by every Streamlit session.
+
+Functions decorated with `st.cache_resource` run once per distinct set of
+arguments and hand the same object to every session and rerun, so a second
+user doesn't load the embeddings model again and moving a retrieval slider
+only rebuilds the (cheap) retriever. Index handles are keyed on the
+index's version token (see `IndexVersion`), which callers read on every
+run, so any ingest, including one from the command line, reopens the index
+and its keyword index on the next rerun. `invalidate_index` additionally
+frees the old handles after an in-app ingest.
+"""
+from typing import Dict, Any, Optional
+
+import streamlit as st
+
+from utils.vector_store import VectorStore
+from utils.retriever import Retriever
+from utils.generator import Generator
+from utils.embeddings import EmbeddingGenerator
+from utils.answer_cache import SemanticAnswerCache
+
+# Temperature of the LLM that compresses retrieved chunks
+COMPRESSION_TEMPERATURE = 0.0
+
+@st.cache_resource(show_spinner="Loading embeddings model...")
+def get_embeddings_model(embedding_model_type: str = "bge", embedding_model_name: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Load and warm up the embeddings model once per process.
+
+    Args:
+        embedding_model_type: Type of embeddings model.
+        embedding_model_name: Name of the embeddings model.
+
+    Returns:
+        Load-time metrics of the model.
+    """
+    return EmbeddingGenerator.warm_up(embedding_model_type, embedding_model_name)
+
+@st.cache_resource(show_spinner=False)
+def get_llm(model_name: str = "gemini-1.5-pro", temperature: float = 0.0):
+    """
+    Get a shared LLM client (its HTTP connections are reused across sessions).
+
+    Args:
+        model_name: Name of the Gemini model.
+        temperature: Temperature for generation.
+
+    Returns:
+        LLM instance.
+    """
+    return Generator.get_llm(model_name, temperature)
+
+@st.cache_resource(show_spinner="Opening vector index...", max_entries=4)
+def get_vector_store(
+    embedding_model_type: str = "bge",
+    embedding_model_name: Optional[str] = None,
+    index_name: str = "personal-knowledge-assistant",
+    backend: str = "pinecone",
+    index_version: Optional[str] = None
+):
+    """
+    Get a shared handle to an existing vector store.
+
+    Args:
+        embedding_model_type: Type of embeddings model.
+        embedding_model_name: Name of the embeddings model.
+        index_name: Name of the index.
+        backend: Vector store backend ("pinecone" or "local").
+        index_version: Current version token of the index, so handles opened
+            before the last ingest are never reused.
+
+    Returns:
+        Vector store.
+    """
+    return VectorStore.get_vector_store(
+        embedding_model_type=embedding_model_type,
+        embedding_model_name=embedding_model_name,
+        index_name=index_name,
+        backend=backend
+    )
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def get_keyword_index(
+    index_name: str = "personal-knowledge-assistant",
+    backend: str = "pinecone",
+    index_version: Optional[str] = None
+):
+    """
+    Get the shared BM25 keyword index of a vector index.
+
+    Args:
+        index_name: Name of the index.
+        backend: Vector store backend ("pinecone" or "local").
+        index_version: Current version token of the index, so handles opened
+            before the last ingest are never reused.
+
+    Returns:
+        BM25 index.
+    """
+    return VectorStore.load_keyword_index(index_name, backend)
+
+@st.cache_resource(show_spinner=False, max_entries=16)
+def get_retriever(
+    embedding_model_type: str = "bge",
+    embedding_model_name: Optional[str] = None,
+    index_name: str = "personal-knowledge-assistant",
+    backend: str = "pinecone",
+    k: int = 5,
+    use_compression: bool = False,
+    llm_model_name: str = "gemini-1.5-pro",
+    compression_mode: str = "extractive",
+    rerank: bool = False,
+    rerank_budget_ms: int = 300,
+    diversify: bool = False,
+    mmr_lambda: float = 0.5,
+    max_per_source: Optional[int] = None,
+    index_version: Optional[str] = None
+):
+    """
+    Get a retriever over the shared vector store and keyword index.
+
+    Only this resource is rebuilt when the retrieval settings change; the
+    vector store, keyword index and LLM client are reused.
+
+    Args:
+        embedding_model_type: Type of embeddings model.
+        embedding_model_name: Name of the embeddings model.
+        index_name: Name of the index.
+        backend: Vector store backend ("pinecone" or "local").
+        k: Number of documents to retrieve.
+        use_compression: Whether to use contextual compression.
+        llm_model_name: Name of the LLM to use for compression.
+        compression_mode: "extractive" (local, no LLM calls) or "llm".
+        rerank: Whether to rerank candidates with a cross-encoder.
+        rerank_budget_ms: Retrieval latency budget after which reranking stops.
+        diversify: Whether to select candidates with maximal marginal relevance.
+        mmr_lambda: MMR trade-off between relevance (1) and diversity (0).
+        max_per_source: Maximum number of chunks per source when diversifying.
+        index_version: Current version token of the index, so handles opened
+            before the last ingest are never reused.
+
+    Returns:
+        Retriever.
+    """
+    return Retriever.build_hybrid_retriever(
+        get_vector_store(embedding_model_type, embedding_model_name, index_name, backend, index_version),
+        k=k,
+        use_compression=use_compression,
+        llm_model_name=llm_model_name,
+        keyword_index=get_keyword_index(index_name, backend, index_version),
+        compression_mode=compression_mode,
+        llm=get_llm(llm_model_name, COMPRESSION_TEMPERATURE) if use_compression and compression_mode == "llm" else None,
+        # Query-time sentences stay out of the persistent chunk embedding cache
+        compression_embeddings=EmbeddingGenerator.get_embeddings_model(
+            model_type=embedding_model_type,
+            model_name=embedding_model_name,
+            use_cache=False
+        ) if use_compression and compression_mode == "extractive" else None,
+        rerank=rerank,
+        rerank_budget_seconds=rerank_budget_ms / 1000,
+        diversify=diversify,
+        mmr_lambda=mmr_lambda,
+        max_per_source=max_per_source
+    )
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def get_answer_cache(
+    similarity_threshold: float = 0.95,
+    ttl_seconds: float = 3600.0,
+    max_entries: int = 256,
+    index_version: Optional[str] = None
+) -> SemanticAnswerCache:
+    """
+    Get the answer cache shared by every session.
+
+    Args:
+        similarity_threshold: Minimum cosine similarity between query embeddings.
+        ttl_seconds: Time after which an entry expires.
+        max_entries: Maximum number of cached answers.
+        index_version: Current version token of the index, so answers over
+            an older version of the index are never served.
+
+    Returns:
+        Semantic answer cache.
+    """
+    return SemanticAnswerCache(similarity_threshold, ttl_seconds, max_entries)
+
+def invalidate_index():
+    """Drop the cached index handles, retrievers and search results after the index changed."""
+    get_vector_store.clear()
+    get_keyword_index.clear()
+    get_retriever.clear()
+    Retriever.invalidate_results()
@@ -1,22 +1,66 @@
 import os
+import time
 import argparse
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from dotenv import load_dotenv
 
 from utils.document_loaders import DocumentLoader
-from utils.preprocessor import DocumentPreprocessor
-from utils.vector_store import VectorStore
+from utils.pdf_backends import PDF_BACKENDS
+from utils.preprocessor import DocumentPreprocessor, CHUNKING_STRATEGIES
+from utils.vector_store import VectorStore, BACKENDS
+from utils.incremental import IncrementalIndexer
+from utils.embeddings import EmbeddingGenerator
+from utils.dedup import NearDuplicateFilter
 
 # Load environment variables
 load_dotenv()
 
+def semantic_merge_options(
+    embedding_model_type: str,
+    embedding_model_name: Optional[str],
+    semantic_threshold: Optional[float]
+) -> Dict[str, Any]:
+    """
+    Chunking options of the semantic sentence merge.
+    
+    Sentences are embedded without the on-disk cache, which holds chunk
+    embeddings only.
+    
+    Args:
+        embedding_model_type: Type of embeddings model.
+        embedding_model_name: Name of the embeddings model.
+        semantic_threshold: Minimum similarity of adjacent sentences (None disables the merge).
+        
+    Returns:
+        Keyword arguments for `DocumentPreprocessor.chunk_documents`.
+    """
+    if semantic_threshold is None:
+        return {}
+    
+    return {
+        "embeddings": EmbeddingGenerator.get_embeddings_model(
+            model_type=embedding_model_type,
+            model_name=embedding_model_name,
+            use_cache=False
+        ),
+        "similarity_threshold": semantic_threshold,
+    }
+
 def ingest_documents(
     data_dir: str,
     embedding_model_type: str = "bge",
     embedding_model_name: str = None,
     index_name: str = "personal-knowledge-assistant",
     chunk_size: int = 512,
-    chunk_overlap: int = 50
+    chunk_overlap: int = 50,
+    workers: int = 1,
+    backend: str = "pinecone",
+    chunking: str = "token",
+    semantic_threshold: Optional[float] = None,
+    dedup_threshold: Optional[float] = None,
+    pdf_backend: str = "pypdf",
+    pdf_pages_per_task: Optional[int] = None,
+    file_timeout: Optional[float] = None
 ):
     """
     Ingest documents into the vector store.
@@ -25,49 +69,363 @@ def ingest_documents(
         data_dir: Directory containing documents.
         embedding_model_type: Type of embeddings model.
         embedding_model_name: Name of the embeddings model.
-        index_name: Name of the Pinecone index.
+        index_name: Name of the index.
         chunk_size: Size of each chunk in tokens.
         chunk_overlap: Number of tokens to overlap between chunks.
+        workers: Number of worker processes for loading and chunking files (0 = one per CPU core).
+        backend: Vector store backend ("pinecone" or "local").
+        chunking: Chunking strategy ("token" or "structure").
+        semantic_threshold: With "structure", merge sentences while adjacent
+            ones are at least this similar (None disables the semantic merge).
+        dedup_threshold: Drop chunks whose word 5-gram Jaccard similarity to an
+            earlier chunk reaches this value (None disables deduplication).
+        pdf_backend: PDF text extraction backend (see PDF_BACKENDS).
+        pdf_pages_per_task: Split PDFs into tasks of this many pages so the
+            workers share large files (None loads each file in one task).
+        file_timeout: Seconds after which extracting a file, across all its
+            page ranges, is abandoned and the file reported as failed.
     """
     print(f"Loading documents from {data_dir}...")
-    documents = DocumentLoader.load_from_directory(data_dir)
+    failures = {}
+    documents = DocumentLoader.load_from_directory(
+        data_dir,
+        workers=workers,
+        failures=failures,
+        structured=chunking == "structure",
+        pdf_backend=pdf_backend,
+        timeout=file_timeout,
+        pages_per_task=pdf_pages_per_task
+    )
     print(f"Loaded {len(documents)} documents.")
+    for file_path, error in failures.items():
+        print(f"Failed to load {file_path}: {error}")
     
     print("Preprocessing and chunking documents...")
     chunked_documents = DocumentPreprocessor.chunk_documents(
         documents, 
         chunk_size=chunk_size, 
-        chunk_overlap=chunk_overlap
+        chunk_overlap=chunk_overlap,
+        tokenizer_name=embedding_model_name,
+        workers=workers,
+        strategy=chunking,
+        **semantic_merge_options(embedding_model_type, embedding_model_name, semantic_threshold)
     )
     print(f"Created {len(chunked_documents)} chunks.")
     
+    dedup_filter = None
+    if dedup_threshold is not None:
+        dedup_filter = NearDuplicateFilter(threshold=dedup_threshold)
+        chunked_documents = dedup_filter.deduplicate(chunked_documents)
+    
     print(f"Creating vector store with {embedding_model_type} embeddings...")
+    start = time.perf_counter()
     vector_store = VectorStore.create_vector_store(
         chunked_documents,
         embedding_model_type=embedding_model_type,
         embedding_model_name=embedding_model_name,
-        index_name=index_name
+        index_name=index_name,
+        backend=backend
     )
     print(f"Vector store created with index name: {index_name}")
     
+    if dedup_filter is not None:
+        print_dedup_report(dedup_filter, time.perf_counter() - start)
+    
     return vector_store
 
+def ingest_documents_streaming(
+    data_dir: str,
+    embedding_model_type: str = "bge",
+    embedding_model_name: str = None,
+    index_name: str = "personal-knowledge-assistant",
+    chunk_size: int = 512,
+    chunk_overlap: int = 50,
+    workers: int = 1,
+    batch_size: int = 100,
+    backend: str = "pinecone",
+    upsert_concurrency: int = 4,
+    chunking: str = "token",
+    semantic_threshold: Optional[float] = None,
+    dedup_threshold: Optional[float] = None,
+    pdf_backend: str = "pypdf",
+    pdf_pages_per_task: Optional[int] = None,
+    file_timeout: Optional[float] = None
+):
+    """
+    Ingest documents into the vector store as a stream.
+    
+    Loading, chunking and upserting are chained as generators, so memory
+    stays bounded by the batch size rather than the corpus size.
+    
+    Args:
+        data_dir: Directory containing documents.
+        embedding_model_type: Type of embeddings model.
+        embedding_model_name: Name of the embeddings model.
+        index_name: Name of the index.
+        chunk_size: Size of each chunk in tokens.
+        chunk_overlap: Number of tokens to overlap between chunks.
+        workers: Number of worker processes for loading and chunking files (0 = one per CPU core).
+        batch_size: Number of chunks embedded and upserted at once.
+        backend: Vector store backend ("pinecone" or "local").
+        upsert_concurrency: Maximum number of Pinecone upserts in flight.
+        chunking: Chunking strategy ("token" or "structure").
+        semantic_threshold: With "structure", merge sentences while adjacent
+            ones are at least this similar (None disables the semantic merge).
+        dedup_threshold: Drop chunks whose word 5-gram Jaccard similarity to an
+            earlier chunk reaches this value (None disables deduplication).
+        pdf_backend: PDF text extraction backend (see PDF_BACKENDS).
+        pdf_pages_per_task: Split PDFs into tasks of this many pages so the
+            workers share large files (None loads each file in one task).
+        file_timeout: Seconds after which extracting a file, across all its
+            page ranges, is abandoned and the file reported as failed.
+    """
+    print(f"Streaming documents from {data_dir} into index {index_name}...")
+    failures = {}
+    documents = DocumentLoader.iter_from_directory(
+        data_dir,
+        workers=workers,
+        failures=failures,
+        structured=chunking == "structure",
+        pdf_backend=pdf_backend,
+        timeout=file_timeout,
+        pages_per_task=pdf_pages_per_task
+    )
+    chunks = DocumentPreprocessor.iter_chunks(
+        documents,
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        tokenizer_name=embedding_model_name,
+        workers=workers,
+        strategy=chunking,
+        **semantic_merge_options(embedding_model_type, embedding_model_name, semantic_threshold)
+    )
+    
+    # Canonical chunks are written before later copies are seen, so only
+    # the batch path can merge the sources of duplicates into them
+    dedup_filter = None
+    if dedup_threshold is not None:
+        dedup_filter = NearDuplicateFilter(threshold=dedup_threshold)
+        chunks = dedup_filter.iter_unique(chunks)
+    
+    start = time.perf_counter()
+    vector_store = VectorStore.create_vector_store_streaming(
+        chunks,
+        embedding_model_type=embedding_model_type,
+        embedding_model_name=embedding_model_name,
+        index_name=index_name,
+        batch_size=batch_size,
+        on_batch=lambda total: print(f"Upserted {total} chunks..."),
+        backend=backend,
+        upsert_concurrency=upsert_concurrency
+    )
+    for file_path, error in failures.items():
+        print(f"Failed to load {file_path}: {error}")
+    print(f"Vector store created with index name: {index_name}")
+    
+    if dedup_filter is not None:
+        print_dedup_report(dedup_filter, time.perf_counter() - start)
+    
+    return vector_store
+
+def ingest_documents_incremental(
+    data_dir: str,
+    embedding_model_type: str = "bge",
+    embedding_model_name: str = None,
+    index_name: str = "personal-knowledge-assistant",
+    chunk_size: int = 512,
+    chunk_overlap: int = 50,
+    workers: int = 1,
+    batch_size: int = 100,
+    rebuild: bool = False,
+    backend: str = "pinecone",
+    upsert_concurrency: int = 4,
+    chunking: str = "token",
+    semantic_threshold: Optional[float] = None,
+    pdf_backend: str = "pypdf",
+    pdf_pages_per_task: Optional[int] = None,
+    file_timeout: Optional[float] = None
+):
+    """
+    Sync the vector store with a directory, re-embedding only changed files.
+    
+    Args:
+        data_dir: Directory containing documents.
+        embedding_model_type: Type of embeddings model.
+        embedding_model_name: Name of the embeddings model.
+        index_name: Name of the index.
+        chunk_size: Size of each chunk in tokens.
+        chunk_overlap: Number of tokens to overlap between chunks.
+        workers: Number of worker processes for loading files (0 = one per CPU core).
+        batch_size: Number of chunks embedded and upserted at once.
+        rebuild: Whether to delete the index and re-ingest everything.
+        backend: Vector store backend ("pinecone" or "local").
+        upsert_concurrency: Maximum number of Pinecone upserts in flight.
+        chunking: Chunking strategy ("token" or "structure").
+        semantic_threshold: With "structure", merge sentences while adjacent
+            ones are at least this similar (None disables the semantic merge).
+        pdf_backend: PDF text extraction backend (see PDF_BACKENDS).
+        pdf_pages_per_task: Split PDFs into tasks of this many pages so the
+            workers share large files (None loads each file in one task).
+        file_timeout: Seconds after which extracting a file, across all its
+            page ranges, is abandoned and the file reported as failed.
+    """
+    print(f"Syncing {data_dir} with index {index_name}...")
+    vector_store, stats = IncrementalIndexer.sync_directory(
+        data_dir,
+        embedding_model_type=embedding_model_type,
+        embedding_model_name=embedding_model_name,
+        index_name=index_name,
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        workers=workers,
+        batch_size=batch_size,
+        rebuild=rebuild,
+        on_progress=print,
+        backend=backend,
+        upsert_concurrency=upsert_concurrency,
+        chunking=chunking,
+        semantic_threshold=semantic_threshold,
+        pdf_backend=pdf_backend,
+        pdf_pages_per_task=pdf_pages_per_task,
+        file_timeout=file_timeout
+    )
+    for file_path, error in stats["failures"].items():
+        print(f"Failed to load {file_path}: {error}")
+    throughput = stats["chunks_written"] / stats["upsert_seconds"] if stats["upsert_seconds"] else 0.0
+    print(
+        f"Sync complete: {stats['chunks_written']} chunks written "
+        f"({throughput:.0f} vectors/sec), {stats['chunks_deleted']} chunks deleted."
+    )
+    
+    return vector_store
+
+def print_dedup_report(dedup_filter: NearDuplicateFilter, seconds: float):
+    """
+    Print how many chunks deduplication dropped and the time it saved.
+    
+    The saving is estimated from the average time spent embedding and
+    writing each kept chunk.
+    
+    Args:
+        dedup_filter: Filter the chunks went through.
+        seconds: Time spent embedding and writing the kept chunks.
+    """
+    report = dedup_filter.report()
+    seconds_per_chunk = seconds / report["kept"] if report["kept"] else 0.0
+    print(
+        f"Deduplication dropped {report['duplicates']} of {report['chunks']} chunks "
+        f"({report['dropped_fraction']:.1%}, {report['exact_duplicates']} exact copies), "
+        f"saving ~{report['duplicates'] * seconds_per_chunk:.1f}s of embedding and upserts."
+    )
+
+def print_embedding_cache_stats():
+    """Print hit/miss statistics of the embedding caches used during ingestion."""
+    for cache_dir, stats in EmbeddingGenerator.get_cache_stats().items():
+        print(
+            f"Embedding cache {cache_dir}: {stats['hits']} hits, {stats['misses']} misses "
+            f"({stats['hit_rate']:.1%} hit rate), {stats['entries']}/{stats['capacity']} entries, "
+            f"{stats['evictions']} evictions"
+        )
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Ingest documents into a vector store.")
     parser.add_argument("--data-dir", type=str, required=True, help="Directory containing documents")
     parser.add_argument("--embedding-model-type", type=str, default="bge", choices=["bge", "huggingface"], help="Type of embeddings model")
     parser.add_argument("--embedding-model-name", type=str, default=None, help="Name of the embeddings model")
-    parser.add_argument("--index-name", type=str, default="personal-knowledge-assistant", help="Name of the Pinecone index")
+    parser.add_argument("--index-name", type=str, default="personal-knowledge-assistant", help="Name of the vector index")
+    parser.add_argument("--backend", type=str, default="pinecone", choices=BACKENDS, help="Vector store backend (Pinecone service or local embedded index)")
     parser.add_argument("--chunk-size", type=int, default=512, help="Size of each chunk in tokens")
     parser.add_argument("--chunk-overlap", type=int, default=50, help="Number of tokens to overlap between chunks")
+    parser.add_argument("--chunking", type=str, default="token", choices=CHUNKING_STRATEGIES, help="Chunk into fixed token windows or along headings, pages and paragraphs")
+    parser.add_argument("--dedup", action="store_true", help="Drop near-duplicate chunks (e.g. copies and versions of the same file) before embedding")
+    parser.add_argument("--dedup-threshold", type=float, default=0.85, help="Word 5-gram Jaccard similarity at or above which --dedup treats two chunks as duplicates")
+    parser.add_argument("--semantic-threshold", type=float, default=None, help="With --chunking structure, merge sentences while adjacent ones are at least this similar")
+    parser.add_argument("--workers", type=int, default=1, help="Number of processes for parsing and chunking files (0 = one per CPU core)")
+    parser.add_argument("--pdf-backend", type=str, default="pypdf", choices=list(PDF_BACKENDS), help="PDF text extraction backend (pdfium is much faster on long PDFs)")
+    parser.add_argument("--pdf-pages-per-task", type=int, default=None, help="Split PDFs into tasks of this many pages so --workers share large files")
+    parser.add_argument("--file-timeout", type=float, default=None, help="Seconds after which extracting a file is abandoned and the file reported as failed")
+    
+    parser.add_argument("--stream", action="store_true", help="Stream documents through loading, chunking and upserting in bounded batches")
+    parser.add_argument("--batch-size", type=int, default=100, help="Number of chunks embedded and upserted per batch in streaming and incremental modes")
+    
+    parser.add_argument("--upsert-concurrency", type=int, default=4, help="Maximum number of concurrent Pinecone upsert requests in streaming and incremental modes")
+    parser.add_argument("--ann-index", action="store_true", help="Build an approximate nearest neighbour (IVF-PQ) index after ingesting (local backend only)")
+    parser.add_argument("--nprobe", type=int, default=16, help="Default number of inverted lists scanned per query by the ANN index")
+    parser.add_argument("--incremental", action="store_true", help="Only re-embed new or modified files and delete vectors of removed files")
+    parser.add_argument("--rebuild", action="store_true", help="With --incremental, delete the index and re-ingest everything")
     
     args = parser.parse_args()
     
-    ingest_documents(
-        data_dir=args.data_dir,
-        embedding_model_type=args.embedding_model_type,
-        embedding_model_name=args.embedding_model_name,
-        index_name=args.index_name,
-        chunk_size=args.chunk_size,
-        chunk_overlap=args.chunk_overlap
-    ) 
\ No newline at end of file
+    if args.ann_index and args.backend != "local":
+        parser.error("--ann-index requires --backend local")
+    if args.semantic_threshold is not None and args.chunking != "structure":
+        parser.error("--semantic-threshold requires --chunking structure")
+    # Incremental syncs delete vectors per file, so chunks shared between
+    # files would need reference counting
+    if args.dedup and args.incremental:
+        parser.error("--dedup is not supported with --incremental")
+    if args.pdf_pages_per_task is not None and args.pdf_pages_per_task < 1:
+        parser.error("--pdf-pages-per-task must be at least 1")
+    
+    if args.incremental:
+        vector_store = ingest_documents_incremental(
+            data_dir=args.data_dir,
+            embedding_model_type=args.embedding_model_type,
+            embedding_model_name=args.embedding_model_name,
+            index_name=args.index_name,
+            chunk_size=args.chunk_size,
+            chunk_overlap=args.chunk_overlap,
+            workers=args.workers,
+            batch_size=args.batch_size,
+            rebuild=args.rebuild,
+            backend=args.backend,
+            upsert_concurrency=args.upsert_concurrency,
+            chunking=args.chunking,
+            semantic_threshold=args.semantic_threshold,
+            pdf_backend=args.pdf_backend,
+            pdf_pages_per_task=args.pdf_pages_per_task,
+            file_timeout=args.file_timeout
+        )
+    elif args.stream:
+        vector_store = ingest_documents_streaming(
+            data_dir=args.data_dir,
+            embedding_model_type=args.embedding_model_type,
+            embedding_model_name=args.embedding_model_name,
+            index_name=args.index_name,
+            chunk_size=args.chunk_size,
+            chunk_overlap=args.chunk_overlap,
+            workers=args.workers,
+            batch_size=args.batch_size,
+            backend=args.backend,
+            upsert_concurrency=args.upsert_concurrency,
+            chunking=args.chunking,
+            semantic_threshold=args.semantic_threshold,
+            dedup_threshold=args.dedup_threshold if args.dedup else None,
+            pdf_backend=args.pdf_backend,
+            pdf_pages_per_task=args.pdf_pages_per_task,
+            file_timeout=args.file_timeout
+        )
+    else:
+        vector_store = ingest_documents(
+            data_dir=args.data_dir,
+            embedding_model_type=args.embedding_model_type,
+            embedding_model_name=args.embedding_model_name,
+            index_name=args.index_name,
+            chunk_size=args.chunk_size,
+            chunk_overlap=args.chunk_overlap,
+            workers=args.workers,
+            backend=args.backend,
+            chunking=args.chunking,
+            semantic_threshold=args.semantic_threshold,
+            dedup_threshold=args.dedup_threshold if args.dedup else None,
+            pdf_backend=args.pdf_backend,
+            pdf_pages_per_task=args.pdf_pages_per_task,
+            file_timeout=args.file_timeout
+        )
+    
+    print_embedding_cache_stats()
+    
+    if args.ann_index:
+        print("Building ANN index...")
+        ann_index = vector_store.build_ann_index(nprobe=args.nprobe)
+        print(f"ANN index built with {ann_index.nlist} lists over {ann_index.ntotal} vectors.")
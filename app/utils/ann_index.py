@@ -0,0 +1,282 @@
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+def _squared_distances(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Squared L2 distances between each vector and each centroid."""
+    return (
+        np.einsum("ij,ij->i", vectors, vectors)[:, None]
+        - 2 * vectors @ centroids.T
+        + np.einsum("ij,ij->i", centroids, centroids)[None, :]
+    )
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray, block_size: int = 65536) -> np.ndarray:
+    """Index of the nearest centroid for each vector, computed in blocks."""
+    assignments = np.empty(len(vectors), dtype=np.int64)
+
+    for start in range(0, len(vectors), block_size):
+        block = vectors[start:start + block_size]
+        assignments[start:start + block_size] = np.argmin(_squared_distances(block, centroids), axis=1)
+
+    return assignments
+
+def kmeans(vectors: np.ndarray, n_clusters: int, n_iter: int = 20, seed: int = 0) -> np.ndarray:
+    """
+    Lloyd's k-means with random initialization.
+
+    Args:
+        vectors: Training vectors (n x d).
+        n_clusters: Number of centroids.
+        n_iter: Number of iterations.
+        seed: Random seed.
+
+    Returns:
+        Centroids (n_clusters x d).
+    """
+    rng = np.random.default_rng(seed)
+    n_clusters = min(n_clusters, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+
+    for _ in range(n_iter):
+        assignments = _assign(vectors, centroids)
+        counts = np.bincount(assignments, minlength=n_clusters)
+
+        # Sum the members of each cluster with one sorted reduction
+        order = np.argsort(assignments, kind="stable")
+        clusters, starts = np.unique(assignments[order], return_index=True)
+        sums = np.zeros_like(centroids)
+        sums[clusters] = np.add.reduceat(vectors[order], starts, axis=0)
+
+        # Re-seed empty clusters with random vectors
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        if empty.any():
+            centroids[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+
+    return centroids
+
+class IVFPQIndex:
+    """
+    Inverted-file index with product quantization (IVF-PQ).
+
+    A coarse k-means quantizer splits the vectors into `nlist` inverted lists.
+    Inside each list, the residual of each vector to its centroid is encoded
+    as `m` one-byte codes (one per sub-space). A query only scans the
+    `nprobe` closest lists and scores their codes with per-query lookup
+    tables, trading a little recall for a large cut in latency. Vectors are
+    expected to be L2-normalized, so L2 order equals cosine order.
+    """
+
+    def __init__(self, dimension: int, nlist: int = 1024, m: int = 48, nprobe: int = 16):
+        """
+        Initialize an untrained index.
+
+        Args:
+            dimension: Vector dimension (must be divisible by m).
+            nlist: Number of inverted lists (coarse centroids).
+            m: Number of PQ sub-quantizers (bytes per encoded vector).
+            nprobe: Default number of lists scanned per query.
+        """
+        if dimension % m != 0:
+            raise ValueError(f"Dimension {dimension} is not divisible by m={m}")
+
+        self.dimension = dimension
+        self.nlist = nlist
+        self.m = m
+        self.ksub = 256
+        self.nprobe = nprobe
+        self.coarse_centroids = None
+        self.codebooks = None
+        self.list_ids: List[List[np.ndarray]] = []
+        self.list_codes: List[List[np.ndarray]] = []
+
+    @property
+    def is_trained(self) -> bool:
+        """Whether the quantizers have been trained."""
+        return self.coarse_centroids is not None
+
+    @property
+    def ntotal(self) -> int:
+        """Number of encoded vectors."""
+        return sum(len(ids) for parts in self.list_ids for ids in parts)
+
+    def train(
+        self,
+        vectors: np.ndarray,
+        max_training_points: int = 100_000,
+        max_pq_training_points: int = 65_536,
+        n_iter: int = 20,
+        seed: int = 0
+    ):
+        """
+        Train the coarse quantizer and the PQ codebooks.
+
+        Args:
+            vectors: Training vectors (a sample of the data is enough).
+            max_training_points: Maximum number of vectors used for the coarse quantizer.
+            max_pq_training_points: Maximum number of residuals used for the codebooks.
+            n_iter: Number of k-means iterations.
+            seed: Random seed.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        rng = np.random.default_rng(seed)
+
+        if len(vectors) > max_training_points:
+            vectors = vectors[rng.choice(len(vectors), max_training_points, replace=False)]
+
+        self.nlist = min(self.nlist, len(vectors))
+        self.coarse_centroids = kmeans(vectors, self.nlist, n_iter=n_iter, seed=seed)
+
+        # Train one codebook per sub-space on the residuals
+        residuals = vectors - self.coarse_centroids[_assign(vectors, self.coarse_centroids)]
+        if len(residuals) > max_pq_training_points:
+            residuals = residuals[rng.choice(len(residuals), max_pq_training_points, replace=False)]
+        dsub = self.dimension // self.m
+        self.codebooks = np.stack([
+            kmeans(residuals[:, j * dsub:(j + 1) * dsub], self.ksub, n_iter=n_iter, seed=seed + j)
+            for j in range(self.m)
+        ])
+
+        self.list_ids = [[] for _ in range(self.nlist)]
+        self.list_codes = [[] for _ in range(self.nlist)]
+
+    def _encode(self, residuals: np.ndarray) -> np.ndarray:
+        """Encode residuals as m one-byte codes each."""
+        dsub = self.dimension // self.m
+        codes = np.empty((len(residuals), self.m), dtype=np.uint8)
+
+        for j in range(self.m):
+            codes[:, j] = _assign(residuals[:, j * dsub:(j + 1) * dsub], self.codebooks[j])
+
+        return codes
+
+    def add(self, vectors: np.ndarray, ids: np.ndarray):
+        """
+        Encode and add vectors; can be called repeatedly after training.
+
+        Args:
+            vectors: Vectors to add (n x d).
+            ids: Integer IDs (e.g. row numbers) returned by searches.
+        """
+        if not self.is_trained:
+            raise ValueError("Index must be trained before adding vectors")
+
+        vectors = np.asarray(vectors, dtype=np.float32)
+        ids = np.asarray(ids, dtype=np.int64)
+        assignments = _assign(vectors, self.coarse_centroids)
+        codes = self._encode(vectors - self.coarse_centroids[assignments])
+
+        order = np.argsort(assignments, kind="stable")
+        lists, starts = np.unique(assignments[order], return_index=True)
+        ends = np.append(starts[1:], len(order))
+
+        for list_no, start, end in zip(lists, starts, ends):
+            members = order[start:end]
+            self.list_ids[list_no].append(ids[members])
+            self.list_codes[list_no].append(codes[members])
+
+    def _list(self, list_no: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Get (ids, codes) of a list, merging incremental parts."""
+        if len(self.list_ids[list_no]) > 1:
+            self.list_ids[list_no] = [np.concatenate(self.list_ids[list_no])]
+            self.list_codes[list_no] = [np.concatenate(self.list_codes[list_no])]
+
+        if not self.list_ids[list_no]:
+            return np.zeros(0, dtype=np.int64), np.zeros((0, self.m), dtype=np.uint8)
+
+        return self.list_ids[list_no][0], self.list_codes[list_no][0]
+
+    def search(self, query: np.ndarray, k: int, nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Approximate k-nearest-neighbour search.
+
+        Args:
+            query: Query vector.
+            k: Number of results.
+            nprobe: Number of lists to scan (defaults to the index setting).
+
+        Returns:
+            Tuple of (ids, approximate squared L2 distances), closest first.
+        """
+        query = np.asarray(query, dtype=np.float32)
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        dsub = self.dimension // self.m
+
+        coarse = _squared_distances(query[None, :], self.coarse_centroids)[0]
+        probes = np.argpartition(coarse, nprobe - 1)[:nprobe]
+
+        # Lookup tables of squared distances from each probed residual to every
+        # sub-centroid, expanded as |r|^2 - 2 r.c + |c|^2 and computed for all
+        # probes with one batched matmul (nprobe x m x ksub)
+        residuals = (query[None, :] - self.coarse_centroids[probes]).reshape(nprobe, self.m, dsub)
+        dots = np.matmul(residuals.transpose(1, 0, 2), self.codebooks.transpose(0, 2, 1)).transpose(1, 0, 2)
+        tables = (
+            (residuals ** 2).sum(axis=2)[:, :, None]
+            - 2 * dots
+            + (self.codebooks ** 2).sum(axis=2)[None, :, :]
+        )
+        sub_spaces = np.arange(self.m)
+
+        all_ids, all_distances = [], []
+        for table, list_no in zip(tables, probes):
+            ids, codes = self._list(list_no)
+            if len(ids) == 0:
+                continue
+
+            all_ids.append(ids)
+            all_distances.append(table[sub_spaces, codes].sum(axis=1))
+
+        if not all_ids:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        ids = np.concatenate(all_ids)
+        distances = np.concatenate(all_distances)
+        k = min(k, len(ids))
+        top = np.argpartition(distances, k - 1)[:k]
+        top = top[np.argsort(distances[top])]
+
+        return ids[top], distances[top]
+
+    def save(self, path: str):
+        """
+        Save the trained quantizers and inverted lists to an .npz file.
+
+        Args:
+            path: Destination path.
+        """
+        lists = [self._list(list_no) for list_no in range(self.nlist)]
+        offsets = np.cumsum([0] + [len(ids) for ids, _ in lists])
+
+        np.savez(
+            path,
+            params=np.array([self.dimension, self.nlist, self.m, self.nprobe]),
+            coarse_centroids=self.coarse_centroids,
+            codebooks=self.codebooks,
+            ids=np.concatenate([ids for ids, _ in lists]),
+            codes=np.concatenate([codes for _, codes in lists]),
+            offsets=offsets
+        )
+
+    @staticmethod
+    def load(path: str) -> "IVFPQIndex":
+        """
+        Load an index saved with `save`.
+
+        Args:
+            path: Path of the .npz file.
+
+        Returns:
+            IVF-PQ index.
+        """
+        data = np.load(path)
+        dimension, nlist, m, nprobe = (int(value) for value in data["params"])
+
+        index = IVFPQIndex(dimension, nlist=nlist, m=m, nprobe=nprobe)
+        index.coarse_centroids = data["coarse_centroids"]
+        index.codebooks = data["codebooks"]
+
+        ids, codes, offsets = data["ids"], data["codes"], data["offsets"]
+        index.list_ids = [[ids[offsets[i]:offsets[i + 1]]] for i in range(nlist)]
+        index.list_codes = [[codes[offsets[i]:offsets[i + 1]]] for i in range(nlist)]
+
+        return index
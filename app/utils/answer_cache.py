@@ -0,0 +1,211 @@
+from typing import List, Dict, Any, Optional, Tuple
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from langchain.schema import Document
+
+def chunk_identity(doc: Document) -> str:
+    """
+    Stable identity of a retrieved chunk.
+
+    Uses the vector ID when the store returns one, otherwise a hash of the
+    source and the content.
+    """
+    if getattr(doc, "id", None):
+        return doc.id
+
+    source = str(doc.metadata.get("source", ""))
+    return hashlib.sha1(f"{source}\0{doc.page_content}".encode("utf-8")).hexdigest()
+
+class SemanticAnswerCache:
+    """
+    In-memory cache of generated answers for repeated and near-duplicate questions.
+
+    Entries are grouped by (model, temperature, retrieved chunk set): a question is only
+    answered from the cache if retrieval returned exactly the same chunks,
+    with the same (possibly compressed) text, and its embedding is at least
+    `similarity_threshold` cosine-similar to a cached question. Entries expire after `ttl_seconds`, the least recently
+    used entry is evicted beyond `max_entries`, and everything is dropped
+    when the index version changes.
+    """
+
+    def __init__(self, similarity_threshold: float = 0.95, ttl_seconds: float = 3600.0, max_entries: int = 256):
+        """
+        Initialize an empty cache.
+
+        Args:
+            similarity_threshold: Minimum cosine similarity between query embeddings.
+            ttl_seconds: Time after which an entry expires.
+            max_entries: Maximum number of cached answers.
+        """
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.index_version = None
+        self.entries = OrderedDict()
+        self.buckets: Dict[Tuple[str, float, Tuple[str, ...]], List[int]] = {}
+        self.next_entry_id = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _bucket_key(model_name: str, temperature: float, docs: List[Document]) -> Tuple[str, float, Tuple[str, ...]]:
+        """
+        Key of the entries answered by the same model settings from the same context.
+
+        Each chunk is keyed on its identity and a digest of the text actually
+        sent to the LLM, so a compressed chunk doesn't share a bucket with
+        the full chunk it was cut from.
+        """
+        return model_name, float(temperature), tuple(sorted(
+            f"{chunk_identity(doc)}:{hashlib.sha1(doc.page_content.encode('utf-8')).hexdigest()}"
+            for doc in docs
+        ))
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        """L2-normalize a query embedding."""
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _check_version(self, index_version: Optional[str]):
+        """Drop every entry if the index changed since they were cached."""
+        if index_version != self.index_version:
+            self.entries.clear()
+            self.buckets.clear()
+            self.index_version = index_version
+
+    def _remove(self, entry_id: int):
+        """Remove an entry and its bucket reference."""
+        entry = self.entries.pop(entry_id)
+        bucket = self.buckets[entry["bucket"]]
+        bucket.remove(entry_id)
+        if not bucket:
+            del self.buckets[entry["bucket"]]
+
+    def _best_match(self, bucket_key, query_vector: np.ndarray) -> Tuple[Optional[int], float]:
+        """Find the most similar live entry of a bucket, dropping expired ones."""
+        now = time.time()
+        for entry_id in list(self.buckets.get(bucket_key, [])):
+            if now - self.entries[entry_id]["created_at"] > self.ttl_seconds:
+                self._remove(entry_id)
+
+        entry_ids = self.buckets.get(bucket_key)
+        if not entry_ids:
+            return None, 0.0
+
+        similarities = np.stack([self.entries[entry_id]["vector"] for entry_id in entry_ids]) @ query_vector
+        best = int(np.argmax(similarities))
+
+        return entry_ids[best], float(similarities[best])
+
+    def lookup(
+        self,
+        query_embedding: List[float],
+        docs: List[Document],
+        model_name: str,
+        index_version: Optional[str] = None,
+        temperature: float = 0.0
+    ) -> Optional[str]:
+        """
+        Get a cached answer for a question.
+
+        Args:
+            query_embedding: Embedding of the question.
+            docs: Chunks retrieved for the question.
+            model_name: Name of the LLM that would answer.
+            index_version: Current version token of the index.
+            temperature: Temperature the LLM would answer with.
+
+        Returns:
+            Cached answer, or None on a miss.
+        """
+        query_vector = self._normalize(query_embedding)
+
+        with self._lock:
+            self._check_version(index_version)
+            entry_id, similarity = self._best_match(self._bucket_key(model_name, temperature, docs), query_vector)
+
+            if entry_id is None or similarity < self.similarity_threshold:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self.entries.move_to_end(entry_id)
+
+            return self.entries[entry_id]["answer"]
+
+    def store(
+        self,
+        query_embedding: List[float],
+        docs: List[Document],
+        model_name: str,
+        answer: str,
+        index_version: Optional[str] = None,
+        temperature: float = 0.0
+    ):
+        """
+        Cache the answer to a question.
+
+        Args:
+            query_embedding: Embedding of the question.
+            docs: Chunks the answer was generated from.
+            model_name: Name of the LLM that answered.
+            answer: Generated answer.
+            index_version: Version token of the index the chunks came from.
+            temperature: Temperature the LLM answered with.
+        """
+        query_vector = self._normalize(query_embedding)
+        bucket_key = self._bucket_key(model_name, temperature, docs)
+
+        with self._lock:
+            self._check_version(index_version)
+
+            # Replace a near-duplicate question instead of adding a second entry
+            entry_id, similarity = self._best_match(bucket_key, query_vector)
+            if entry_id is not None and similarity >= self.similarity_threshold:
+                self._remove(entry_id)
+
+            entry_id = self.next_entry_id
+            self.next_entry_id += 1
+            self.entries[entry_id] = {
+                "vector": query_vector,
+                "answer": answer,
+                "bucket": bucket_key,
+                "created_at": time.time(),
+            }
+            self.buckets.setdefault(bucket_key, []).append(entry_id)
+
+            while len(self.entries) > self.max_entries:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every cached answer."""
+        with self._lock:
+            self.entries.clear()
+            self.buckets.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get hit/miss statistics.
+
+        Returns:
+            Dict with entries, capacity, hits, misses, hit rate and evictions.
+        """
+        lookups = self.hits + self.misses
+
+        return {
+            "entries": len(self.entries),
+            "capacity": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
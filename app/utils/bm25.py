@@ -0,0 +1,212 @@
+from typing import List, Dict, Any, Optional, Tuple
+import os
+import re
+import json
+import math
+import heapq
+import threading
+from collections import Counter
+
+from langchain.schema import Document
+
+# Terms are runs of letters/digits, optionally joined by - _ . so that error
+# codes, versions and identifiers ("E-1042", "v2.3.1", "max_tokens") stay whole
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-_.][a-z0-9]+)*")
+
+class BM25Index:
+    """
+    In-memory inverted index with Okapi BM25 scoring.
+
+    Postings map each term to {chunk ID: term frequency}; apart from them
+    only each chunk's length is kept, so memory doesn't grow with the text
+    of the corpus. Searches return chunk IDs, whose text and metadata are
+    read from the vector store. Documents can be added and removed by ID,
+    so the index can follow incremental ingestion, and the postings are
+    persisted as JSON next to the vectors.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        """
+        Initialize an empty index.
+
+        Args:
+            k1: Term frequency saturation parameter.
+            b: Document length normalization parameter.
+        """
+        self.k1 = k1
+        self.b = b
+        self.lengths: Dict[str, int] = {}
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.total_length = 0
+        # Removed chunks whose postings haven't been dropped yet
+        self.removed = set()
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        """Number of indexed documents."""
+        return len(self.lengths)
+
+    @staticmethod
+    def tokenize(text: str) -> List[str]:
+        """
+        Split text into lowercase terms.
+
+        Args:
+            text: Text to tokenize.
+
+        Returns:
+            List of terms.
+        """
+        return TOKEN_PATTERN.findall(text.lower())
+
+    def add_documents(self, documents: List[Document], ids: List[str]):
+        """
+        Index documents, replacing any existing documents with the same IDs.
+
+        Args:
+            documents: Documents to index.
+            ids: Chunk IDs, one per document.
+        """
+        with self._lock:
+            self.remove(ids)
+            if self.removed.intersection(ids):
+                self._purge()
+
+            for doc_id, doc in zip(ids, documents):
+                terms = Counter(self.tokenize(doc.page_content))
+                length = sum(terms.values())
+
+                self.lengths[doc_id] = length
+                self.total_length += length
+
+                for term, frequency in terms.items():
+                    self.postings.setdefault(term, {})[doc_id] = frequency
+
+    def remove(self, ids: List[str]):
+        """
+        Remove documents by ID (unknown IDs are ignored).
+
+        Removed chunks stop matching immediately; their postings are dropped
+        in one pass over the index once they make up a quarter of it.
+
+        Args:
+            ids: Chunk IDs to remove.
+        """
+        with self._lock:
+            for doc_id in ids:
+                length = self.lengths.pop(doc_id, None)
+                if length is None:
+                    continue
+
+                self.total_length -= length
+                self.removed.add(doc_id)
+
+            if len(self.removed) > len(self.lengths) // 4:
+                self._purge()
+
+    def _purge(self):
+        """Drop the postings of removed chunks."""
+        if not self.removed:
+            return
+
+        for term in list(self.postings):
+            postings = self.postings[term]
+            for doc_id in self.removed.intersection(postings):
+                del postings[doc_id]
+            if not postings:
+                del self.postings[term]
+
+        self.removed.clear()
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[str, float]]:
+        """
+        Return the k best BM25 matches for a query.
+
+        Args:
+            query: Query text.
+            k: Number of results.
+
+        Returns:
+            List of (chunk ID, score) tuples, best first.
+        """
+        with self._lock:
+            if not self.lengths:
+                return []
+
+            n_documents = len(self.lengths)
+            average_length = self.total_length / n_documents
+            scores: Dict[str, float] = {}
+
+            for term in set(self.tokenize(query)):
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+
+                document_frequency = len(postings) - sum(1 for doc_id in self.removed if doc_id in postings)
+                idf = math.log(1 + (n_documents - document_frequency + 0.5) / (document_frequency + 0.5))
+                for doc_id, frequency in postings.items():
+                    length = self.lengths.get(doc_id)
+                    if length is None:
+                        continue
+
+                    length_norm = 1 - self.b + self.b * length / average_length
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + self.k1 * length_norm)
+
+            return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def save(self, path: str):
+        """
+        Atomically write the index to a JSON file.
+
+        Args:
+            path: Destination path.
+        """
+        with self._lock:
+            self._purge()
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            tmp_path = f"{path}.tmp"
+
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({
+                    "k1": self.k1,
+                    "b": self.b,
+                    "lengths": self.lengths,
+                    "postings": self.postings,
+                }, f)
+
+            os.replace(tmp_path, path)
+
+    @staticmethod
+    def load(path: str) -> "BM25Index":
+        """
+        Load an index saved with `save`, or return an empty one if the file doesn't exist.
+
+        Indexes saved in the older format, with the text of every chunk, are
+        re-tokenized.
+
+        Args:
+            path: Path of the JSON file.
+
+        Returns:
+            BM25 index.
+        """
+        if not os.path.exists(path):
+            return BM25Index()
+
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        index = BM25Index(k1=data["k1"], b=data["b"])
+
+        if "documents" in data:
+            index.add_documents(
+                [Document(page_content=entry["text"]) for entry in data["documents"].values()],
+                list(data["documents"])
+            )
+            return index
+
+        index.lengths = data["lengths"]
+        index.postings = data["postings"]
+        index.total_length = sum(index.lengths.values())
+
+        return index
@@ -0,0 +1,368 @@
+from typing import List, Dict, Any, Optional, Tuple
+import re
+import hashlib
+import threading
+
+import numpy as np
+from langchain.schema import Document
+
+from .context_packer import TokenCounter, DEFAULT_TOKENIZER
+
+# Fallback tokens (words and punctuation) when no tokenizer can be loaded
+FALLBACK_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+# Places where a chunk may end, from most to least preferred
+PARAGRAPH_END = re.compile(r"\n\n")
+SENTENCE_END = re.compile(r"[.!?][\"')\]]*\s+")
+
+def chunk_id(doc: Document, start: int, end: int, text: str) -> str:
+    """
+    Build a deterministic ID for a chunk.
+
+    The ID depends only on the chunk's source, page, position and content, so
+    re-chunking the same document yields the same IDs.
+
+    Args:
+        doc: Document the chunk was cut from.
+        start: Character offset of the chunk in the document.
+        end: Character offset of the end of the chunk.
+        text: Chunk text.
+
+    Returns:
+        Chunk ID.
+    """
+    key = f"{doc.metadata.get('source', '')}\0{doc.metadata.get('page', '')}\0{start}\0{end}\0{text}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+class TokenChunker:
+    """
+    Split documents into chunks measured in tokens of the embedding model.
+
+    Each batch of documents is tokenized once with a fast tokenizer that
+    returns character offsets; chunks are then cut directly from the token
+    offsets, preferring paragraph, then sentence, then word boundaries near
+    the end of each window. Chunks are sized to fill the embedding model's
+    window exactly, including the special tokens it adds, so nothing is
+    truncated at embed time.
+    """
+
+    # Shared instances, one per tokenizer
+    _instances: Dict[str, "TokenChunker"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, tokenizer_name: str = DEFAULT_TOKENIZER):
+        """
+        Initialize the chunker with the shared tokenizer of a model.
+
+        Args:
+            tokenizer_name: Name of the Hugging Face tokenizer (the embedding model's).
+        """
+        self.tokenizer_name = tokenizer_name
+        self.tokenizer = TokenCounter.get(tokenizer_name).tokenizer
+
+        if self.tokenizer is not None:
+            self.special_tokens = self.tokenizer.num_special_tokens_to_add(pair=False)
+            self.max_length = self.tokenizer.model_max_length
+        else:
+            # [CLS] and [SEP] of BERT-style embedding models
+            self.special_tokens = 2
+            self.max_length = None
+
+    @staticmethod
+    def get(tokenizer_name: Optional[str] = None) -> "TokenChunker":
+        """
+        Get the shared chunker of a tokenizer.
+
+        Args:
+            tokenizer_name: Name of the Hugging Face tokenizer (defaults to DEFAULT_TOKENIZER).
+
+        Returns:
+            Token chunker.
+        """
+        tokenizer_name = tokenizer_name or DEFAULT_TOKENIZER
+
+        with TokenChunker._instances_lock:
+            chunker = TokenChunker._instances.get(tokenizer_name)
+
+            if chunker is None:
+                chunker = TokenChunker(tokenizer_name)
+                TokenChunker._instances[tokenizer_name] = chunker
+
+            return chunker
+
+    def clamp_chunk_size(self, chunk_size: int) -> int:
+        """
+        Limit a chunk size to the model's maximum input length.
+
+        Args:
+            chunk_size: Chunk size in tokens, including the special tokens.
+
+        Returns:
+            The chunk size, or the maximum length if it is smaller.
+        """
+        if self.max_length is not None and self.max_length < 1_000_000:
+            return min(chunk_size, self.max_length)
+
+        return chunk_size
+
+    def content_budget(self, chunk_size: int) -> int:
+        """
+        Number of content tokens that fit in a chunk.
+
+        Args:
+            chunk_size: Chunk size in tokens, including the special tokens
+                the model adds (clamped to the model's maximum length).
+
+        Returns:
+            Number of tokens available for text.
+        """
+        return max(1, self.clamp_chunk_size(chunk_size) - self.special_tokens)
+
+    def offsets(self, texts: List[str]) -> List[np.ndarray]:
+        """
+        Tokenize texts in one batch.
+
+        Args:
+            texts: Texts to tokenize.
+
+        Returns:
+            One (tokens x 2) array of character offsets per text.
+        """
+        if self.tokenizer is None:
+            return [
+                np.array([match.span() for match in FALLBACK_TOKEN.finditer(text)], dtype=np.int64).reshape(-1, 2)
+                for text in texts
+            ]
+
+        encoded = self.tokenizer(
+            texts,
+            add_special_tokens=False,
+            return_offsets_mapping=True,
+            return_attention_mask=False,
+            return_token_type_ids=False,
+            verbose=False
+        )
+        return [np.array(offsets, dtype=np.int64).reshape(-1, 2) for offsets in encoded["offset_mapping"]]
+
+    @staticmethod
+    def _cuts(text: str, offsets: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Token indices before which a chunk may end.
+
+        Returns:
+            Sorted arrays of paragraph, sentence and word boundaries.
+        """
+        starts, ends = offsets[:, 0], offsets[:, 1]
+
+        # A word boundary is whitespace between two tokens; cutting only there
+        # keeps the chunk's re-tokenization identical to its token window
+        words = np.nonzero(starts[1:] > ends[:-1])[0] + 1
+
+        def boundaries(pattern):
+            positions = np.array([match.end() for match in pattern.finditer(text)], dtype=np.int64)
+            return np.intersect1d(np.searchsorted(starts, positions), words)
+
+        return boundaries(PARAGRAPH_END), boundaries(SENTENCE_END), words
+
+    @staticmethod
+    def _windows(
+        offsets: np.ndarray,
+        cuts: Tuple[np.ndarray, np.ndarray, np.ndarray],
+        budget: int,
+        overlap: int,
+        start: int = 0,
+        stop: Optional[int] = None
+    ) -> List[Tuple[int, int, bool]]:
+        """
+        Token windows of a document, or of the token range [start, stop).
+
+        Returns:
+            List of (first token, end token, whether both ends are on word
+            boundaries) tuples.
+        """
+        n = len(offsets) if stop is None else stop
+        words = cuts[2]
+        lookback = max(1, budget // 8)
+        windows, start_on_word = [], True
+
+        while start < n:
+            limit = min(start + budget, n)
+            end, end_on_word = limit, limit == n
+
+            # End at the best boundary in the last part of the window
+            if limit < n:
+                for boundaries in cuts:
+                    i = np.searchsorted(boundaries, limit, side="right") - 1
+                    if i >= 0 and boundaries[i] > max(start, limit - lookback):
+                        end, end_on_word = int(boundaries[i]), True
+                        break
+
+            windows.append((start, end, start_on_word and end_on_word))
+            if end == n:
+                break
+
+            # Start the next window on the first word boundary within the overlap
+            next_start = max(end - overlap, start + 1)
+            i = np.searchsorted(words, next_start)
+            if i < len(words) and words[i] <= end:
+                start, start_on_word = int(words[i]), True
+            else:
+                start, start_on_word = next_start, False
+
+        return windows
+
+    def split_documents(self, documents: List[Document], chunk_size: int = 512, chunk_overlap: int = 50) -> List[Document]:
+        """
+        Split documents into token-sized chunks.
+
+        Args:
+            documents: Cleaned documents to split.
+            chunk_size: Size of each chunk in tokens, including special tokens.
+            chunk_overlap: Number of tokens to overlap between chunks.
+
+        Returns:
+            Chunks with a stable ID and "start_index", "end_index",
+            "chunk_index" and "token_count" metadata; the offsets are
+            character positions in the document's text.
+        """
+        budget = self.content_budget(chunk_size)
+        overlap = min(chunk_overlap, budget - 1)
+        documents = [doc for doc in documents if doc.page_content]
+        all_offsets = self.offsets([doc.page_content for doc in documents])
+
+        all_windows = [
+            self._windows(offsets, self._cuts(doc.page_content, offsets), budget, overlap) if len(offsets) else []
+            for doc, offsets in zip(documents, all_offsets)
+        ]
+
+        return self._build_chunks(documents, all_offsets, all_windows, budget)
+
+    def split_structured(
+        self,
+        documents: List[Document],
+        chunk_size: int = 512,
+        embeddings: Optional[Any] = None,
+        similarity_threshold: float = 0.5
+    ) -> List[Document]:
+        """
+        Split documents into chunks that follow their structure.
+
+        Each document (a Markdown section, a PDF page or a whole text file)
+        is split into paragraphs, and consecutive paragraphs are packed into
+        chunks up to the token budget, so chunks never straddle a heading or
+        a page and never cut a paragraph that fits. Paragraphs longer than a
+        chunk are split on sentence and word boundaries. Chunks don't
+        overlap, since they end on natural boundaries.
+
+        With `embeddings`, the units are sentences instead, and a new chunk
+        also starts wherever the similarity between two adjacent sentences
+        drops below `similarity_threshold` (a topic shift). All sentences of
+        the batch are embedded in one call and compared with one vectorized
+        product.
+
+        Args:
+            documents: Cleaned documents to split.
+            chunk_size: Size of each chunk in tokens, including special tokens.
+            embeddings: Optional embeddings model for the semantic merge.
+            similarity_threshold: Minimum cosine similarity between adjacent
+                sentences of a chunk.
+
+        Returns:
+            Chunks with the same ID and metadata as `split_documents`.
+        """
+        budget = self.content_budget(chunk_size)
+        documents = [doc for doc in documents if doc.page_content]
+        all_offsets = self.offsets([doc.page_content for doc in documents])
+
+        # Units of each document as contiguous token ranges
+        all_cuts, all_units = [], []
+        for doc, offsets in zip(documents, all_offsets):
+            cuts = self._cuts(doc.page_content, offsets) if len(offsets) else None
+            units = []
+
+            if cuts is not None:
+                bounds = np.union1d(cuts[0], cuts[1]) if embeddings is not None else cuts[0]
+                edges = [0, *bounds.tolist(), len(offsets)]
+                units = list(zip(edges[:-1], edges[1:]))
+
+            all_cuts.append(cuts)
+            all_units.append(units)
+
+        # Similarity of each unit to the next one
+        similarities = None
+        if embeddings is not None:
+            texts = [
+                doc.page_content[offsets[first, 0]:offsets[end - 1, 1]]
+                for doc, offsets, units in zip(documents, all_offsets, all_units)
+                for first, end in units
+            ]
+            if texts:
+                vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+                vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+                similarities = np.einsum("ij,ij->i", vectors[:-1], vectors[1:])
+
+        # Pack consecutive units while they fit (and stay on topic)
+        all_windows, unit_index = [], 0
+        for offsets, cuts, units in zip(all_offsets, all_cuts, all_units):
+            windows = []
+
+            for j, (first, end) in enumerate(units):
+                on_topic = similarities is None or (j > 0 and similarities[unit_index + j - 1] >= similarity_threshold)
+                joins = bool(windows) and on_topic
+
+                if joins and end - windows[-1][0] <= budget:
+                    windows[-1] = (windows[-1][0], end, windows[-1][2])
+                elif end - first <= budget:
+                    windows.append((first, end, True))
+                else:
+                    # Split an oversized unit on sentence and word boundaries,
+                    # starting with whatever is pending (e.g. its heading)
+                    if joins:
+                        first = windows.pop()[0]
+                    windows.extend(self._windows(offsets, cuts, budget, 0, first, end))
+
+            all_windows.append(windows)
+            unit_index += len(units)
+
+        return self._build_chunks(documents, all_offsets, all_windows, budget)
+
+    def _build_chunks(
+        self,
+        documents: List[Document],
+        all_offsets: List[np.ndarray],
+        all_windows: List[List[Tuple[int, int, bool]]],
+        budget: int
+    ) -> List[Document]:
+        """Turn the token windows of each document into chunk documents."""
+        chunks, unverified = [], []
+        for doc, offsets, windows in zip(documents, all_offsets, all_windows):
+            for position, (first, end, exact) in enumerate(windows):
+                start_char, end_char = int(offsets[first, 0]), int(offsets[end - 1, 1])
+                if not exact:
+                    unverified.append(len(chunks))
+
+                chunks.append((doc, position, start_char, end_char, end - first))
+
+        # Chunks cut inside a word may re-tokenize differently; re-count just
+        # those in one batch and trim the rare ones that no longer fit
+        texts = [chunks[i][0].page_content[chunks[i][2]:chunks[i][3]] for i in unverified]
+        for i, offsets in zip(unverified, self.offsets(texts)):
+            doc, position, start_char, end_char, _ = chunks[i]
+            if len(offsets) > budget:
+                end_char = start_char + int(offsets[budget - 1, 1])
+            chunks[i] = (doc, position, start_char, end_char, min(len(offsets), budget))
+
+        return [
+            Document(
+                id=chunk_id(doc, start_char, end_char, doc.page_content[start_char:end_char]),
+                page_content=doc.page_content[start_char:end_char],
+                metadata={
+                    **doc.metadata,
+                    "start_index": start_char,
+                    "end_index": end_char,
+                    "chunk_index": position,
+                    "token_count": tokens,
+                }
+            )
+            for doc, position, start_char, end_char, tokens in chunks
+        ]
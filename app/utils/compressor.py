@@ -0,0 +1,128 @@
+from typing import List, Dict, Any, Optional, Sequence
+import re
+
+import numpy as np
+from langchain.schema import Document
+from langchain.chains import LLMChain
+from langchain.retrievers.document_compressors import LLMChainExtractor
+from langchain_core.callbacks import Callbacks
+from langchain_core.documents import BaseDocumentCompressor
+from pydantic import ConfigDict
+
+# Sentence boundaries: end punctuation followed by whitespace, or a blank line
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n\s*\n")
+
+class ExtractiveCompressor(BaseDocumentCompressor):
+    """
+    Local extractive compressor that keeps the sentences closest to the query.
+
+    All sentences of all retrieved chunks are embedded in one batch with the
+    already-loaded embeddings model and scored against the query embedding
+    with a single matrix product, so compression costs one local forward
+    pass instead of one LLM call per chunk. The kept sentences stay in their
+    original order.
+    """
+
+    embeddings: Any
+    top_sentences: int = 3
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    @staticmethod
+    def split_sentences(text: str) -> List[str]:
+        """
+        Split text into sentences.
+
+        Args:
+            text: Text to split.
+
+        Returns:
+            Non-empty sentences.
+        """
+        return [sentence.strip() for sentence in SENTENCE_BOUNDARY.split(text) if sentence.strip()]
+
+    def compress_documents(
+        self,
+        documents: Sequence[Document],
+        query: str,
+        callbacks: Optional[Callbacks] = None
+    ) -> Sequence[Document]:
+        """
+        Keep the top sentences of each document.
+
+        Args:
+            documents: Retrieved documents.
+            query: The query string.
+            callbacks: Unused.
+
+        Returns:
+            New documents with the compressed content and the original metadata.
+        """
+        splits = [self.split_sentences(doc.page_content) for doc in documents]
+        to_score = [i for i, sentences in enumerate(splits) if len(sentences) > self.top_sentences]
+
+        if not to_score:
+            return list(documents)
+
+        # Embed every sentence that may be dropped in one batch
+        sentences = [sentence for i in to_score for sentence in splits[i]]
+        vectors = np.asarray(self.embeddings.embed_documents(sentences), dtype=np.float32)
+        query_vector = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+
+        # Cosine similarity of every sentence to the query
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        query_vector /= max(np.linalg.norm(query_vector), 1e-12)
+        similarities = vectors @ query_vector
+
+        compressed = list(documents)
+        offset = 0
+        for i in to_score:
+            count = len(splits[i])
+            scores = similarities[offset:offset + count]
+            offset += count
+
+            keep = np.sort(np.argpartition(-scores, self.top_sentences - 1)[:self.top_sentences])
+            compressed[i] = Document(
+                id=documents[i].id,
+                page_content=" ".join(splits[i][j] for j in keep),
+                metadata=dict(documents[i].metadata)
+            )
+
+        return compressed
+
+class ConcurrentLLMExtractor(LLMChainExtractor):
+    """`LLMChainExtractor` that sends its per-document LLM calls concurrently."""
+
+    max_concurrency: int = 8
+
+    def compress_documents(
+        self,
+        documents: Sequence[Document],
+        query: str,
+        callbacks: Optional[Callbacks] = None
+    ) -> Sequence[Document]:
+        """
+        Extract the relevant parts of each document with concurrent LLM calls.
+
+        Args:
+            documents: Retrieved documents.
+            query: The query string.
+            callbacks: Callbacks passed to the LLM calls.
+
+        Returns:
+            Documents with the extracted content; documents with nothing
+            relevant are dropped.
+        """
+        if isinstance(self.llm_chain, LLMChain):
+            return super().compress_documents(documents, query, callbacks)
+
+        outputs = self.llm_chain.batch(
+            [self.get_input(query, doc) for doc in documents],
+            config={"callbacks": callbacks, "max_concurrency": self.max_concurrency}
+        )
+
+        return [
+            Document(id=doc.id, page_content=output, metadata=dict(doc.metadata))
+            for doc, output in zip(documents, outputs)
+            if output
+        ]
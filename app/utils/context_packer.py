@@ -0,0 +1,244 @@
+from typing import List, Dict, Any, Optional, Tuple
+import os
+import re
+import hashlib
+import threading
+
+import numpy as np
+from langchain.schema import Document
+
+from .lru_cache import LRUCache
+
+# Tokenizer used to measure context; Gemini's tokenizer is only reachable
+# through the API, so a local subword tokenizer serves as a close proxy
+DEFAULT_TOKENIZER = "BAAI/bge-small-en-v1.5"
+
+# Word n-grams used to detect overlapping chunks
+SHINGLE_PATTERN = re.compile(r"\w+")
+
+def source_label(doc: Document, position: int) -> str:
+    """
+    Source shown for a document in the prompt.
+
+    Args:
+        doc: Retrieved document.
+        position: Zero-based position of the document in the context.
+
+    Returns:
+        The document's source, or "Document <n>" if it has none.
+    """
+    return str(doc.metadata["source"]) if "source" in doc.metadata else f"Document {position + 1}"
+
+class TokenCounter:
+    """
+    Token counter backed by a Hugging Face fast tokenizer.
+
+    Texts are counted in one batched tokenizer call and counts are cached by
+    content hash, so re-packing the same chunks (e.g. for a repeated query)
+    costs no tokenization. If the tokenizer can't be loaded, counts fall back
+    to the characters / 4 estimate.
+    """
+
+    # Shared instances, one per tokenizer
+    _instances: Dict[str, "TokenCounter"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, tokenizer_name: str = DEFAULT_TOKENIZER, max_cached_counts: int = 50_000):
+        """
+        Initialize the counter, loading the tokenizer.
+
+        Args:
+            tokenizer_name: Name of the Hugging Face tokenizer.
+            max_cached_counts: Maximum number of cached token counts.
+        """
+        self.tokenizer_name = tokenizer_name
+        self.counts = LRUCache(max_entries=max_cached_counts)
+
+        try:
+            from transformers import AutoTokenizer
+            self.tokenizer = AutoTokenizer.from_pretrained(tokenizer_name, use_fast=True)
+        except Exception as e:
+            print(f"Could not load tokenizer {tokenizer_name} ({e}); estimating tokens from characters")
+            self.tokenizer = None
+
+    @staticmethod
+    def get(tokenizer_name: Optional[str] = None) -> "TokenCounter":
+        """
+        Get the shared counter of a tokenizer.
+
+        Args:
+            tokenizer_name: Name of the Hugging Face tokenizer (defaults to the
+                CONTEXT_TOKENIZER environment variable or DEFAULT_TOKENIZER).
+
+        Returns:
+            Token counter.
+        """
+        tokenizer_name = tokenizer_name or os.getenv("CONTEXT_TOKENIZER", DEFAULT_TOKENIZER)
+
+        with TokenCounter._instances_lock:
+            counter = TokenCounter._instances.get(tokenizer_name)
+
+            if counter is None:
+                counter = TokenCounter(tokenizer_name)
+                TokenCounter._instances[tokenizer_name] = counter
+
+            return counter
+
+    def count_many(self, texts: List[str]) -> List[int]:
+        """
+        Count the tokens of several texts.
+
+        Args:
+            texts: Texts to count.
+
+        Returns:
+            Number of tokens of each text.
+        """
+        keys = [hashlib.sha1(text.encode("utf-8")).hexdigest() for text in texts]
+        counts = [self.counts.get(key) for key in keys]
+        missing = [i for i, count in enumerate(counts) if count is None]
+
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+
+            if self.tokenizer is not None:
+                encoded = self.tokenizer(missing_texts, add_special_tokens=False, verbose=False)["input_ids"]
+                missing_counts = [len(ids) for ids in encoded]
+            else:
+                missing_counts = [len(text) // 4 for text in missing_texts]
+
+            for i, count in zip(missing, missing_counts):
+                counts[i] = count
+                self.counts.put(keys[i], count)
+
+        return counts
+
+    def count(self, text: str) -> int:
+        """Count the tokens of a text."""
+        return self.count_many([text])[0]
+
+class ContextPacker:
+    """Select retrieved chunks that fit a token budget."""
+
+    @staticmethod
+    def _shingles(text: str, size: int = 5) -> set:
+        """Set of word n-grams of a text."""
+        words = SHINGLE_PATTERN.findall(text.lower())
+        if len(words) < size:
+            return {tuple(words)}
+
+        return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+    @staticmethod
+    def deduplicate(docs: List[Document], threshold: float = 0.8) -> List[Document]:
+        """
+        Drop chunks that mostly repeat a higher-ranked chunk of the same source.
+
+        A chunk is dropped when at least `threshold` of its word 5-grams also
+        occur in a kept chunk from the same source (e.g. the same passage
+        returned by both the dense and the keyword search, or two chunks
+        whose overlap windows cover each other).
+
+        Args:
+            docs: Documents, best first.
+            threshold: Fraction of shared 5-grams above which a chunk is a duplicate.
+
+        Returns:
+            Deduplicated documents, in their original order.
+        """
+        kept, kept_shingles = [], {}
+
+        for doc in docs:
+            source = doc.metadata.get("source")
+            shingles = ContextPacker._shingles(doc.page_content)
+
+            duplicate = any(
+                len(shingles & other) >= threshold * len(shingles)
+                for other in kept_shingles.get(source, [])
+            )
+            if duplicate:
+                continue
+
+            kept.append(doc)
+            kept_shingles.setdefault(source, []).append(shingles)
+
+        return kept
+
+    @staticmethod
+    def _knapsack(token_counts: List[int], scores: List[float], max_tokens: int) -> List[int]:
+        """Indices of the subset with the highest total score within the budget."""
+        n = len(token_counts)
+        best = np.zeros(max_tokens + 1)
+        taken = np.zeros((n, max_tokens + 1), dtype=bool)
+
+        for i, (tokens, score) in enumerate(zip(token_counts, scores)):
+            if tokens > max_tokens:
+                continue
+
+            candidate = np.full(max_tokens + 1, -np.inf)
+            candidate[tokens:] = best[:max_tokens + 1 - tokens] + score
+            taken[i] = candidate > best
+            best = np.maximum(best, candidate)
+
+        # Walk back through the table to recover the chosen items
+        selected, budget = [], max_tokens
+        for i in range(n - 1, -1, -1):
+            if taken[i, budget]:
+                selected.append(i)
+                budget -= token_counts[i]
+
+        return sorted(selected)
+
+    @staticmethod
+    def pack(
+        docs: List[Document],
+        max_tokens: int = 4000,
+        overhead_texts: Optional[List[str]] = None,
+        scores: Optional[List[float]] = None,
+        strategy: str = "greedy",
+        tokenizer_name: Optional[str] = None
+    ) -> Tuple[List[Document], List[int]]:
+        """
+        Select the documents to put in the prompt.
+
+        "greedy" walks the documents best first and skips the ones that don't
+        fit, so a large chunk never blocks smaller lower-ranked ones.
+        "knapsack" picks the subset with the highest total score that fits.
+
+        Args:
+            docs: Documents, best first.
+            max_tokens: Token budget.
+            overhead_texts: Text added around each document in the prompt
+                (e.g. its source line), counted on top of its content.
+            scores: Relevance score of each document (defaults to reciprocal rank).
+            strategy: "greedy" or "knapsack".
+            tokenizer_name: Tokenizer used to count tokens.
+
+        Returns:
+            Tuple of (selected documents in rank order, their token counts).
+        """
+        if not docs:
+            return [], []
+
+        scores = scores or [1.0 / (rank + 1) for rank in range(len(docs))]
+
+        # Count contents and overheads in one batch, without concatenating them
+        counts = TokenCounter.get(tokenizer_name).count_many(
+            [doc.page_content for doc in docs] + (overhead_texts or [])
+        )
+        token_counts = counts[:len(docs)]
+        if overhead_texts:
+            token_counts = [tokens + overhead for tokens, overhead in zip(token_counts, counts[len(docs):])]
+
+        if strategy == "knapsack":
+            selected = ContextPacker._knapsack(token_counts, scores, max_tokens)
+        elif strategy == "greedy":
+            selected, used = [], 0
+            for i, tokens in enumerate(token_counts):
+                if used + tokens <= max_tokens:
+                    selected.append(i)
+                    used += tokens
+        else:
+            raise ValueError(f"Unsupported packing strategy: {strategy}")
+
+        return [docs[i] for i in selected], [token_counts[i] for i in selected]
@@ -0,0 +1,219 @@
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Tuple
+import zlib
+import hashlib
+
+import numpy as np
+from langchain.schema import Document
+
+from .context_packer import SHINGLE_PATTERN
+
+# Prime just above 2**32, so 32-bit shingle hashes permute without collisions
+_HASH_PRIME = np.uint64(4294967311)
+
+def _lsh_bands(num_perm: int, threshold: float, recall: float = 0.95) -> Tuple[int, int]:
+    """
+    Choose the LSH banding (bands, rows) for a similarity threshold.
+
+    Two chunks with Jaccard similarity s share at least one band with
+    probability 1 - (1 - s^rows)^bands. This picks the most selective
+    banding (most rows per band, so fewest false candidates) under which a
+    pair right at the threshold still becomes a candidate with probability
+    `recall`; more similar pairs are even more likely to.
+    """
+    for rows in range(num_perm, 0, -1):
+        bands = num_perm // rows
+        if 1 - (1 - threshold ** rows) ** bands >= recall:
+            return bands, rows
+
+    return num_perm, 1
+
+class NearDuplicateFilter:
+    """
+    Drop chunks that are near-duplicates of an earlier chunk.
+
+    Each chunk is fingerprinted with a MinHash signature of its word 5-grams,
+    computed with vectorized hash permutations. Signatures are indexed with
+    locality-sensitive hashing (banding), so a chunk is only compared with
+    the few earlier chunks that share a band, and a candidate counts as a
+    duplicate when the estimated Jaccard similarity reaches the threshold.
+    Byte-identical chunks are caught first by a content hash.
+
+    Per kept chunk only its signature, content hash and source are stored,
+    so filtering a stream doesn't hold on to the text of the corpus.
+    """
+
+    def __init__(self, threshold: float = 0.85, num_perm: int = 128, shingle_size: int = 5, seed: int = 1):
+        """
+        Initialize an empty filter.
+
+        Args:
+            threshold: Jaccard similarity of word 5-grams at or above which
+                two chunks are duplicates.
+            num_perm: Number of MinHash permutations (signature length).
+            shingle_size: Number of words per shingle.
+            seed: Seed of the hash permutations.
+        """
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = _lsh_bands(num_perm, threshold)
+
+        # Random permutations h(x) = (a * x + b) mod p; a < 2**31 keeps a * x within 64 bits
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, 2**31, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, 2**31, size=num_perm, dtype=np.uint64)
+
+        self.canonical_sources: List[Optional[str]] = []
+        self.signatures: List[np.ndarray] = []
+        self.buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(self.bands)]
+        self.exact: Dict[str, int] = {}
+        self.merged_sources: Dict[int, List[str]] = {}
+        self.stats = {"chunks": 0, "duplicates": 0, "exact_duplicates": 0}
+
+    def signature(self, text: str) -> np.ndarray:
+        """
+        MinHash signature of a text.
+
+        Args:
+            text: Chunk text.
+
+        Returns:
+            Array of `num_perm` minimum permuted shingle hashes.
+        """
+        words = SHINGLE_PATTERN.findall(text.lower())
+        size = min(self.shingle_size, max(len(words), 1))
+        shingles = {" ".join(words[i:i + size]) for i in range(max(len(words) - size + 1, 1))}
+
+        hashes = np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in shingles), dtype=np.uint64, count=len(shingles))
+        permuted = (self.a[:, None] * hashes[None, :] + self.b[:, None]) % _HASH_PRIME
+
+        return permuted.min(axis=1)
+
+    def find(self, text: str) -> Tuple[Optional[int], np.ndarray, str]:
+        """
+        Look up the canonical chunk a text duplicates.
+
+        Args:
+            text: Chunk text.
+
+        Returns:
+            Tuple of (index of the canonical chunk or None, the text's
+            signature, its content hash).
+        """
+        content_hash = hashlib.sha1(" ".join(text.split()).encode("utf-8")).hexdigest()
+        if content_hash in self.exact:
+            return self.exact[content_hash], None, content_hash
+
+        signature = self.signature(text)
+        candidates = {
+            index
+            for band in range(self.bands)
+            for index in self.buckets[band].get(signature[band * self.rows:(band + 1) * self.rows].tobytes(), [])
+        }
+
+        best, best_similarity = None, self.threshold
+        for index in candidates:
+            similarity = float(np.mean(self.signatures[index] == signature))
+            if similarity >= best_similarity:
+                best, best_similarity = index, similarity
+
+        return best, signature, content_hash
+
+    def add(self, doc: Document) -> Optional[int]:
+        """
+        Register a chunk, or match it to the chunk it duplicates.
+
+        Args:
+            doc: Chunk to register.
+
+        Returns:
+            Index of the canonical chunk if `doc` is a duplicate, else None.
+        """
+        self.stats["chunks"] += 1
+        index, signature, content_hash = self.find(doc.page_content)
+
+        if index is not None:
+            self.stats["duplicates"] += 1
+            self.stats["exact_duplicates"] += int(signature is None)
+
+            source = doc.metadata.get("source")
+            sources = self.merged_sources.setdefault(index, [])
+            if source is not None and source not in sources and source != self.canonical_sources[index]:
+                sources.append(source)
+            return index
+
+        index = len(self.canonical_sources)
+        self.canonical_sources.append(doc.metadata.get("source"))
+        self.signatures.append(signature)
+        self.exact[content_hash] = index
+        for band in range(self.bands):
+            key = signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            self.buckets[band].setdefault(key, []).append(index)
+
+        return None
+
+    def deduplicate(self, docs: Iterable[Document]) -> List[Document]:
+        """
+        Keep one canonical chunk per group of near-duplicates.
+
+        The canonical chunk is the first one seen; the sources of its
+        duplicates are merged into its "sources" metadata.
+
+        Args:
+            docs: Chunks, e.g. from `DocumentPreprocessor.chunk_documents`.
+
+        Returns:
+            Canonical chunks, in input order (input documents are not modified).
+        """
+        kept = []
+        for doc in docs:
+            if self.add(doc) is None:
+                kept.append((len(self.canonical_sources) - 1, doc))
+
+        result = []
+        for index, doc in kept:
+            if self.merged_sources.get(index):
+                own = [doc.metadata["source"]] if "source" in doc.metadata else []
+                doc = Document(
+                    id=doc.id,
+                    page_content=doc.page_content,
+                    metadata={**doc.metadata, "sources": own + self.merged_sources[index]}
+                )
+
+            result.append(doc)
+
+        return result
+
+    def iter_unique(self, docs: Iterable[Document]) -> Iterator[Document]:
+        """
+        Lazily drop near-duplicate chunks from a stream.
+
+        Canonical chunks are yielded as soon as they are seen, so their
+        metadata can't list sources found later; those still count in
+        `stats` and `merged_sources`.
+
+        Args:
+            docs: Stream of chunks.
+
+        Yields:
+            Chunks that don't duplicate an earlier chunk.
+        """
+        for doc in docs:
+            if self.add(doc) is None:
+                yield doc
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Get deduplication statistics.
+
+        Returns:
+            Dict with the numbers of chunks seen, kept, duplicates (and exact
+            duplicates among them) and the fraction of chunks dropped.
+        """
+        chunks = self.stats["chunks"]
+
+        return {
+            **self.stats,
+            "kept": chunks - self.stats["duplicates"],
+            "dropped_fraction": self.stats["duplicates"] / chunks if chunks else 0.0,
+        }
@@ -0,0 +1,70 @@
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+def mmr_select(
+    query_vector: np.ndarray,
+    candidate_vectors: np.ndarray,
+    k: int,
+    lambda_mult: float = 0.5,
+    sources: Optional[List[Any]] = None,
+    max_per_source: Optional[int] = None
+) -> List[int]:
+    """
+    Maximal marginal relevance selection with an optional per-source cap.
+
+    Each step picks the candidate maximizing
+    `lambda * sim(query, c) - (1 - lambda) * max sim(c, selected)`. The
+    redundancy term is kept as a running maximum that is updated with one
+    matrix-vector product per step, so selecting k of n candidates costs
+    O(k * n * d) without building the full n x n similarity matrix.
+
+    Args:
+        query_vector: Query embedding.
+        candidate_vectors: Candidate embeddings (n x d).
+        k: Number of candidates to select.
+        lambda_mult: 1 ranks by relevance only, 0 by diversity only.
+        sources: Source of each candidate, for the per-source cap.
+        max_per_source: Maximum number of selected candidates per source.
+
+    Returns:
+        Indices of the selected candidates, in selection order.
+    """
+    vectors = np.asarray(candidate_vectors, dtype=np.float32)
+    if len(vectors) == 0 or k <= 0:
+        return []
+
+    vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    query = np.asarray(query_vector, dtype=np.float32)
+    query = query / max(np.linalg.norm(query), 1e-12)
+
+    relevance = vectors @ query
+    redundancy = np.full(len(vectors), -np.inf, dtype=np.float32)
+    available = np.ones(len(vectors), dtype=bool)
+    selected = []
+
+    if sources is not None and max_per_source is not None:
+        codes: Dict[Any, int] = {}
+        source_codes = np.array([codes.setdefault(source, len(codes)) for source in sources])
+        source_counts = np.zeros(len(codes), dtype=np.int64)
+
+    while len(selected) < k and available.any():
+        if selected:
+            scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        else:
+            scores = relevance.copy()
+        scores[~available] = -np.inf
+
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, vectors @ vectors[best])
+
+        # Retire every remaining candidate of a source that reached its cap
+        if sources is not None and max_per_source is not None:
+            code = source_codes[best]
+            source_counts[code] += 1
+            if source_counts[code] >= max_per_source:
+                available &= source_codes != code
+
+    return selected
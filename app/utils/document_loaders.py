@@ -1,6 +1,9 @@
 import os
-from typing import List, Dict, Any
+import time
+from typing import List, Dict, Any, Optional, Iterator, Tuple
 from pathlib import Path
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 
 from langchain_community.document_loaders import (
     PyPDFLoader,
@@ -9,77 +12,563 @@ from langchain_community.document_loaders import (
 )
 from langchain.schema import Document
 
+from .pdf_backends import get_pdf_backend, iter_with_timeout, time_limit
+
+# Loader class to use for each supported file extension (PDFs go through
+# the selected PDF backend, whose default wraps PyPDFLoader)
+LOADERS_BY_EXTENSION = {
+    ".pdf": PyPDFLoader,
+    ".md": UnstructuredMarkdownLoader,
+    ".txt": TextLoader,
+    ".log": TextLoader,
+    ".csv": TextLoader,
+}
+
+def _load_file_result(
+    file_path: str,
+    structured: bool = False,
+    pdf_backend: str = "pypdf",
+    timeout: Optional[float] = None,
+    pages: Optional[Tuple[int, int]] = None,
+    deadline: Optional[float] = None,
+    pages_per_task: Optional[int] = None
+) -> Tuple[str, List[Document], Optional[str], Optional[Tuple[List[Tuple[int, int]], Optional[float]]]]:
+    """
+    Load a single file, capturing any error instead of raising it.
+
+    Defined at module level so it can be sent to process pool workers, where
+    the timeout can interrupt a hung page (see `time_limit`).
+
+    Args:
+        file_path: Path to the file.
+        structured: Whether to load Markdown files as one document per section.
+        pdf_backend: Name of the PDF extraction backend.
+        timeout: Maximum seconds spent on the file (None for no limit).
+        pages: Optional (start, stop) range of PDF pages to load.
+        deadline: Wall-clock time (`time.time()`) at which the file times
+            out, shared by its page ranges (defaults to now + timeout).
+        pages_per_task: If set, a PDF with more pages than this isn't loaded;
+            its page ranges are returned instead, to be loaded as separate tasks.
+
+    Returns:
+        Tuple of (file path, loaded documents, error message or None, and
+        (page ranges, deadline) if the file was split or else None).
+    """
+    if deadline is None and timeout is not None:
+        deadline = time.time() + timeout
+
+    def remaining():
+        return None if deadline is None else deadline - time.time()
+
+    try:
+        if pages_per_task:
+            ranges = DocumentLoader.page_ranges(file_path, pdf_backend, pages_per_task, remaining())
+            if ranges != [None]:
+                return file_path, [], None, (ranges, deadline)
+
+        documents = list(DocumentLoader.iter_file(file_path, structured, pdf_backend, remaining(), pages))
+        return file_path, documents, None, None
+    except Exception as e:
+        # Report a file's own deadline with its total budget, not what was left of it
+        if isinstance(e, TimeoutError) and deadline is not None and remaining() <= 0:
+            return file_path, [], f"TimeoutError: Timed out after {timeout:g}s", None
+        return file_path, [], f"{type(e).__name__}: {e}", None
+
 class DocumentLoader:
     """Utility class to load documents from different sources."""
-    
+
+    @staticmethod
+    def resolve_workers(workers: Optional[int]) -> int:
+        """
+        Resolve a requested worker count to an actual number of processes.
+
+        Args:
+            workers: Requested number of workers. None or 0 means one per CPU core.
+
+        Returns:
+            Number of worker processes to use (at least 1).
+        """
+        if not workers:
+            return os.cpu_count() or 1
+        return max(1, workers)
+
+    @staticmethod
+    def list_files(directory_path: str) -> List[str]:
+        """
+        List the supported files in a directory, in a stable order.
+
+        Args:
+            directory_path: Path to the directory containing documents.
+
+        Returns:
+            Sorted list of file paths with a supported extension.
+        """
+        directory = Path(directory_path)
+
+        return sorted(
+            str(file_path)
+            for file_path in directory.glob("**/*")
+            if file_path.is_file() and file_path.suffix.lower() in LOADERS_BY_EXTENSION
+        )
+
+    @staticmethod
+    def group_sections(elements: List[Document], source: str) -> List[Document]:
+        """
+        Group Markdown elements into one document per heading section.
+
+        Args:
+            elements: Documents loaded by `UnstructuredMarkdownLoader` in
+                "elements" mode, in reading order.
+            source: Path of the Markdown file.
+
+        Returns:
+            One document per section, with the heading path (e.g.
+            "Setup > Install") in its "section" metadata.
+        """
+        sections, headings, texts = [], [], []
+
+        def flush():
+            if texts:
+                sections.append(Document(
+                    page_content="\n\n".join(texts),
+                    metadata={"source": source, "section": " > ".join(headings), "section_index": len(sections)}
+                ))
+                texts.clear()
+
+        for element in elements:
+            if element.metadata.get("category") == "Title":
+                flush()
+                depth = element.metadata.get("category_depth") or 0
+                headings[depth:] = [element.page_content.strip()]
+
+            texts.append(element.page_content)
+
+        flush()
+        return sections
+
+    @staticmethod
+    def iter_file(
+        file_path: str,
+        structured: bool = False,
+        pdf_backend: str = "pypdf",
+        timeout: Optional[float] = None,
+        pages: Optional[Tuple[int, int]] = None
+    ) -> Iterator[Document]:
+        """
+        Lazily load a single file with the loader matching its extension.
+
+        PDFs stream one document per page from the selected backend instead
+        of being materialized whole. With `structured`, Markdown files load as
+        one document per heading section instead of one per file.
+
+        Args:
+            file_path: Path to the file.
+            structured: Whether to load Markdown files as one document per section.
+            pdf_backend: Name of the PDF extraction backend (see PDF_BACKENDS).
+            timeout: Maximum seconds spent extracting the file (None for no
+                limit); exceeding it raises TimeoutError.
+            pages: Optional (start, stop) range of PDF pages to load.
+
+        Yields:
+            Document objects (none for unsupported file types).
+        """
+        loader_class = LOADERS_BY_EXTENSION.get(Path(file_path).suffix.lower())
+        file_path = str(file_path)
+
+        if loader_class is None:
+            return
+
+        if loader_class is PyPDFLoader:
+            start, stop = pages or (0, None)
+            documents = get_pdf_backend(pdf_backend).iter_pages(file_path, start, stop)
+        elif structured and loader_class is UnstructuredMarkdownLoader:
+            def sections():
+                elements = loader_class(file_path, mode="elements").load()
+                yield from DocumentLoader.group_sections(elements, file_path)
+
+            documents = sections()
+        else:
+            documents = loader_class(file_path).lazy_load()
+
+        yield from iter_with_timeout(documents, timeout)
+
+    @staticmethod
+    def load_file(
+        file_path: str,
+        structured: bool = False,
+        pdf_backend: str = "pypdf",
+        timeout: Optional[float] = None
+    ) -> List[Document]:
+        """
+        Load a single file with the loader matching its extension.
+
+        PDFs load as one document per page. With `structured`, Markdown files
+        load as one document per heading section instead of one per file.
+
+        Args:
+            file_path: Path to the file.
+            structured: Whether to load Markdown files as one document per section.
+            pdf_backend: Name of the PDF extraction backend (see PDF_BACKENDS).
+            timeout: Maximum seconds spent extracting the file (None for no limit).
+
+        Returns:
+            List of Document objects (empty for unsupported file types).
+        """
+        return list(DocumentLoader.iter_file(file_path, structured, pdf_backend, timeout))
+
+    @staticmethod
+    def page_ranges(
+        file_path: str,
+        pdf_backend: str = "pypdf",
+        pages_per_task: Optional[int] = None,
+        timeout: Optional[float] = None
+    ) -> List[Optional[Tuple[int, int]]]:
+        """
+        Split a PDF into page ranges loaded by separate tasks.
+
+        Args:
+            file_path: Path to the file.
+            pdf_backend: Name of the PDF extraction backend.
+            pages_per_task: Number of pages per task (None loads files whole).
+            timeout: Maximum seconds spent counting the pages.
+
+        Returns:
+            List of (start, stop) page ranges, or [None] to load the file in
+            one task (other file types, small PDFs, or PDFs whose pages
+            can't be counted, so the loading task reports the error).
+        """
+        if not pages_per_task or LOADERS_BY_EXTENSION.get(Path(file_path).suffix.lower()) is not PyPDFLoader:
+            return [None]
+
+        try:
+            with time_limit(timeout):
+                page_count = get_pdf_backend(pdf_backend).page_count(file_path)
+        except Exception:
+            return [None]
+
+        if page_count <= pages_per_task:
+            return [None]
+
+        return [(start, min(start + pages_per_task, page_count)) for start in range(0, page_count, pages_per_task)]
+
+    @staticmethod
+    def iter_file_parts(
+        file_paths: List[str],
+        workers: Optional[int] = 1,
+        structured: bool = False,
+        pdf_backend: str = "pypdf",
+        timeout: Optional[float] = None,
+        pages_per_task: Optional[int] = None
+    ) -> Iterator[Tuple[str, List[Document], Optional[str], bool]]:
+        """
+        Load files, optionally across a process pool, yielding each part as it completes.
+
+        A part is a whole file or, with `pages_per_task`, one page range of
+        a large PDF. Parts are yielded in file and page order regardless of
+        which worker finishes first, and a range is released as soon as it
+        is yielded. At most `workers * 2` tasks are submitted and not yet
+        yielded, so the pages held by the pool stay bounded by the window
+        rather than by the size of the files in it.
+
+        A file that fails partway may already have yielded parts; its error
+        comes last and the rest of its ranges are dropped.
+
+        Args:
+            file_paths: List of paths to files.
+            workers: Number of worker processes. 1 loads serially (in this
+                process unless a timeout is set), None or 0 uses one worker
+                per CPU core.
+            structured: Whether to load Markdown files as one document per section.
+            pdf_backend: Name of the PDF extraction backend (see PDF_BACKENDS).
+            timeout: Maximum seconds spent on a file, from when a worker starts
+                it until its last page range is loaded (None for no limit).
+                Files are then always loaded in worker processes, whose main
+                thread can interrupt a hung page.
+            pages_per_task: Number of PDF pages per task in page-parallel mode
+                (None loads each file in one task).
+
+        Yields:
+            Tuples of (file path, documents of the part, error message or
+            None, whether this is the file's last part).
+        """
+        file_paths = [str(file_path) for file_path in file_paths]
+        workers = DocumentLoader.resolve_workers(workers)
+        if not pages_per_task:
+            workers = min(workers, max(1, len(file_paths)))
+
+        if workers == 1 and timeout is None:
+            for file_path in file_paths:
+                yield _load_file_result(file_path, structured, pdf_backend)[:3] + (True,)
+            return
+
+        # Each entry holds a file's tasks in page order and, once its first
+        # task counted the pages, the page ranges not submitted yet
+        max_in_flight = workers * 2
+        pending = deque()
+        in_flight = set()
+        outstanding = 0
+        remaining_paths = deque(file_paths)
+
+        def split(entry):
+            if entry["ranges"] is None and entry["first"].done():
+                _, _, _, file_split = entry["first"].result()
+                entry["ranges"], entry["deadline"] = (deque(file_split[0]), file_split[1]) if file_split else (deque(), None)
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            def submit(entry, *args):
+                nonlocal outstanding
+                future = executor.submit(_load_file_result, entry["file_path"], structured, pdf_backend, timeout, *args)
+                in_flight.add(future)
+                entry["tasks"].append(future)
+                outstanding += 1
+                return future
+
+            while True:
+                # Submit page ranges of earlier files first, so the file being
+                # yielded completes soonest; the head file always gets a task
+                for entry in pending:
+                    split(entry)
+                    while entry["ranges"] and (
+                        outstanding < max_in_flight or (entry is pending[0] and not entry["tasks"])
+                    ):
+                        submit(entry, entry["ranges"].popleft(), entry["deadline"])
+
+                while remaining_paths and outstanding < max_in_flight:
+                    entry = {"file_path": remaining_paths.popleft(), "tasks": deque(), "ranges": None, "deadline": None}
+                    entry["first"] = submit(entry, None, None, pages_per_task)
+                    pending.append(entry)
+
+                # Yield the finished parts of the head file in page order
+                progressed = False
+                while pending and pending[0]["tasks"] and pending[0]["tasks"][0].done():
+                    entry = pending[0]
+                    future = entry["tasks"].popleft()
+                    outstanding -= 1
+                    progressed = True
+                    split(entry)
+
+                    file_path, documents, error, _ = future.result()
+                    last = error is not None or not (entry["tasks"] or entry["ranges"])
+                    if error is not None:
+                        for range_future in entry["tasks"]:
+                            range_future.cancel()
+                        outstanding -= len(entry["tasks"])
+                        entry["tasks"].clear()
+
+                    if last:
+                        pending.popleft()
+                    if documents or last:
+                        yield file_path, documents, error, last
+
+                if not pending and not remaining_paths:
+                    break
+
+                if not progressed:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    in_flight -= done
+
+    @staticmethod
+    def iter_file_results(
+        file_paths: List[str],
+        workers: Optional[int] = 1,
+        structured: bool = False,
+        pdf_backend: str = "pypdf",
+        timeout: Optional[float] = None,
+        pages_per_task: Optional[int] = None
+    ) -> Iterator[Tuple[str, List[Document], Optional[str]]]:
+        """
+        Load files, optionally across a process pool, yielding one result per file.
+
+        Results are yielded in the order of `file_paths`. A file is
+        collected from its parts (see `iter_file_parts`) before it is
+        yielded, so a file that fails partway is reported with no documents;
+        only the file being collected is held whole, the others in flight
+        are held one page range at a time.
+
+        Args:
+            file_paths: List of paths to files.
+            workers: Number of worker processes. 1 loads serially (in this
+                process unless a timeout is set), None or 0 uses one worker
+                per CPU core.
+            structured: Whether to load Markdown files as one document per section.
+            pdf_backend: Name of the PDF extraction backend (see PDF_BACKENDS).
+            timeout: Maximum seconds spent on a file, from when a worker starts
+                it until its last page range is loaded (None for no limit). A
+                file that times out is reported as failed.
+            pages_per_task: Number of PDF pages per task in page-parallel mode
+                (None loads each file in one task).
+
+        Yields:
+            Tuples of (file path, loaded documents, error message or None).
+        """
+        documents = []
+
+        for file_path, part, error, last in DocumentLoader.iter_file_parts(
+            file_paths,
+            workers,
+            structured,
+            pdf_backend=pdf_backend,
+            timeout=timeout,
+            pages_per_task=pages_per_task
+        ):
+            if error is not None:
+                documents = []
+                yield file_path, [], error
+                continue
+
+            documents.extend(part)
+            if last:
+                yield file_path, documents, None
+                documents = []
+
+    @staticmethod
+    def iter_documents(
+        file_paths: List[str],
+        workers: Optional[int] = 1,
+        failures: Optional[Dict[str, str]] = None,
+        structured: bool = False,
+        pdf_backend: str = "pypdf",
+        timeout: Optional[float] = None,
+        pages_per_task: Optional[int] = None
+    ) -> Iterator[Document]:
+        """
+        Lazily load documents from a list of file paths.
+
+        Each file is loaded in full before its documents are yielded, with
+        any number of workers: a file that fails partway contributes no
+        documents, so the indexed contents don't depend on `workers`. The
+        price is holding one whole file in memory (while the other files in
+        flight are held one page range at a time); use `iter_file` to
+        stream a single file lazily when partial files are acceptable.
+
+        Args:
+            file_paths: List of paths to files.
+            workers: Number of worker processes used to parse files.
+            failures: Optional dict that receives an error message per failed file.
+            structured: Whether to load Markdown files as one document per section.
+            pdf_backend: Name of the PDF extraction backend (see PDF_BACKENDS).
+            timeout: Maximum seconds spent on a file (None for no limit).
+            pages_per_task: Number of PDF pages per task in page-parallel mode.
+
+        Yields:
+            Document objects, in file order.
+        """
+        for file_path, file_documents, error in DocumentLoader.iter_file_results(
+            file_paths,
+            workers,
+            structured,
+            pdf_backend=pdf_backend,
+            timeout=timeout,
+            pages_per_task=pages_per_task
+        ):
+            if error is not None:
+                if failures is not None:
+                    failures[file_path] = error
+                continue
+
+            yield from file_documents
+
     @staticmethod
-    def load_from_directory(directory_path: str) -> List[Document]:
+    def iter_from_directory(
+        directory_path: str,
+        workers: Optional[int] = 1,
+        failures: Optional[Dict[str, str]] = None,
+        structured: bool = False,
+        pdf_backend: str = "pypdf",
+        timeout: Optional[float] = None,
+        pages_per_task: Optional[int] = None
+    ) -> Iterator[Document]:
+        """
+        Lazily load documents from a directory containing different file types.
+
+        Args:
+            directory_path: Path to the directory containing documents.
+            workers: Number of worker processes used to parse files.
+            failures: Optional dict that receives an error message per failed file.
+            structured: Whether to load Markdown files as one document per section.
+            pdf_backend: Name of the PDF extraction backend (see PDF_BACKENDS).
+            timeout: Maximum seconds spent on a file (None for no limit).
+            pages_per_task: Number of PDF pages per task in page-parallel mode.
+
+        Yields:
+            Document objects, in file order.
+        """
+        return DocumentLoader.iter_documents(
+            DocumentLoader.list_files(directory_path),
+            workers=workers,
+            failures=failures,
+            structured=structured,
+            pdf_backend=pdf_backend,
+            timeout=timeout,
+            pages_per_task=pages_per_task
+        )
+
+    @staticmethod
+    def load_from_directory(
+        directory_path: str,
+        workers: Optional[int] = 1,
+        failures: Optional[Dict[str, str]] = None,
+        structured: bool = False,
+        pdf_backend: str = "pypdf",
+        timeout: Optional[float] = None,
+        pages_per_task: Optional[int] = None
+    ) -> List[Document]:
         """
         Load documents from a directory containing different file types.
-        
+
         Args:
             directory_path: Path to the directory containing documents.
-            
+            workers: Number of worker processes used to parse files.
+            failures: Optional dict that receives an error message per failed file.
+            structured: Whether to load Markdown files as one document per section.
+            pdf_backend: Name of the PDF extraction backend (see PDF_BACKENDS).
+            timeout: Maximum seconds spent extracting a file (None for no limit).
+            pages_per_task: Number of PDF pages per task in page-parallel mode.
+
         Returns:
             List of Document objects.
         """
-        documents = []
-        directory = Path(directory_path)
-        
-        for file_path in directory.glob("**/*"):
-            if file_path.is_file():
-                try:
-                    file_extension = file_path.suffix.lower()
-                    
-                    if file_extension == ".pdf":
-                        loader = PyPDFLoader(str(file_path))
-                        documents.extend(loader.load())
-                    
-                    elif file_extension == ".md":
-                        loader = UnstructuredMarkdownLoader(str(file_path))
-                        documents.extend(loader.load())
-                    
-                    elif file_extension in [".txt", ".log", ".csv"]:
-                        loader = TextLoader(str(file_path))
-                        documents.extend(loader.load())
-                        
-                except Exception as e:
-                    print(f"Error loading {file_path}: {e}")
-        
-        return documents
-    
+        return DocumentLoader.load_from_files(
+            DocumentLoader.list_files(directory_path),
+            workers=workers,
+            failures=failures,
+            structured=structured,
+            pdf_backend=pdf_backend,
+            timeout=timeout,
+            pages_per_task=pages_per_task
+        )
+
     @staticmethod
-    def load_from_files(file_paths: List[str]) -> List[Document]:
+    def load_from_files(
+        file_paths: List[str],
+        workers: Optional[int] = 1,
+        failures: Optional[Dict[str, str]] = None,
+        structured: bool = False,
+        pdf_backend: str = "pypdf",
+        timeout: Optional[float] = None,
+        pages_per_task: Optional[int] = None
+    ) -> List[Document]:
         """
         Load documents from a list of file paths.
-        
+
         Args:
             file_paths: List of paths to files.
-            
+            workers: Number of worker processes used to parse files.
+            failures: Optional dict that receives an error message per failed file.
+            structured: Whether to load Markdown files as one document per section.
+            pdf_backend: Name of the PDF extraction backend (see PDF_BACKENDS).
+            timeout: Maximum seconds spent extracting a file (None for no limit).
+            pages_per_task: Number of PDF pages per task in page-parallel mode.
+
         Returns:
             List of Document objects.
         """
-        documents = []
-        
-        for file_path in file_paths:
-            path = Path(file_path)
-            
-            try:
-                file_extension = path.suffix.lower()
-                
-                if file_extension == ".pdf":
-                    loader = PyPDFLoader(str(path))
-                    documents.extend(loader.load())
-                
-                elif file_extension == ".md":
-                    loader = UnstructuredMarkdownLoader(str(path))
-                    documents.extend(loader.load())
-                
-                elif file_extension in [".txt", ".log", ".csv"]:
-                    loader = TextLoader(str(path))
-                    documents.extend(loader.load())
-                    
-            except Exception as e:
-                print(f"Error loading {file_path}: {e}")
-        
-        return documents 
\ No newline at end of file
+        return list(DocumentLoader.iter_documents(
+            file_paths,
+            workers=workers,
+            failures=failures,
+            structured=structured,
+            pdf_backend=pdf_backend,
+            timeout=timeout,
+            pages_per_task=pages_per_task
+        ))
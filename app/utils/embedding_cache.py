@@ -0,0 +1,407 @@
+from typing import List, Dict, Any, Optional
+import os
+import re
+import struct
+import hashlib
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from .storage import get_state_dir
+from .lru_cache import LRUCache
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking
+    fcntl = None
+
+# Record of the slot log: raw SHA-256 key and the slot its vector is stored in
+_SLOT_RECORD = struct.Struct("<32si")
+
+class EmbeddingCache:
+    """
+    Persistent, size-capped embedding cache shared between processes.
+
+    Vectors live in a memory-mapped float32 matrix (`vectors.npy`) with one
+    row per slot. Slot assignments are appended to a binary log
+    (`slots.log`); replaying the log gives the key of every slot, later
+    records overriding earlier ones. When the cache is full the least
+    recently used entry is evicted and its slot reused.
+
+    Writers take an exclusive file lock and replay the records other
+    processes appended before allocating slots, so two processes (e.g. the
+    app and the ingest CLI) never hand out the same slot. Readers replay new
+    records under a shared lock before each lookup, so a slot reassigned
+    elsewhere is never served for its previous key. Write recency comes from
+    the log; hits refresh recency only within the process.
+    """
+
+    # Shared instances, one per cache directory
+    _instances: Dict[str, "EmbeddingCache"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, cache_dir: str, max_entries: int = 200_000):
+        """
+        Initialize the cache, loading any existing slot log from disk.
+
+        Args:
+            cache_dir: Directory holding the vector matrix and the slot log.
+            max_entries: Maximum number of cached vectors.
+        """
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.vectors_path = os.path.join(cache_dir, "vectors.npy")
+        self.log_path = os.path.join(cache_dir, "slots.log")
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._lock_file = open(os.path.join(cache_dir, "lock"), "a+b")
+        self._reset_state()
+
+        with self._lock, self._file_lock(exclusive=False):
+            self._sync()
+
+    @staticmethod
+    def open(cache_dir: str, max_entries: int = 200_000) -> "EmbeddingCache":
+        """
+        Get the shared cache instance for a directory.
+
+        Args:
+            cache_dir: Directory holding the cache files.
+            max_entries: Maximum number of cached vectors.
+
+        Returns:
+            Embedding cache.
+        """
+        with EmbeddingCache._instances_lock:
+            cache = EmbeddingCache._instances.get(cache_dir)
+
+            if cache is None:
+                cache = EmbeddingCache(cache_dir, max_entries)
+                EmbeddingCache._instances[cache_dir] = cache
+
+            return cache
+
+    @staticmethod
+    def default_dir(model_name: str) -> str:
+        """
+        Get the default cache directory for an embeddings model.
+
+        Args:
+            model_name: Name of the embeddings model.
+
+        Returns:
+            Path to the cache directory.
+        """
+        return get_state_dir("embedding_cache", re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name))
+
+    @staticmethod
+    def make_key(model_name: str, text: str) -> str:
+        """
+        Build a cache key from the model name and the whitespace-normalized text.
+
+        Args:
+            model_name: Name of the embeddings model.
+            text: Text being embedded.
+
+        Returns:
+            Hex digest identifying the (model, text) pair.
+        """
+        normalized = " ".join(text.split())
+        return hashlib.sha256(f"{model_name}\0{normalized}".encode("utf-8")).hexdigest()
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool):
+        """Hold the cache directory's lock file (shared for reads, exclusive for writes)."""
+        if fcntl is None:
+            yield
+            return
+
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _reset_state(self):
+        """Forget the in-memory view of the cache files."""
+        self.dimension = None
+        self.vectors = None
+        self.slots = OrderedDict()
+        self.keys_by_slot = {}
+        self.next_slot = 0
+        self.log_inode = None
+        self.log_offset = 0
+
+    def _assign(self, key: str, slot: int):
+        """Record that `slot` holds the vector of `key`, as the most recent entry."""
+        previous_key = self.keys_by_slot.get(slot)
+        if previous_key is not None and previous_key != key:
+            del self.slots[previous_key]
+
+        self.slots[key] = slot
+        self.slots.move_to_end(key)
+        self.keys_by_slot[slot] = key
+        self.next_slot = max(self.next_slot, slot + 1)
+
+    def _sync(self):
+        """
+        Catch up with the slot log, which other processes may have appended to.
+
+        Must be called with the file lock held. A log with a new inode was
+        compacted or reset by another process and is replayed from the start.
+        """
+        try:
+            stat = os.stat(self.log_path)
+        except FileNotFoundError:
+            self._reset_state()
+            return
+
+        if stat.st_ino != self.log_inode:
+            self._reset_state()
+
+            try:
+                vectors = np.load(self.vectors_path, mmap_mode="r+")
+            except (OSError, ValueError):
+                return
+
+            # Left unmapped on a capacity change; the next write resets the files
+            if vectors.ndim != 2 or vectors.shape[0] != self.max_entries:
+                return
+
+            self.vectors = vectors
+            self.dimension = vectors.shape[1]
+            self.log_inode = stat.st_ino
+
+        if stat.st_size <= self.log_offset:
+            return
+
+        with open(self.log_path, "rb") as f:
+            f.seek(self.log_offset)
+            data = f.read(stat.st_size - self.log_offset)
+
+        # Skip a record still being written
+        data = data[:len(data) - len(data) % _SLOT_RECORD.size]
+        for digest, slot in _SLOT_RECORD.iter_unpack(data):
+            self._assign(digest.hex(), slot)
+        self.log_offset += len(data)
+
+    def _create(self, dimension: int):
+        """Replace the cache files with an empty matrix and log. Must hold the exclusive lock."""
+        if os.path.exists(self.vectors_path):
+            print(f"Resetting embedding cache in {self.cache_dir}: capacity or dimension changed")
+
+        # Build both files aside and swap them in, so other processes never
+        # map a truncated matrix; the new log inode tells them to reload
+        tmp_vectors_path = os.path.join(self.cache_dir, "vectors.tmp.npy")
+        vectors = np.lib.format.open_memmap(
+            tmp_vectors_path,
+            mode="w+",
+            dtype=np.float32,
+            shape=(self.max_entries, dimension)
+        )
+        vectors.flush()
+        os.replace(tmp_vectors_path, self.vectors_path)
+        self._write_log([])
+
+        # Index of the previous JSON format
+        legacy_index_path = os.path.join(self.cache_dir, "index.json")
+        if os.path.exists(legacy_index_path):
+            os.remove(legacy_index_path)
+
+        self._reset_state()
+        self.vectors = vectors
+        self.dimension = dimension
+        self.log_inode = os.stat(self.log_path).st_ino
+
+    def _write_log(self, records: List[bytes]):
+        """Atomically replace the slot log with the given records."""
+        tmp_path = f"{self.log_path}.tmp"
+
+        with open(tmp_path, "wb") as f:
+            f.write(b"".join(records))
+
+        os.replace(tmp_path, self.log_path)
+
+    def _compact(self):
+        """Rewrite the slot log with one record per live entry. Must hold the exclusive lock."""
+        records = [_SLOT_RECORD.pack(bytes.fromhex(key), slot) for key, slot in self.slots.items()]
+        self._write_log(records)
+        stat = os.stat(self.log_path)
+        self.log_inode = stat.st_ino
+        self.log_offset = stat.st_size
+
+    def get_many(self, keys: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        Look up vectors by key, refreshing their recency.
+
+        Args:
+            keys: Cache keys.
+
+        Returns:
+            List with a vector copy for each hit and None for each miss.
+        """
+        results = []
+
+        with self._lock, self._file_lock(exclusive=False):
+            self._sync()
+
+            for key in keys:
+                slot = self.slots.get(key)
+
+                if slot is None:
+                    self.misses += 1
+                    results.append(None)
+                else:
+                    self.hits += 1
+                    self.slots.move_to_end(key)
+                    results.append(np.array(self.vectors[slot]))
+
+        return results
+
+    def put_many(self, keys: List[str], vectors: List[List[float]]):
+        """
+        Store vectors, evicting the least recently used entries if needed.
+
+        Only the new slot assignments are appended to the log; it is
+        compacted once it holds four records per cache entry.
+
+        Args:
+            keys: Cache keys.
+            vectors: Vectors, in the same order as the keys.
+        """
+        if not keys:
+            return
+
+        with self._lock, self._file_lock(exclusive=True):
+            self._sync()
+            if self.vectors is None or self.dimension != len(vectors[0]):
+                self._create(len(vectors[0]))
+
+            records = []
+            for key, vector in zip(keys, vectors):
+                slot = self.slots.get(key)
+
+                if slot is None:
+                    if self.next_slot < self.max_entries:
+                        slot = self.next_slot
+                    else:
+                        slot = next(iter(self.slots.values()))
+                        self.evictions += 1
+
+                self.vectors[slot] = vector
+                self._assign(key, slot)
+                records.append(_SLOT_RECORD.pack(bytes.fromhex(key), slot))
+
+            # Vectors reach the file before the records pointing at them; the
+            # records overwrite any partial record left by a crashed writer
+            self.vectors.flush()
+            with open(self.log_path, "r+b") as f:
+                f.seek(self.log_offset)
+                f.write(b"".join(records))
+                f.truncate()
+            self.log_offset += len(records) * _SLOT_RECORD.size
+
+            if self.log_offset > 4 * self.max_entries * _SLOT_RECORD.size:
+                self._compact()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get hit/miss statistics.
+
+        Returns:
+            Dict with entries, capacity, hits, misses, hit rate and evictions.
+        """
+        lookups = self.hits + self.misses
+
+        return {
+            "entries": len(self.slots),
+            "capacity": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that serves document embeddings from an `EmbeddingCache`
+    and, optionally, query embeddings from an in-memory LRU cache.
+    """
+
+    def __init__(self, embeddings: Embeddings, model_name: str, cache: EmbeddingCache, query_cache: Optional[LRUCache] = None):
+        """
+        Initialize the wrapper.
+
+        Args:
+            embeddings: Underlying embeddings model.
+            model_name: Name of the model, part of every cache key.
+            cache: Embedding cache to read from and write to.
+            query_cache: Optional in-memory cache of query embeddings.
+        """
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.cache = cache
+        self.query_cache = query_cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed documents, computing only the ones missing from the cache.
+
+        Args:
+            texts: Texts to embed.
+
+        Returns:
+            List of embeddings.
+        """
+        keys = [EmbeddingCache.make_key(self.model_name, text) for text in texts]
+        cached = self.cache.get_many(keys)
+
+        # Embed each distinct missing text once
+        missing = {}
+        for key, text, vector in zip(keys, texts, cached):
+            if vector is None and key not in missing:
+                missing[key] = text
+
+        computed = {}
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self.cache.put_many(list(computed.keys()), list(computed.values()))
+
+        return [
+            vector.tolist() if vector is not None else list(computed[key])
+            for key, vector in zip(keys, cached)
+        ]
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Embed a query, reusing the embedding of a recently seen identical query.
+
+        Args:
+            text: Query text.
+
+        Returns:
+            Query embedding.
+        """
+        if self.query_cache is None:
+            return self.embeddings.embed_query(text)
+
+        key = EmbeddingCache.make_key(self.model_name, text)
+        vector = self.query_cache.get(key)
+
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.query_cache.put(key, vector)
+
+        return list(vector)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the hit/miss statistics of the underlying cache."""
+        return self.cache.stats()
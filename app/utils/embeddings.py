@@ -1,44 +1,220 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import os
+import time
+import threading
 
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain.schema import Document
 
+from .embedding_cache import EmbeddingCache, CachedEmbeddings
+from .lru_cache import LRUCache
+
+class EmbeddingModelRegistry:
+    """
+    Process-wide registry of loaded embeddings models.
+    
+    Each (model type, model name, device) is loaded and warmed up once per
+    process, so query-time embedding never pays the model-load cost.
+    """
+    
+    _models: Dict[Tuple[str, str, str], HuggingFaceEmbeddings] = {}
+    _metrics: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+    _lock = threading.Lock()
+    
+    @staticmethod
+    def get(model_type: str, model_name: str, device: str = "cpu", warm_up: bool = True) -> HuggingFaceEmbeddings:
+        """
+        Get a shared embeddings model, loading it on first use.
+        
+        Args:
+            model_type: Type of embeddings model.
+            model_name: Name of the Hugging Face model.
+            device: Device to run the model on.
+            warm_up: Whether to run a dummy encode right after loading.
+            
+        Returns:
+            Shared embeddings model.
+        """
+        key = (model_type.lower(), model_name, device)
+        
+        # Fast path without taking the lock
+        model = EmbeddingModelRegistry._models.get(key)
+        if model is not None:
+            EmbeddingModelRegistry._metrics[key]["requests"] += 1
+            return model
+        
+        with EmbeddingModelRegistry._lock:
+            # Another thread may have loaded it while we waited
+            model = EmbeddingModelRegistry._models.get(key)
+            if model is not None:
+                EmbeddingModelRegistry._metrics[key]["requests"] += 1
+                return model
+            
+            start = time.perf_counter()
+            model = EmbeddingGenerator.get_bge_embeddings(model_name, device=device)
+            load_seconds = time.perf_counter() - start
+            
+            warmup_seconds = 0.0
+            if warm_up:
+                start = time.perf_counter()
+                model.embed_query("warm-up")
+                warmup_seconds = time.perf_counter() - start
+            
+            EmbeddingModelRegistry._metrics[key] = {
+                "load_seconds": load_seconds,
+                "warmup_seconds": warmup_seconds,
+                "loaded_at": time.time(),
+                "requests": 1,
+            }
+            EmbeddingModelRegistry._models[key] = model
+            print(f"Loaded embeddings model {model_name} on {device} in {load_seconds:.2f}s (warm-up {warmup_seconds:.2f}s)")
+            
+            return model
+    
+    @staticmethod
+    def get_metrics() -> Dict[str, Dict[str, Any]]:
+        """
+        Get load-time metrics for every model loaded in this process.
+        
+        Returns:
+            Mapping of "type:name:device" to load seconds, warm-up seconds,
+            load timestamp and number of requests served.
+        """
+        return {
+            ":".join(key): dict(metrics)
+            for key, metrics in EmbeddingModelRegistry._metrics.items()
+        }
+    
+    @staticmethod
+    def clear():
+        """Drop all loaded models (they are reloaded on next use)."""
+        with EmbeddingModelRegistry._lock:
+            EmbeddingModelRegistry._models.clear()
+            EmbeddingModelRegistry._metrics.clear()
+
 class EmbeddingGenerator:
     """Utility class to generate embeddings for documents."""
     
+    # In-memory query embedding caches, one per model
+    _query_caches: Dict[str, LRUCache] = {}
+    _query_caches_lock = threading.Lock()
+    
     @staticmethod
-    def get_bge_embeddings(model_name: str = "BAAI/bge-small-en-v1.5") -> HuggingFaceEmbeddings:
+    def get_bge_embeddings(model_name: str = "BAAI/bge-small-en-v1.5", device: str = "cpu") -> HuggingFaceEmbeddings:
         """
-        Get Hugging Face BGE embeddings model.
+        Load a new Hugging Face BGE embeddings model.
+        
+        Prefer `get_embeddings_model`, which shares one loaded model per process.
         
         Args:
             model_name: Name of the Hugging Face model.
+            device: Device to run the model on.
             
         Returns:
             Hugging Face embeddings model.
         """
         return HuggingFaceEmbeddings(
             model_name=model_name,
-            model_kwargs={"device": "cpu"},
+            model_kwargs={"device": device},
             encode_kwargs={"normalize_embeddings": True}
         )
     
     @staticmethod
-    def get_embeddings_model(model_type: str = "bge", model_name: Optional[str] = None):
+    def get_embeddings_model(
+        model_type: str = "bge",
+        model_name: Optional[str] = None,
+        use_cache: bool = True,
+        device: str = "cpu"
+    ):
         """
         Get embeddings model based on type.
         
         Args:
             model_type: Type of embeddings model (bge or huggingface).
             model_name: Name of the specific model.
+            use_cache: Whether to serve document embeddings from the persistent
+                on-disk cache and query embeddings from an in-memory LRU cache.
+            device: Device to run the model on.
             
         Returns:
             Embeddings model.
         """
         if model_type.lower() in ["huggingface", "bge"]:
-            return EmbeddingGenerator.get_bge_embeddings(
-                model_name or "BAAI/bge-small-en-v1.5"
-            )
+            model_name = model_name or "BAAI/bge-small-en-v1.5"
+            embeddings = EmbeddingModelRegistry.get(model_type, model_name, device=device)
         else:
-            raise ValueError(f"Unsupported embedding model type: {model_type}") 
\ No newline at end of file
+            raise ValueError(f"Unsupported embedding model type: {model_type}")
+        
+        if not use_cache:
+            return embeddings
+        
+        cache = EmbeddingCache.open(
+            EmbeddingCache.default_dir(model_name),
+            max_entries=int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+        )
+        return CachedEmbeddings(embeddings, model_name, cache, EmbeddingGenerator.get_query_cache(model_name))
+    
+    @staticmethod
+    def get_query_cache(model_name: str) -> LRUCache:
+        """
+        Get the shared query embedding cache of a model.
+        
+        The size is set with the QUERY_EMBEDDING_CACHE_MAX_ENTRIES environment variable.
+        
+        Args:
+            model_name: Name of the embeddings model.
+            
+        Returns:
+            LRU cache of query embeddings.
+        """
+        with EmbeddingGenerator._query_caches_lock:
+            cache = EmbeddingGenerator._query_caches.get(model_name)
+            
+            if cache is None:
+                cache = LRUCache(max_entries=int(os.getenv("QUERY_EMBEDDING_CACHE_MAX_ENTRIES", "1024")))
+                EmbeddingGenerator._query_caches[model_name] = cache
+            
+            return cache
+    
+    @staticmethod
+    def get_cache_stats() -> Dict[str, Dict[str, Any]]:
+        """
+        Get hit/miss statistics of every embedding cache opened in this process.
+        
+        Returns:
+            Mapping of cache directory to its statistics.
+        """
+        return {
+            cache_dir: cache.stats()
+            for cache_dir, cache in EmbeddingCache._instances.items()
+        }
+    
+    @staticmethod
+    def get_query_cache_stats() -> Dict[str, Dict[str, Any]]:
+        """
+        Get hit/miss statistics of the query embedding caches.
+        
+        Returns:
+            Mapping of model name to its statistics.
+        """
+        return {
+            model_name: cache.stats()
+            for model_name, cache in EmbeddingGenerator._query_caches.items()
+        }
+    
+    @staticmethod
+    def warm_up(model_type: str = "bge", model_name: Optional[str] = None, device: str = "cpu") -> Dict[str, Any]:
+        """
+        Load and warm up an embeddings model ahead of the first query.
+        
+        Args:
+            model_type: Type of embeddings model.
+            model_name: Name of the specific model.
+            device: Device to run the model on.
+            
+        Returns:
+            Load-time metrics of the model.
+        """
+        model_name = model_name or "BAAI/bge-small-en-v1.5"
+        EmbeddingModelRegistry.get(model_type, model_name, device=device)
+        return EmbeddingModelRegistry.get_metrics()[f"{model_type.lower()}:{model_name}:{device}"]
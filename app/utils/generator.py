@@ -1,5 +1,8 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple, Iterator
+import io
 import os
+import time
+import threading
 from dotenv import load_dotenv
 
 from langchain.schema import Document
@@ -8,12 +11,23 @@ from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnablePassthrough
 
+from .answer_cache import SemanticAnswerCache
+from .context_packer import source_label
+
 # Load environment variables
 load_dotenv()
 
 class Generator:
     """Utility class for generating answers from retrieved context."""
     
+    # Compiled QA chains keyed by (model name, temperature); each keeps its
+    # LLM client, and so its HTTP connection pool, alive between questions
+    _chains: Dict[Tuple[str, float], Any] = {}
+    _chains_lock = threading.Lock()
+    
+    # Per-thread buffer the prompt context is assembled in
+    _buffers = threading.local()
+    
     @staticmethod
     def get_llm(model_name: str = "gemini-1.5-pro", temperature: float = 0.0):
         """
@@ -37,13 +51,31 @@ class Generator:
         """
         Format documents for inclusion in prompt.
         
+        Each document is written once, with its source line, into a reused
+        per-thread buffer; the documents themselves are not modified.
+        
         Args:
             docs: List of documents.
             
         Returns:
             Formatted string of document contents.
         """
-        return "\n\n".join(f"Document {i+1}:\n{doc.page_content}" for i, doc in enumerate(docs))
+        buffer = getattr(Generator._buffers, "buffer", None)
+        if buffer is None:
+            buffer = Generator._buffers.buffer = io.StringIO()
+        
+        buffer.seek(0)
+        buffer.truncate()
+        
+        for i, doc in enumerate(docs):
+            if i:
+                buffer.write("\n\n")
+            buffer.write(f"Document {i+1}:\n")
+            buffer.write(doc.page_content)
+            buffer.write("\n\nSource: ")
+            buffer.write(source_label(doc, i))
+        
+        return buffer.getvalue()
     
     @staticmethod
     def build_qa_chain(model_name: str = "gemini-1.5-pro", temperature: float = 0.0):
@@ -91,12 +123,55 @@ Structured Answer (using ONLY information from the documents):"""
         
         return chain
     
+    @staticmethod
+    def get_qa_chain(model_name: str = "gemini-1.5-pro", temperature: float = 0.0):
+        """
+        Get a cached QA chain, building it on first use.
+        
+        Args:
+            model_name: Name of the Gemini model.
+            temperature: Temperature for generation.
+            
+        Returns:
+            QA chain.
+        """
+        key = (model_name, float(temperature))
+        
+        chain = Generator._chains.get(key)
+        if chain is not None:
+            return chain
+        
+        with Generator._chains_lock:
+            # Another thread may have built it while we waited
+            chain = Generator._chains.get(key)
+            if chain is None:
+                chain = Generator.build_qa_chain(model_name, temperature)
+                Generator._chains[key] = chain
+            
+            return chain
+    
+    @staticmethod
+    def invalidate_qa_chains(model_name: Optional[str] = None):
+        """
+        Drop cached QA chains, e.g. after the API key or prompt changed.
+        
+        Args:
+            model_name: Only drop the chains of this model (all chains if None).
+        """
+        with Generator._chains_lock:
+            for key in list(Generator._chains):
+                if model_name is None or key[0] == model_name:
+                    del Generator._chains[key]
+    
     @staticmethod
     def generate_answer(
         query: str,
         docs: List[Document],
         model_name: str = "gemini-1.5-pro",
-        temperature: float = 0.1
+        temperature: float = 0.1,
+        answer_cache: Optional[SemanticAnswerCache] = None,
+        query_embedding: Optional[List[float]] = None,
+        index_version: Optional[str] = None
     ) -> str:
         """
         Generate an answer for a question based on retrieved documents.
@@ -106,12 +181,21 @@ Structured Answer (using ONLY information from the documents):"""
             docs: Retrieved documents.
             model_name: Name of the Gemini model.
             temperature: Temperature for generation.
+            answer_cache: Optional cache of answers to similar questions.
+            query_embedding: Embedding of the question (required with a cache).
+            index_version: Version token of the index the documents came from.
             
         Returns:
             Generated answer.
         """
-        # Build the QA chain
-        chain = Generator.build_qa_chain(model_name, temperature)
+        use_cache = answer_cache is not None and query_embedding is not None
+        if use_cache:
+            cached = answer_cache.lookup(query_embedding, docs, model_name, index_version, temperature=temperature)
+            if cached is not None:
+                return cached
+        
+        # Reuse the compiled QA chain
+        chain = Generator.get_qa_chain(model_name, temperature)
         
         # Format the documents
         context = Generator.format_documents(docs)
@@ -119,4 +203,77 @@ Structured Answer (using ONLY information from the documents):"""
         # Generate the answer
         result = chain.invoke({"context": context, "question": query})
         
-        return result 
\ No newline at end of file
+        if use_cache:
+            answer_cache.store(query_embedding, docs, model_name, result, index_version, temperature=temperature)
+        
+        return result 
+    
+    @staticmethod
+    def stream_answer(
+        query: str,
+        docs: List[Document],
+        model_name: str = "gemini-1.5-pro",
+        temperature: float = 0.1,
+        metrics: Optional[Dict[str, Any]] = None,
+        answer_cache: Optional[SemanticAnswerCache] = None,
+        query_embedding: Optional[List[float]] = None,
+        index_version: Optional[str] = None
+    ) -> Iterator[str]:
+        """
+        Stream an answer chunk by chunk as the model generates it.
+        
+        A cached answer is yielded as a single chunk.
+        
+        Args:
+            query: The question to answer.
+            docs: Retrieved documents.
+            model_name: Name of the Gemini model.
+            temperature: Temperature for generation.
+            metrics: Optional dict that receives `first_token_seconds`,
+                `total_seconds` (measured from the call) and `cache_hit` once
+                streaming ends.
+            answer_cache: Optional cache of answers to similar questions.
+            query_embedding: Embedding of the question (required with a cache).
+            index_version: Version token of the index the documents came from.
+            
+        Yields:
+            Answer text chunks.
+        """
+        start = time.perf_counter()
+        first_token_seconds = None
+        
+        use_cache = answer_cache is not None and query_embedding is not None
+        if use_cache:
+            cached = answer_cache.lookup(query_embedding, docs, model_name, index_version, temperature=temperature)
+            if cached is not None:
+                if metrics is not None:
+                    metrics["total_seconds"] = metrics["first_token_seconds"] = time.perf_counter() - start
+                    metrics["cache_hit"] = True
+                yield cached
+                return
+        
+        # Reuse the compiled QA chain
+        chain = Generator.get_qa_chain(model_name, temperature)
+        
+        # Format the documents
+        context = Generator.format_documents(docs)
+        
+        # Stream the answer
+        chunks = []
+        for chunk in chain.stream({"context": context, "question": query}):
+            if not chunk:
+                continue
+            
+            if first_token_seconds is None:
+                first_token_seconds = time.perf_counter() - start
+            
+            chunks.append(chunk)
+            yield chunk
+        
+        if use_cache:
+            answer_cache.store(query_embedding, docs, model_name, "".join(chunks), index_version, temperature=temperature)
+        
+        if metrics is not None:
+            metrics["cache_hit"] = False
+            metrics["total_seconds"] = time.perf_counter() - start
+            metrics["first_token_seconds"] = metrics["total_seconds"] if first_token_seconds is None else first_token_seconds
@@ -0,0 +1,253 @@
+from typing import List, Dict, Any, Optional, Tuple
+import os
+from pathlib import Path
+
+from .document_loaders import DocumentLoader
+from .embeddings import EmbeddingGenerator
+from .preprocessor import DocumentPreprocessor
+from .vector_store import VectorStore, batched
+from .manifest import IngestManifest
+from .index_version import IndexVersion
+
+class IncrementalIndexer:
+    """Keep a vector index in sync with a directory using a content-hash manifest."""
+
+    @staticmethod
+    def sync_directory(
+        data_dir: str,
+        embedding_model_type: str = "bge",
+        embedding_model_name: Optional[str] = None,
+        index_name: str = "personal-knowledge-assistant",
+        chunk_size: int = 512,
+        chunk_overlap: int = 50,
+        workers: int = 1,
+        batch_size: int = 100,
+        rebuild: bool = False,
+        manifest_path: Optional[str] = None,
+        on_progress=None,
+        backend: str = "pinecone",
+        upsert_concurrency: int = 4,
+        chunking: str = "token",
+        semantic_threshold: Optional[float] = None,
+        pdf_backend: str = "pypdf",
+        pdf_pages_per_task: Optional[int] = None,
+        file_timeout: Optional[float] = None
+    ) -> Tuple[Any, Dict[str, Any]]:
+        """
+        Re-embed only new or modified files and delete the vectors of removed files.
+
+        The BM25 keyword index is kept in sync with the same chunk IDs. A full
+        rebuild happens when requested, when no manifest or keyword index
+        exists yet (the index may contain vectors we have no IDs for), or
+        when the chunking or embedding settings changed since the last run.
+
+        Args:
+            data_dir: Directory containing documents.
+            embedding_model_type: Type of embeddings model.
+            embedding_model_name: Name of the embeddings model.
+            index_name: Name of the index.
+            chunk_size: Size of each chunk in tokens.
+            chunk_overlap: Number of tokens to overlap between chunks.
+            workers: Number of worker processes for loading files.
+            batch_size: Number of chunks embedded and upserted at once.
+            rebuild: Whether to delete the index and re-ingest everything.
+            manifest_path: Path of the manifest file (defaults to one per index).
+            on_progress: Optional callback called with a status message.
+            backend: Vector store backend ("pinecone" or "local").
+            upsert_concurrency: Maximum number of Pinecone upserts in flight.
+            chunking: Chunking strategy ("token" or "structure").
+            semantic_threshold: With "structure", merge sentences while adjacent
+                ones are at least this similar (None disables the semantic merge).
+            pdf_backend: PDF text extraction backend (see PDF_BACKENDS).
+            pdf_pages_per_task: Split PDFs into tasks of this many pages so the
+                workers share large files (None loads each file in one task).
+            file_timeout: Seconds after which extracting a file is abandoned
+                and the file reported as failed.
+
+        Returns:
+            Tuple of (vector store, statistics dict).
+        """
+        def report(message: str):
+            if on_progress is not None:
+                on_progress(message)
+
+        manifest_path = manifest_path or IngestManifest.default_path(index_name, backend)
+        settings = {
+            "embedding_model_type": embedding_model_type,
+            "embedding_model_name": embedding_model_name,
+            "chunk_size": chunk_size,
+            "chunk_overlap": chunk_overlap,
+            "chunking": chunking,
+            "semantic_threshold": semantic_threshold,
+            "pdf_backend": pdf_backend,
+        }
+
+        # Hash the current directory contents
+        file_paths = {
+            Path(os.path.relpath(file_path, data_dir)).as_posix(): file_path
+            for file_path in DocumentLoader.list_files(data_dir)
+        }
+        current_hashes = {
+            relative_path: IngestManifest.hash_file(file_path)
+            for relative_path, file_path in file_paths.items()
+        }
+
+        keyword_index_path = VectorStore.get_keyword_index_path(index_name, backend)
+        manifest = IngestManifest.load(manifest_path)
+        if (
+            rebuild
+            or not IngestManifest.exists(manifest_path)
+            or not os.path.exists(keyword_index_path)
+            or manifest.settings != settings
+        ):
+            report("Rebuilding index from scratch...")
+            VectorStore.delete_index(index_name, backend=backend)
+            manifest = IngestManifest(manifest_path)
+
+        manifest.settings = settings
+        added, modified, removed, unchanged = manifest.diff(current_hashes)
+        report(
+            f"{len(added)} new, {len(modified)} modified, "
+            f"{len(removed)} removed, {len(unchanged)} unchanged files"
+        )
+
+        # Make sure the index exists without wiping it
+        if backend == "pinecone":
+            VectorStore.get_or_create_index(index_name, dimension=384, wait=False)
+        vector_store = VectorStore.get_vector_store(
+            embedding_model_type=embedding_model_type,
+            embedding_model_name=embedding_model_name,
+            index_name=index_name,
+            backend=backend
+        )
+        keyword_index = VectorStore.load_keyword_index(index_name, backend)
+
+        # Sentences for the semantic merge bypass the chunk embedding cache
+        semantic_embeddings = None
+        if chunking == "structure" and semantic_threshold is not None:
+            semantic_embeddings = EmbeddingGenerator.get_embeddings_model(
+                model_type=embedding_model_type,
+                model_name=embedding_model_name,
+                use_cache=False
+            )
+
+        stats = {
+            "added": len(added),
+            "modified": len(modified),
+            "removed": len(removed),
+            "unchanged": len(unchanged),
+            "chunks_written": 0,
+            "chunks_deleted": 0,
+            "upsert_seconds": 0.0,
+            "failures": {},
+        }
+
+        try:
+            # Delete the vectors of removed files
+            stale_ids = [chunk_id for relative_path in removed for chunk_id in manifest.get_chunk_ids(relative_path)]
+            IncrementalIndexer._delete_ids(vector_store, stale_ids)
+            keyword_index.remove(stale_ids)
+            stats["chunks_deleted"] += len(stale_ids)
+            for relative_path in removed:
+                manifest.remove(relative_path)
+
+            # Re-embed new and modified files, flushing whole files at a time so
+            # the manifest only records files whose chunks are all written
+            pending_docs, pending_ids, pending_files = [], [], []
+
+            def flush():
+                old_ids = [
+                    chunk_id
+                    for relative_path, _, _ in pending_files
+                    for chunk_id in manifest.get_chunk_ids(relative_path)
+                ]
+                IncrementalIndexer._delete_ids(vector_store, old_ids)
+                keyword_index.remove(old_ids)
+                stats["chunks_deleted"] += len(old_ids)
+
+                upsert_stats = VectorStore.add_documents_in_batches(
+                    vector_store,
+                    pending_docs,
+                    batch_size=batch_size,
+                    keyword_index=keyword_index,
+                    ids=pending_ids,
+                    upsert_concurrency=upsert_concurrency
+                )
+                stats["chunks_written"] += upsert_stats["vectors"]
+                stats["upsert_seconds"] += upsert_stats["seconds"]
+
+                for relative_path, content_hash, chunk_ids in pending_files:
+                    manifest.update(relative_path, content_hash, chunk_ids)
+                manifest.save()
+
+                report(f"Upserted {stats['chunks_written']} chunks...")
+                pending_docs.clear()
+                pending_ids.clear()
+                pending_files.clear()
+
+            changed = added + modified
+            relative_paths = {file_paths[relative_path]: relative_path for relative_path in changed}
+
+            for file_path, documents, error in DocumentLoader.iter_file_results(
+                [file_paths[relative_path] for relative_path in changed],
+                workers=workers,
+                structured=chunking == "structure",
+                pdf_backend=pdf_backend,
+                timeout=file_timeout,
+                pages_per_task=pdf_pages_per_task
+            ):
+                if error is not None:
+                    stats["failures"][file_path] = error
+                    continue
+
+                relative_path = relative_paths[file_path]
+                content_hash = current_hashes[relative_path]
+                chunks = DocumentPreprocessor.chunk_documents(
+                    documents,
+                    chunk_size=chunk_size,
+                    chunk_overlap=chunk_overlap,
+                    tokenizer_name=embedding_model_name,
+                    strategy=chunking,
+                    embeddings=semantic_embeddings,
+                    similarity_threshold=0.5 if semantic_threshold is None else semantic_threshold
+                )
+                chunk_ids = [
+                    IngestManifest.chunk_id(relative_path, content_hash, position)
+                    for position in range(len(chunks))
+                ]
+
+                pending_docs.extend(chunks)
+                pending_ids.extend(chunk_ids)
+                pending_files.append((relative_path, content_hash, chunk_ids))
+
+                if len(pending_docs) >= batch_size:
+                    flush()
+
+            if pending_files:
+                flush()
+        finally:
+            manifest.save()
+            keyword_index.save(keyword_index_path)
+
+            # Persist vectors inserted into an approximate index during the sync
+            if backend == "local":
+                vector_store.save_ann_index()
+
+            # Invalidate cached answers and search results of the old contents
+            if stats["chunks_written"] or stats["chunks_deleted"]:
+                IndexVersion.bump(index_name, backend)
+
+        return vector_store, stats
+
+    @staticmethod
+    def _delete_ids(vector_store, ids: List[str], batch_size: int = 1000):
+        """
+        Delete vectors by ID in batches (Pinecone accepts at most 1000 IDs per call).
+
+        Args:
+            vector_store: Vector store to delete from.
+            ids: IDs of the vectors to delete.
+            batch_size: Maximum number of IDs per delete call.
+        """
+        for id_batch in batched(ids, batch_size):
+            vector_store.delete(ids=id_batch)
@@ -0,0 +1,70 @@
+from typing import Optional
+import os
+import uuid
+
+from .storage import get_state_dir
+
+class IndexVersion:
+    """
+    Opaque version token of an index, changed every time its contents change.
+
+    The token lives in a small file under the state directory so that an
+    ingest run from the command line invalidates the caches of a running app.
+    Caches of answers and search results store the token they were computed
+    against and discard entries once it changes.
+    """
+
+    @staticmethod
+    def path(index_name: str, backend: str = "pinecone") -> str:
+        """
+        Get the location of the version file of an index.
+
+        Args:
+            index_name: Name of the index.
+            backend: Vector store backend holding the index.
+
+        Returns:
+            Path to the version file.
+        """
+        return os.path.join(get_state_dir("index_versions", backend), index_name)
+
+    @staticmethod
+    def get(index_name: str, backend: str = "pinecone") -> Optional[str]:
+        """
+        Get the current version token of an index.
+
+        Args:
+            index_name: Name of the index.
+            backend: Vector store backend holding the index.
+
+        Returns:
+            Version token, or None if the index was never ingested into.
+        """
+        try:
+            with open(IndexVersion.path(index_name, backend), "r", encoding="utf-8") as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def bump(index_name: str, backend: str = "pinecone") -> str:
+        """
+        Record that the contents of an index changed.
+
+        Args:
+            index_name: Name of the index.
+            backend: Vector store backend holding the index.
+
+        Returns:
+            New version token.
+        """
+        version = uuid.uuid4().hex
+        path = IndexVersion.path(index_name, backend)
+        tmp_path = f"{path}.tmp"
+
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(version)
+
+        os.replace(tmp_path, path)
+
+        return version
@@ -0,0 +1,554 @@
+from typing import List, Dict, Any, Optional, Iterable, Tuple, Callable
+import os
+import json
+import uuid
+import shutil
+import threading
+
+import numpy as np
+from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore as BaseVectorStore
+
+from .storage import get_state_dir
+from .ann_index import IVFPQIndex
+
+class LocalVectorStore(BaseVectorStore):
+    """
+    Embedded vector store backed by a memory-mapped float32 matrix.
+
+    Vectors are L2-normalized on insert and stored in `vectors.npy`, so cosine
+    similarity is a single matrix-vector product. Texts and metadata are kept
+    in an append-only `docstore.jsonl` log (adds and deletes) that is replayed
+    on load. Deleted rows are masked out until the next `compact()`.
+
+    For large corpora an approximate IVF-PQ index can be built with
+    `build_ann_index()`. Searches then scan only `nprobe` inverted lists and
+    re-score the `refine_factor * k` best candidates exactly.
+    """
+
+    def __init__(self, embedding: Embeddings, persist_dir: str):
+        """
+        Initialize the store, loading any existing data from `persist_dir`.
+
+        Args:
+            embedding: Embeddings model used for texts and queries.
+            persist_dir: Directory holding the vector matrix and the docstore.
+        """
+        self._embedding = embedding
+        self.persist_dir = persist_dir
+        self.vectors_path = os.path.join(persist_dir, "vectors.npy")
+        self.docstore_path = os.path.join(persist_dir, "docstore.jsonl")
+        self.ann_path = os.path.join(persist_dir, "ann.npz")
+        self.ann_index: Optional[IVFPQIndex] = None
+        self.refine_factor = 8
+        self.vectors = None
+        self.alive = np.zeros(0, dtype=bool)
+        self.count = 0
+        self.ids: List[Optional[str]] = []
+        self.texts: List[Optional[str]] = []
+        self.metadatas: List[Optional[Dict[str, Any]]] = []
+        self.rows_by_id: Dict[str, int] = {}
+        self._lock = threading.RLock()
+
+        os.makedirs(persist_dir, exist_ok=True)
+        self._load()
+
+    @staticmethod
+    def default_dir(index_name: str) -> str:
+        """
+        Get the default directory of a local index.
+
+        Args:
+            index_name: Name of the index.
+
+        Returns:
+            Path to the index directory.
+        """
+        return os.path.join(get_state_dir("vector_store"), index_name)
+
+    @staticmethod
+    def delete_index(index_name: str) -> bool:
+        """
+        Delete a local index from disk if it exists.
+
+        Args:
+            index_name: Name of the index.
+
+        Returns:
+            Whether an index was deleted.
+        """
+        persist_dir = LocalVectorStore.default_dir(index_name)
+
+        if not os.path.exists(persist_dir):
+            return False
+
+        shutil.rmtree(persist_dir)
+        return True
+
+    @property
+    def embeddings(self) -> Embeddings:
+        """Embeddings model used by the store."""
+        return self._embedding
+
+    @property
+    def dimension(self) -> Optional[int]:
+        """Dimension of the stored vectors, or None while the store is empty."""
+        return None if self.vectors is None else self.vectors.shape[1]
+
+    def __len__(self) -> int:
+        """Number of live (non-deleted) vectors."""
+        return len(self.rows_by_id)
+
+    def _load(self):
+        """Map the vector matrix, replay the docstore log and load the ANN index."""
+        if not os.path.exists(self.vectors_path):
+            return
+
+        self._load_vectors()
+
+        if os.path.exists(self.ann_path):
+            self.ann_index = IVFPQIndex.load(self.ann_path)
+
+            # Encode rows added since the index was last saved
+            covered = max((int(ids.max()) + 1 for parts in self.ann_index.list_ids for ids in parts if len(ids)), default=0)
+            if covered < self.count:
+                self.ann_index.add(self.vectors[covered:self.count], np.arange(covered, self.count))
+
+    def _load_vectors(self):
+        """Map the vector matrix and replay the docstore log."""
+        self.vectors = np.load(self.vectors_path, mmap_mode="r+")
+        self.alive = np.zeros(self.vectors.shape[0], dtype=bool)
+
+        if not os.path.exists(self.docstore_path):
+            return
+
+        with open(self.docstore_path, "r", encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+
+                if "delete" in record:
+                    self._mark_deleted(record["delete"])
+                    continue
+
+                row = record["row"]
+                self._mark_deleted(record["id"])
+                self._ensure_rows(row + 1)
+                self.ids[row] = record["id"]
+                self.texts[row] = record["text"]
+                self.metadatas[row] = record["metadata"]
+                self.rows_by_id[record["id"]] = row
+                self.alive[row] = True
+                self.count = max(self.count, row + 1)
+
+    def _ensure_rows(self, size: int):
+        """Grow the in-memory row lists to at least `size` entries."""
+        missing = size - len(self.ids)
+
+        if missing > 0:
+            self.ids.extend([None] * missing)
+            self.texts.extend([None] * missing)
+            self.metadatas.extend([None] * missing)
+
+    def _mark_deleted(self, doc_id: str) -> bool:
+        """Mask out the row of an ID, returning whether it existed."""
+        row = self.rows_by_id.pop(doc_id, None)
+
+        if row is None:
+            return False
+
+        self.alive[row] = False
+        self.texts[row] = None
+        self.metadatas[row] = None
+        return True
+
+    def _reserve(self, extra: int, dimension: int):
+        """Make room for `extra` more rows, doubling the matrix when full."""
+        if self.vectors is None:
+            capacity = max(1024, extra)
+        elif self.count + extra > self.vectors.shape[0]:
+            capacity = max(self.vectors.shape[0] * 2, self.count + extra)
+        else:
+            return
+
+        tmp_path = os.path.join(self.persist_dir, "vectors.tmp.npy")
+        vectors = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=(capacity, dimension))
+
+        if self.vectors is not None:
+            vectors[:self.count] = self.vectors[:self.count]
+            del self.vectors
+
+        vectors.flush()
+        del vectors
+        os.replace(tmp_path, self.vectors_path)
+
+        self.vectors = np.load(self.vectors_path, mmap_mode="r+")
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:len(self.alive)] = self.alive
+        self.alive = alive
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        """L2-normalize rows, leaving zero vectors untouched."""
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def add_embeddings(
+        self,
+        texts: List[str],
+        embeddings: List[List[float]],
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        ids: Optional[List[str]] = None
+    ) -> List[str]:
+        """
+        Add precomputed embeddings, replacing any existing vectors with the same IDs.
+
+        Args:
+            texts: Texts of the vectors.
+            embeddings: Vectors, one per text.
+            metadatas: Optional metadata dicts, one per text.
+            ids: Optional IDs, one per text (random UUIDs by default).
+
+        Returns:
+            IDs of the added vectors.
+        """
+        if not texts:
+            return []
+
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        vectors = self._normalize(np.asarray(embeddings, dtype=np.float32))
+
+        with self._lock:
+            if self.vectors is not None and vectors.shape[1] != self.vectors.shape[1]:
+                raise ValueError(
+                    f"Embedding dimension {vectors.shape[1]} does not match index dimension {self.vectors.shape[1]}"
+                )
+
+            self._reserve(len(texts), vectors.shape[1])
+            start = self.count
+            self.vectors[start:start + len(texts)] = vectors
+            self.vectors.flush()
+            self._ensure_rows(start + len(texts))
+
+            with open(self.docstore_path, "a", encoding="utf-8") as f:
+                for offset, (doc_id, text, metadata) in enumerate(zip(ids, texts, metadatas)):
+                    row = start + offset
+                    self._mark_deleted(doc_id)
+                    self.ids[row] = doc_id
+                    self.texts[row] = text
+                    self.metadatas[row] = dict(metadata)
+                    self.rows_by_id[doc_id] = row
+                    self.alive[row] = True
+                    f.write(json.dumps({"row": row, "id": doc_id, "text": text, "metadata": metadata}) + "\n")
+
+            self.count = start + len(texts)
+
+            if self.ann_index is not None:
+                self.ann_index.add(vectors, np.arange(start, start + len(texts)))
+
+        return list(ids)
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any
+    ) -> List[str]:
+        """
+        Embed and add texts.
+
+        Args:
+            texts: Texts to add.
+            metadatas: Optional metadata dicts, one per text.
+            ids: Optional IDs, one per text.
+
+        Returns:
+            IDs of the added vectors.
+        """
+        texts = list(texts)
+        embeddings = self._embedding.embed_documents(texts)
+        return self.add_embeddings(texts, embeddings, metadatas=metadatas, ids=ids)
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        """
+        Delete vectors by ID.
+
+        Args:
+            ids: IDs to delete.
+
+        Returns:
+            True if the IDs were processed.
+        """
+        if not ids:
+            return True
+
+        with self._lock:
+            with open(self.docstore_path, "a", encoding="utf-8") as f:
+                for doc_id in ids:
+                    if self._mark_deleted(doc_id):
+                        f.write(json.dumps({"delete": doc_id}) + "\n")
+
+        return True
+
+    def get_by_ids(self, ids: List[str]) -> List[Document]:
+        """
+        Get documents by ID, skipping IDs that don't exist.
+
+        Args:
+            ids: IDs to look up.
+
+        Returns:
+            List of documents.
+        """
+        with self._lock:
+            return [self._document(self.rows_by_id[doc_id]) for doc_id in ids if doc_id in self.rows_by_id]
+
+    def get_vectors_by_ids(self, ids: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Get the stored (normalized) vectors of documents by ID.
+
+        Args:
+            ids: IDs to look up (unknown IDs are skipped).
+
+        Returns:
+            Mapping of ID to vector.
+        """
+        with self._lock:
+            return {doc_id: np.array(self.vectors[self.rows_by_id[doc_id]]) for doc_id in ids if doc_id in self.rows_by_id}
+
+    def _document(self, row: int) -> Document:
+        """Build a Document for a row."""
+        return Document(id=self.ids[row], page_content=self.texts[row], metadata=dict(self.metadatas[row]))
+
+    def _filter_mask(self, filter: Optional[Dict[str, Any]], count: int) -> Optional[np.ndarray]:
+        """Build a row mask for an equality metadata filter."""
+        if not filter:
+            return None
+
+        return np.fromiter(
+            (
+                metadata is not None and all(metadata.get(key) == value for key, value in filter.items())
+                for metadata in self.metadatas[:count]
+            ),
+            dtype=bool,
+            count=count
+        )
+
+    def build_ann_index(self, nlist: Optional[int] = None, m: int = 48, nprobe: int = 16, seed: int = 0) -> IVFPQIndex:
+        """
+        Train and persist an IVF-PQ index over all rows.
+
+        Later inserts are encoded into the index incrementally.
+
+        Args:
+            nlist: Number of inverted lists (defaults to 4 * sqrt(rows)).
+            m: Number of PQ sub-quantizers.
+            nprobe: Default number of lists scanned per query.
+            seed: Random seed for training.
+
+        Returns:
+            The trained index.
+        """
+        with self._lock:
+            if self.vectors is None or self.count == 0:
+                raise ValueError("Cannot build an ANN index over an empty store")
+
+            vectors = self.vectors[:self.count]
+            nlist = nlist or max(1, int(4 * np.sqrt(self.count)))
+
+            index = IVFPQIndex(vectors.shape[1], nlist=nlist, m=m, nprobe=nprobe)
+            index.train(vectors, seed=seed)
+            index.add(vectors, np.arange(self.count))
+
+            self.ann_index = index
+            self.save_ann_index()
+
+            return index
+
+    def save_ann_index(self):
+        """Persist the ANN index, including rows inserted since it was built."""
+        with self._lock:
+            if self.ann_index is not None:
+                self.ann_index.save(self.ann_path)
+
+    def drop_ann_index(self):
+        """Remove the ANN index and go back to exact search."""
+        with self._lock:
+            self.ann_index = None
+
+            if os.path.exists(self.ann_path):
+                os.remove(self.ann_path)
+
+    def search_rows(
+        self,
+        query_vector: List[float],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        nprobe: Optional[int] = None,
+        exact: bool = False
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Cosine top-k over all live rows.
+
+        Uses the ANN index when one is built (and no filter is given),
+        otherwise a brute-force scan.
+
+        Args:
+            query_vector: Query embedding.
+            k: Number of results.
+            filter: Optional metadata equality filter.
+            nprobe: Number of inverted lists scanned by the ANN index.
+            exact: Whether to force a brute-force scan.
+
+        Returns:
+            Tuple of (row indices, cosine scores), best first.
+        """
+        with self._lock:
+            count = self.count
+
+            if self.vectors is None or count == 0:
+                return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+            query = self._normalize(np.asarray(query_vector, dtype=np.float32))
+
+            if self.ann_index is not None and not filter and not exact:
+                # Over-fetch approximate candidates, then re-score them exactly
+                candidates, _ = self.ann_index.search(query, k * self.refine_factor, nprobe=nprobe)
+                candidates = np.sort(candidates[self.alive[candidates]])
+                scores = self.vectors[candidates] @ query
+                top = np.argsort(-scores)[:k]
+                return candidates[top], scores[top]
+
+            scores = self.vectors[:count] @ query
+
+            mask = self.alive[:count]
+            filter_mask = self._filter_mask(filter, count)
+            if filter_mask is not None:
+                mask = mask & filter_mask
+            scores = np.where(mask, scores, -np.inf)
+
+        k = min(k, int(mask.sum()))
+        if k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        rows = np.argpartition(-scores, k - 1)[:k]
+        rows = rows[np.argsort(-scores[rows])]
+
+        return rows, scores[rows]
+
+    def similarity_search_with_score_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        """
+        Return the k most similar documents to a vector, with cosine scores.
+
+        Args:
+            embedding: Query embedding.
+            k: Number of results.
+            filter: Optional metadata equality filter.
+            **kwargs: `nprobe` and `exact` are passed to `search_rows`.
+
+        Returns:
+            List of (document, score) tuples, best first.
+        """
+        rows, scores = self.search_rows(
+            embedding,
+            k=k,
+            filter=filter,
+            nprobe=kwargs.get("nprobe"),
+            exact=kwargs.get("exact", False)
+        )
+
+        with self._lock:
+            return [(self._document(row), float(score)) for row, score in zip(rows, scores)]
+
+    def similarity_search_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        **kwargs: Any
+    ) -> List[Document]:
+        """Return the k most similar documents to a vector."""
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k=k, **kwargs)]
+
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: int = 4,
+        **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        """Return the k most similar documents to a query, with cosine scores."""
+        return self.similarity_search_with_score_by_vector(self._embedding.embed_query(query), k=k, **kwargs)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        """Return the k most similar documents to a query."""
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, **kwargs)]
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        """Scores are already cosine similarities."""
+        return lambda score: score
+
+    def compact(self):
+        """Rewrite the matrix and the docstore without deleted rows."""
+        with self._lock:
+            if self.vectors is None:
+                return
+
+            rows = [row for row in range(self.count) if self.alive[row]]
+            vectors = np.array(self.vectors[rows]) if rows else np.zeros((0, self.vectors.shape[1]), dtype=np.float32)
+            texts = [self.texts[row] for row in rows]
+            metadatas = [self.metadatas[row] for row in rows]
+            ids = [self.ids[row] for row in rows]
+
+            del self.vectors
+            for path in (self.vectors_path, self.docstore_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+            self.vectors = None
+            self.alive = np.zeros(0, dtype=bool)
+            self.count = 0
+            self.ids, self.texts, self.metadatas, self.rows_by_id = [], [], [], {}
+
+            # Row numbers change, so the ANN index is rebuilt from scratch
+            rebuild_ann = self.ann_index is not None
+            self.drop_ann_index()
+            self.add_embeddings(texts, vectors, metadatas=metadatas, ids=ids)
+
+            if rebuild_ann and self.count:
+                self.build_ann_index()
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        ids: Optional[List[str]] = None,
+        persist_dir: Optional[str] = None,
+        index_name: str = "personal-knowledge-assistant",
+        **kwargs: Any
+    ) -> "LocalVectorStore":
+        """
+        Create a local vector store from texts.
+
+        Args:
+            texts: Texts to add.
+            embedding: Embeddings model.
+            metadatas: Optional metadata dicts, one per text.
+            ids: Optional IDs, one per text.
+            persist_dir: Directory of the store (defaults to one per index name).
+            index_name: Name of the index, used for the default directory.
+
+        Returns:
+            Local vector store.
+        """
+        store = cls(embedding, persist_dir or cls.default_dir(index_name))
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
@@ -0,0 +1,92 @@
+from typing import Dict, Any, Optional, Hashable
+import threading
+from collections import OrderedDict
+
+class LRUCache:
+    """
+    Thread-safe in-memory cache with a least-recently-used eviction policy.
+
+    Holds at most `max_entries` values and counts hits, misses and evictions.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        """
+        Initialize an empty cache.
+
+        Args:
+            max_entries: Maximum number of cached values.
+        """
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Number of cached values."""
+        return len(self.entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Get a cached value and mark it as recently used.
+
+        Args:
+            key: Cache key.
+
+        Returns:
+            Cached value, or None on a miss.
+        """
+        with self._lock:
+            value = self.entries.get(key)
+
+            if value is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self.entries.move_to_end(key)
+
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        """
+        Cache a value, evicting the least recently used one if the cache is full.
+
+        Args:
+            key: Cache key.
+            value: Value to cache (None values are not cached).
+        """
+        if value is None:
+            return
+
+        with self._lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every cached value."""
+        with self._lock:
+            self.entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get hit/miss statistics.
+
+        Returns:
+            Dict with entries, capacity, hits, misses, hit rate and evictions.
+        """
+        lookups = self.hits + self.misses
+
+        return {
+            "entries": len(self.entries),
+            "capacity": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,164 @@
+from typing import List, Dict, Any, Optional, Tuple
+import os
+import json
+import hashlib
+
+from .storage import get_state_dir
+
+class IngestManifest:
+    """
+    Record of the files in an index, with their content hash and chunk IDs.
+
+    The manifest lets ingestion skip unchanged files, re-embed only new or
+    modified ones and delete the vectors of files that disappeared.
+    """
+
+    def __init__(self, path: str, settings: Optional[Dict[str, Any]] = None, files: Optional[Dict[str, Dict[str, Any]]] = None):
+        """
+        Initialize the manifest.
+
+        Args:
+            path: Path of the JSON file backing the manifest.
+            settings: Ingest settings the recorded chunks were produced with.
+            files: Mapping of relative file path to {"hash": ..., "chunk_ids": [...]}.
+        """
+        self.path = path
+        self.settings = settings or {}
+        self.files = files or {}
+
+    @staticmethod
+    def default_path(index_name: str, backend: str = "pinecone") -> str:
+        """
+        Get the default manifest location for an index.
+
+        Args:
+            index_name: Name of the index.
+            backend: Vector store backend holding the index.
+
+        Returns:
+            Path to the manifest file.
+        """
+        return os.path.join(get_state_dir("manifests", backend), f"{index_name}.json")
+
+    @staticmethod
+    def discard(index_name: str, backend: str = "pinecone"):
+        """
+        Delete the manifest of an index, e.g. after the index itself was deleted.
+
+        Args:
+            index_name: Name of the index.
+            backend: Vector store backend holding the index.
+        """
+        path = IngestManifest.default_path(index_name, backend)
+
+        if os.path.exists(path):
+            os.remove(path)
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        """Check whether a manifest file exists at the given path."""
+        return os.path.exists(path)
+
+    @staticmethod
+    def load(path: str) -> "IngestManifest":
+        """
+        Load a manifest from disk, or return an empty one if it doesn't exist.
+
+        Args:
+            path: Path to the manifest file.
+
+        Returns:
+            Manifest instance.
+        """
+        if not os.path.exists(path):
+            return IngestManifest(path)
+
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        return IngestManifest(path, settings=data.get("settings"), files=data.get("files"))
+
+    def save(self):
+        """Atomically write the manifest to disk."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"settings": self.settings, "files": self.files}, f)
+
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def hash_file(file_path: str, block_size: int = 1 << 20) -> str:
+        """
+        Compute the SHA-256 hash of a file's content.
+
+        Args:
+            file_path: Path to the file.
+            block_size: Number of bytes read at a time.
+
+        Returns:
+            Hex digest of the content.
+        """
+        digest = hashlib.sha256()
+
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(block_size), b""):
+                digest.update(block)
+
+        return digest.hexdigest()
+
+    @staticmethod
+    def chunk_id(relative_path: str, content_hash: str, position: int) -> str:
+        """
+        Build a deterministic vector ID for a chunk of a file.
+
+        Args:
+            relative_path: File path relative to the ingested directory.
+            content_hash: Content hash of the file.
+            position: Index of the chunk within the file.
+
+        Returns:
+            Chunk ID.
+        """
+        key = f"{relative_path}\0{content_hash}\0{position}"
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+    def diff(self, current_hashes: Dict[str, str]) -> Tuple[List[str], List[str], List[str], List[str]]:
+        """
+        Compare the current directory contents with the manifest.
+
+        Args:
+            current_hashes: Mapping of relative file path to content hash.
+
+        Returns:
+            Tuple of (added, modified, removed, unchanged) relative paths.
+        """
+        added, modified, unchanged = [], [], []
+
+        for relative_path, content_hash in sorted(current_hashes.items()):
+            entry = self.files.get(relative_path)
+
+            if entry is None:
+                added.append(relative_path)
+            elif entry["hash"] != content_hash:
+                modified.append(relative_path)
+            else:
+                unchanged.append(relative_path)
+
+        removed = sorted(set(self.files) - set(current_hashes))
+
+        return added, modified, removed, unchanged
+
+    def get_chunk_ids(self, relative_path: str) -> List[str]:
+        """Get the chunk IDs recorded for a file."""
+        entry = self.files.get(relative_path)
+        return list(entry["chunk_ids"]) if entry else []
+
+    def update(self, relative_path: str, content_hash: str, chunk_ids: List[str]):
+        """Record the content hash and chunk IDs of a file."""
+        self.files[relative_path] = {"hash": content_hash, "chunk_ids": list(chunk_ids)}
+
+    def remove(self, relative_path: str):
+        """Forget a file."""
+        self.files.pop(relative_path, None)
@@ -0,0 +1,225 @@
+from typing import List, Dict, Any, Optional, Iterator
+import time
+import signal
+import threading
+from contextlib import contextmanager
+
+from langchain.schema import Document
+from langchain_community.document_loaders import PyPDFLoader
+
+class PDFBackend:
+    """
+    Interface of a PDF text extraction backend.
+
+    Backends yield one document per page, with "source", "page" (zero-based)
+    and "total_pages" metadata, and can extract a range of pages on its own
+    so pages of one large file can be split across workers.
+    """
+
+    name = ""
+
+    @staticmethod
+    def page_count(file_path: str) -> int:
+        """
+        Count the pages of a PDF.
+
+        Args:
+            file_path: Path to the PDF.
+
+        Returns:
+            Number of pages.
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def iter_pages(file_path: str, start: int = 0, stop: Optional[int] = None) -> Iterator[Document]:
+        """
+        Lazily extract the text of a range of pages.
+
+        Args:
+            file_path: Path to the PDF.
+            start: First page (zero-based).
+            stop: Page after the last one (defaults to the end of the file).
+
+        Yields:
+            One document per page, in page order.
+        """
+        raise NotImplementedError
+
+class PyPDFBackend(PDFBackend):
+    """
+    Pure-Python extraction with pypdf.
+
+    Whole files go through `PyPDFLoader.lazy_load()`, exactly like the
+    default loader; page ranges are read with pypdf directly and carry the
+    same page metadata, without the PDF's document information entries.
+    """
+
+    name = "pypdf"
+
+    @staticmethod
+    def page_count(file_path: str) -> int:
+        """Count the pages of a PDF."""
+        import pypdf
+
+        return len(pypdf.PdfReader(file_path).pages)
+
+    @staticmethod
+    def iter_pages(file_path: str, start: int = 0, stop: Optional[int] = None) -> Iterator[Document]:
+        """Lazily extract the text of a range of pages."""
+        if start == 0 and stop is None:
+            yield from PyPDFLoader(file_path).lazy_load()
+            return
+
+        import pypdf
+
+        reader = pypdf.PdfReader(file_path)
+        total_pages = len(reader.pages)
+
+        for page_number in range(start, min(stop or total_pages, total_pages)):
+            yield Document(
+                page_content=reader.pages[page_number].extract_text().strip(),
+                metadata={
+                    "source": file_path,
+                    "total_pages": total_pages,
+                    "page": page_number,
+                    "page_label": reader.page_labels[page_number],
+                }
+            )
+
+class PdfiumBackend(PDFBackend):
+    """
+    Fast text-layer extraction with PDFium (pypdfium2).
+
+    Reads the text layer in native code, typically an order of magnitude
+    faster than pypdf on long manuals. Like pypdf it doesn't OCR, so image-only
+    pages come back empty.
+    """
+
+    name = "pdfium"
+
+    @staticmethod
+    def page_count(file_path: str) -> int:
+        """Count the pages of a PDF."""
+        import pypdfium2
+
+        pdf = pypdfium2.PdfDocument(file_path)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+
+    @staticmethod
+    def iter_pages(file_path: str, start: int = 0, stop: Optional[int] = None) -> Iterator[Document]:
+        """Lazily extract the text of a range of pages."""
+        import pypdfium2
+
+        pdf = pypdfium2.PdfDocument(file_path)
+        try:
+            total_pages = len(pdf)
+
+            for page_number in range(start, min(stop or total_pages, total_pages)):
+                page = pdf[page_number]
+                text_page = page.get_textpage()
+                try:
+                    text = text_page.get_text_range()
+                finally:
+                    text_page.close()
+                    page.close()
+
+                yield Document(
+                    page_content=text.strip(),
+                    metadata={"source": file_path, "total_pages": total_pages, "page": page_number}
+                )
+        finally:
+            pdf.close()
+
+# Selectable PDF extraction backends
+PDF_BACKENDS: Dict[str, type] = {
+    PyPDFBackend.name: PyPDFBackend,
+    PdfiumBackend.name: PdfiumBackend,
+}
+
+def get_pdf_backend(name: str) -> type:
+    """
+    Look up a PDF extraction backend by name.
+
+    Args:
+        name: Backend name, one of PDF_BACKENDS.
+
+    Returns:
+        Backend class.
+    """
+    if name not in PDF_BACKENDS:
+        raise ValueError(f"Unsupported PDF backend: {name}")
+    return PDF_BACKENDS[name]
+
+@contextmanager
+def time_limit(seconds: Optional[float]):
+    """
+    Raise TimeoutError in the block once `seconds` have passed.
+
+    Uses SIGALRM, which only works in the main thread of a Unix process
+    (e.g. the CLI or a pool worker); elsewhere the block runs unbounded.
+    `DocumentLoader.iter_file_results` therefore loads files in worker
+    processes whenever a timeout is set.
+
+    Args:
+        seconds: Time limit (None for no limit).
+    """
+    if (
+        seconds is None
+        or not hasattr(signal, "setitimer")
+        or threading.current_thread() is not threading.main_thread()
+    ):
+        yield
+        return
+
+    def raise_timeout(signum, frame):
+        raise TimeoutError(f"Timed out after {seconds:g}s")
+
+    previous = signal.signal(signal.SIGALRM, raise_timeout)
+    signal.setitimer(signal.ITIMER_REAL, max(seconds, 1e-3))
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+def iter_with_timeout(pages: Iterator[Document], timeout: Optional[float]) -> Iterator[Document]:
+    """
+    Bound the time spent producing pages.
+
+    Only the time spent extracting counts, not the time the consumer spends
+    between pages, so a file can be streamed into chunking and embedding
+    without those eating its budget. A page that hangs is interrupted when
+    the alarm is available (see `time_limit`); otherwise the budget is
+    checked between pages.
+
+    Args:
+        pages: Page iterator.
+        timeout: Extraction time budget in seconds (None for no limit).
+
+    Yields:
+        The pages, until the budget runs out (then TimeoutError is raised).
+    """
+    if timeout is None:
+        yield from pages
+        return
+
+    remaining = timeout
+    while True:
+        if remaining <= 0:
+            raise TimeoutError(f"Timed out after {timeout:g}s")
+
+        start = time.perf_counter()
+        try:
+            with time_limit(remaining):
+                page = next(pages, None)
+        except TimeoutError:
+            raise TimeoutError(f"Timed out after {timeout:g}s") from None
+        remaining -= time.perf_counter() - start
+
+        if page is None:
+            return
+        yield page
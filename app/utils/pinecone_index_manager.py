@@ -0,0 +1,320 @@
+from typing import List, Dict, Any, Optional, Set, Callable, Tuple
+import time
+import threading
+
+from pinecone import ServerlessSpec
+from pinecone.exceptions import NotFoundException
+
+class PineconeIndexManager:
+    """
+    Control-plane helper that creates, deletes and waits for Pinecone indexes.
+
+    One client is reused for every call and index names and descriptions are
+    cached for `cache_ttl` seconds, so repeated lookups (does the index
+    exist, what is its host) cost no round-trips once the index is ready.
+    Creates and deletes through the manager update the cache; indexes
+    created elsewhere are found by re-listing once on a miss, and the expiry
+    picks up indexes deleted elsewhere. Instead of sleeping a fixed time
+    after a create or delete, the manager polls the index status with an
+    adaptive backoff: the first checks come quickly, later ones are spaced
+    out up to `max_poll_interval`.
+    """
+
+    def __init__(
+        self,
+        client,
+        poll_interval: float = 0.1,
+        max_poll_interval: float = 2.0,
+        timeout: float = 300.0,
+        cloud: str = "aws",
+        region: str = "us-east-1",
+        cache_ttl: float = 60.0
+    ):
+        """
+        Initialize the manager.
+
+        Args:
+            client: Pinecone client.
+            poll_interval: Delay before the second status check, in seconds.
+            max_poll_interval: Upper bound of the delay between status checks.
+            timeout: Default number of seconds to wait for an index to become
+                ready or disappear.
+            cloud: Cloud of the serverless spec used for new indexes.
+            region: Region of the serverless spec used for new indexes.
+            cache_ttl: Seconds after which cached names and descriptions are
+                fetched again.
+        """
+        self.client = client
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.timeout = timeout
+        self.cloud = cloud
+        self.region = region
+        self.cache_ttl = cache_ttl
+        self._names: Optional[Set[str]] = None
+        self._names_fetched_at = 0.0
+        self._descriptions: Dict[str, Tuple[Any, float]] = {}
+        self._creating: Set[str] = set()
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _is_ready(description) -> bool:
+        """Whether an index description reports the index as ready."""
+        return bool(description is not None and description.status["ready"])
+
+    def _is_fresh(self, fetched_at: float) -> bool:
+        """Whether a cached value fetched at `fetched_at` can still be used."""
+        return time.monotonic() - fetched_at < self.cache_ttl
+
+    def invalidate(self, index_name: Optional[str] = None):
+        """
+        Drop cached index information, e.g. after an index changed elsewhere.
+
+        Args:
+            index_name: Index whose description to drop (all cached
+                information if omitted; the name list is always dropped).
+        """
+        with self._lock:
+            self._names = None
+            if index_name is None:
+                self._descriptions.clear()
+            else:
+                self._descriptions.pop(index_name, None)
+
+    def list_index_names(self, refresh: bool = False) -> Set[str]:
+        """
+        Get the names of the existing indexes (cached for `cache_ttl` seconds).
+
+        Descriptions of indexes that are no longer listed are dropped.
+
+        Args:
+            refresh: Whether to ask the service again.
+
+        Returns:
+            Set of index names.
+        """
+        with self._lock:
+            if self._names is None or refresh or not self._is_fresh(self._names_fetched_at):
+                self._names = set(self.client.list_indexes().names())
+                self._names_fetched_at = time.monotonic()
+                for index_name in set(self._descriptions) - self._names:
+                    del self._descriptions[index_name]
+
+            return set(self._names)
+
+    def exists(self, index_name: str, refresh: bool = False) -> bool:
+        """
+        Check whether an index exists, re-listing once if it isn't cached.
+
+        Args:
+            index_name: Name of the index.
+            refresh: Whether to ask the service even if the name is cached.
+
+        Returns:
+            True if the index exists.
+        """
+        if index_name in self.list_index_names(refresh=refresh):
+            return True
+
+        return not refresh and index_name in self.list_index_names(refresh=True)
+
+    def describe(self, index_name: str, refresh: bool = False):
+        """
+        Describe an index, reusing the cached description once the index is ready.
+
+        Args:
+            index_name: Name of the index.
+            refresh: Whether to ask the service even if a description is cached.
+
+        Returns:
+            Index description, or None if the index doesn't exist.
+        """
+        with self._lock:
+            description, fetched_at = self._descriptions.get(index_name, (None, 0.0))
+            if description is not None and not refresh and self._is_ready(description) and self._is_fresh(fetched_at):
+                return description
+
+        try:
+            description = self.client.describe_index(index_name)
+        except NotFoundException:
+            description = None
+
+        with self._lock:
+            if description is None:
+                self._descriptions.pop(index_name, None)
+                if self._names is not None:
+                    self._names.discard(index_name)
+            else:
+                self._descriptions[index_name] = (description, time.monotonic())
+                if self._names is not None:
+                    self._names.add(index_name)
+
+        return description
+
+    def create_index(
+        self,
+        index_name: str,
+        dimension: int = 384,
+        metric: str = "cosine",
+        wait: bool = False
+    ):
+        """
+        Start creating an index without waiting for it to become ready.
+
+        Callers can do other work (e.g. load the embeddings model) and call
+        `wait_until_ready` right before the first data-plane request.
+
+        Args:
+            index_name: Name of the index.
+            dimension: Dimension of the embeddings.
+            metric: Distance metric.
+            wait: Whether to block until the index is ready.
+
+        Returns:
+            Index description once ready if `wait` is set, otherwise None.
+        """
+        self.client.create_index(
+            name=index_name,
+            dimension=dimension,
+            metric=metric,
+            spec=ServerlessSpec(cloud=self.cloud, region=self.region),
+            timeout=-1
+        )
+
+        with self._lock:
+            self._descriptions.pop(index_name, None)
+            self._creating.add(index_name)
+            if self._names is not None:
+                self._names.add(index_name)
+
+        if wait:
+            return self.wait_until_ready(index_name)
+
+        return None
+
+    def delete_index(self, index_name: str, wait: bool = True) -> bool:
+        """
+        Delete an index if it exists.
+
+        Args:
+            index_name: Name of the index.
+            wait: Whether to block until the service no longer lists the
+                index (required before re-creating an index with the same name).
+
+        Returns:
+            True if an index was deleted.
+        """
+        if not self.exists(index_name):
+            return False
+
+        try:
+            self.client.delete_index(index_name, timeout=-1)
+        except NotFoundException:
+            pass
+
+        with self._lock:
+            self._descriptions.pop(index_name, None)
+            self._creating.discard(index_name)
+            if self._names is not None:
+                self._names.discard(index_name)
+
+        if wait:
+            self.wait_until_deleted(index_name)
+
+        return True
+
+    def wait_until_ready(self, index_name: str, timeout: Optional[float] = None):
+        """
+        Block until an index is ready to serve requests.
+
+        Only an index that exists, or whose creation this manager started,
+        is waited for; a missing index fails right away.
+
+        Args:
+            index_name: Name of the index.
+            timeout: Maximum number of seconds to wait (defaults to the manager setting).
+
+        Returns:
+            Index description.
+
+        Raises:
+            ValueError: If the index doesn't exist.
+        """
+        description = self.describe(index_name)
+        if self._is_ready(description):
+            return description
+
+        def fetch():
+            description = self.describe(index_name, refresh=True)
+            with self._lock:
+                if description is None and index_name not in self._creating:
+                    raise ValueError(f"Pinecone index {index_name} does not exist")
+                if self._is_ready(description):
+                    self._creating.discard(index_name)
+            return description
+
+        return self._poll(
+            fetch,
+            self._is_ready,
+            timeout,
+            f"Pinecone index {index_name} to become ready"
+        )
+
+    def wait_until_deleted(self, index_name: str, timeout: Optional[float] = None):
+        """
+        Block until an index no longer exists.
+
+        Args:
+            index_name: Name of the index.
+            timeout: Maximum number of seconds to wait (defaults to the manager setting).
+        """
+        self._poll(
+            lambda: self.describe(index_name, refresh=True),
+            lambda description: description is None,
+            timeout,
+            f"Pinecone index {index_name} to be deleted"
+        )
+
+    def get_host(self, index_name: str) -> str:
+        """
+        Get the data-plane host of an index, waiting for it to be ready.
+
+        Args:
+            index_name: Name of the index.
+
+        Returns:
+            Index host.
+
+        Raises:
+            ValueError: If the index doesn't exist.
+        """
+        return self.wait_until_ready(index_name).host
+
+    def _poll(self, fetch: Callable[[], Any], done: Callable[[Any], bool], timeout: Optional[float], what: str):
+        """
+        Call `fetch` until `done` accepts its result, backing off between calls.
+
+        Args:
+            fetch: Function returning the current state.
+            done: Predicate on the state.
+            timeout: Maximum number of seconds to wait.
+            what: Description used in the timeout error.
+
+        Returns:
+            The accepted state.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        interval = self.poll_interval
+
+        while True:
+            state = fetch()
+            if done(state):
+                return state
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"Timed out after {timeout:.0f}s waiting for {what}")
+
+            time.sleep(min(interval, remaining))
+            interval = min(interval * 1.5, self.max_poll_interval)
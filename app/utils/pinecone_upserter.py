@@ -0,0 +1,155 @@
+from typing import List, Dict, Any, Optional, Iterable, Tuple, Callable
+import time
+import random
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
+
+from langchain.schema import Document
+
+class PineconeUpserter:
+    """
+    Pipelined embed-and-upsert writer for a Pinecone index.
+
+    Batches are embedded on the calling thread while earlier batches are
+    upserted on a small I/O thread pool, so CPU-bound embedding of batch N+1
+    overlaps the network round-trip of batch N. At most `max_concurrency`
+    upserts are in flight; failed upserts are retried with exponential
+    backoff and jitter.
+
+    The index is any object with an `upsert(vectors=..., namespace=...)`
+    method, so the writer can be pointed at a local fake Pinecone server
+    (see `VectorStore.get_pinecone_index` and the PINECONE_HOST /
+    PINECONE_INDEX_HOST environment variables) or at a test double.
+    """
+
+    def __init__(
+        self,
+        index,
+        embeddings,
+        batch_size: int = 100,
+        max_concurrency: int = 4,
+        max_retries: int = 5,
+        backoff_seconds: float = 0.5,
+        text_key: str = "text",
+        namespace: Optional[str] = None
+    ):
+        """
+        Initialize the writer.
+
+        Args:
+            index: Pinecone index handle (reused for every request so its
+                HTTP connections stay pooled).
+            embeddings: Embeddings model for the chunk texts.
+            batch_size: Number of vectors per embed/upsert batch.
+            max_concurrency: Maximum number of upserts in flight.
+            max_retries: Number of retries per batch before giving up.
+            backoff_seconds: Base delay of the exponential backoff.
+            text_key: Metadata key holding the chunk text (what
+                PineconeVectorStore reads back at query time).
+            namespace: Optional Pinecone namespace.
+        """
+        self.index = index
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.text_key = text_key
+        self.namespace = namespace
+        self.retries = 0
+
+    def _upsert_with_retry(self, vectors: List[Tuple[str, List[float], Dict[str, Any]]]) -> float:
+        """
+        Upsert one batch, retrying transient failures.
+
+        Args:
+            vectors: (id, values, metadata) tuples.
+
+        Returns:
+            Seconds spent in the upsert call(s).
+        """
+        start = time.perf_counter()
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.index.upsert(vectors=vectors, namespace=self.namespace)
+                return time.perf_counter() - start
+            except Exception:
+                if attempt == self.max_retries:
+                    raise
+
+                self.retries += 1
+                delay = self.backoff_seconds * (2 ** attempt)
+                time.sleep(delay + random.uniform(0, delay))
+
+    def upsert(
+        self,
+        documents: Iterable[Document],
+        ids: Iterable[str],
+        on_batch: Optional[Callable[[List[Document], List[str]], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Embed and upsert documents in pipelined batches.
+
+        Args:
+            documents: Documents to write.
+            ids: Vector IDs, one per document.
+            on_batch: Optional callback called with (documents, ids) once a
+                batch has been upserted.
+
+        Returns:
+            Throughput statistics (vectors, batches, retries, seconds,
+            embed/upsert seconds and vectors per second).
+        """
+        stats = {"vectors": 0, "batches": 0, "retries": 0, "embed_seconds": 0.0, "upsert_seconds": 0.0}
+        in_flight: deque = deque()
+        start = time.perf_counter()
+        self.retries = 0
+
+        def collect(entry: Tuple[Future, List[Document], List[str]]):
+            future, batch_docs, batch_ids = entry
+            stats["upsert_seconds"] += future.result()
+            stats["vectors"] += len(batch_docs)
+            stats["batches"] += 1
+
+            if on_batch is not None:
+                on_batch(batch_docs, batch_ids)
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="pinecone-upsert") as executor:
+            batch_docs, batch_ids = [], []
+
+            def submit():
+                embed_start = time.perf_counter()
+                values = self.embeddings.embed_documents([doc.page_content for doc in batch_docs])
+                stats["embed_seconds"] += time.perf_counter() - embed_start
+
+                vectors = [
+                    (doc_id, vector, {**doc.metadata, self.text_key: doc.page_content})
+                    for doc_id, vector, doc in zip(batch_ids, values, batch_docs)
+                ]
+
+                # Wait for the oldest upsert when the pipeline is full
+                if len(in_flight) >= self.max_concurrency:
+                    collect(in_flight.popleft())
+
+                in_flight.append((executor.submit(self._upsert_with_retry, vectors), list(batch_docs), list(batch_ids)))
+
+            for doc, doc_id in zip(documents, ids):
+                batch_docs.append(doc)
+                batch_ids.append(doc_id)
+
+                if len(batch_docs) >= self.batch_size:
+                    submit()
+                    batch_docs, batch_ids = [], []
+
+            if batch_docs:
+                submit()
+
+            while in_flight:
+                collect(in_flight.popleft())
+
+        stats["retries"] = self.retries
+        stats["seconds"] = time.perf_counter() - start
+        stats["vectors_per_second"] = stats["vectors"] / stats["seconds"] if stats["seconds"] else 0.0
+
+        return stats
@@ -1,8 +1,91 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Iterable, Iterator
 import re
+import itertools
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
 from langchain.schema import Document
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from .chunker import TokenChunker
+from .document_loaders import DocumentLoader
+
+# Characters that cp1252 decodes bytes 0x80-0x9F to; with latin-1 for
+# 0xA0-0xBF they are how UTF-8 continuation bytes look after a wrong decode
+_CP1252_CONTINUATION = "\u20ac\u201a\u0192\u201e\u2026\u2020\u2021\u02c6\u2030\u0160\u2039\u0152\u017d\u2018\u2019\u201c\u201d\u2022\u2013\u2014\u02dc\u2122\u0161\u203a\u0153\u017e\u0178"
+
+# Byte each mojibake character stands for (cp1252 specials, else latin-1)
+_MOJIBAKE_BYTES = {character: character.encode("cp1252") for character in _CP1252_CONTINUATION}
+
+# Everything clean_text repairs besides whitespace, in one character class so
+# the regex engine can skip ahead to candidates: control, zero-width and soft
+# hyphen characters, ligatures, and UTF-8 lead bytes decoded as cp1252/latin-1
+# ("â€™", "Ã©", "Â ") followed by their continuation characters
+NOISE_PATTERN = re.compile(
+    r"[\x00-\x08\x0e-\x1f\x7f\xad\u200b-\u200d\u2060\ufeff\ufb00-\ufb06\xc2-\xf4]"
+    rf"[\x80-\xbf{_CP1252_CONTINUATION}]{{0,3}}"
+)
+
+# Blank lines and page breaks, kept as paragraph breaks for the chunker
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n|[\x0c\u2029]")
+
+LIGATURES = {
+    "\ufb00": "ff",
+    "\ufb01": "fi",
+    "\ufb02": "fl",
+    "\ufb03": "ffi",
+    "\ufb04": "ffl",
+    "\ufb05": "st",
+    "\ufb06": "st",
+}
+
+def _repair_noise(match: re.Match) -> str:
+    """Replacement for one NOISE_PATTERN match."""
+    text = match.group()
+    
+    if len(text) > 1 and "\xc2" <= text[0] <= "\xf4":
+        try:
+            fixed = b"".join(_MOJIBAKE_BYTES.get(c) or c.encode("latin-1") for c in text).decode("utf-8")
+            return " " if fixed.isspace() else fixed
+        except UnicodeError:
+            pass
+    
+    # Not mojibake: expand ligatures and drop invisible characters, keeping
+    # legitimate accented letters such as "â" or "Ü"
+    first = text[0]
+    if "\xc2" <= first <= "\xf4":
+        return text
+    return LIGATURES.get(first, "") + text[1:]
+
+# Chunking strategies: fixed token windows, or windows that follow headings,
+# pages and paragraphs
+CHUNKING_STRATEGIES = ["token", "structure"]
+
+def _clean_and_chunk(
+    documents: List[Document],
+    chunk_size: int,
+    chunk_overlap: int,
+    tokenizer_name: Optional[str],
+    strategy: str = "token",
+    embeddings: Optional[Any] = None,
+    similarity_threshold: float = 0.5
+) -> List[Document]:
+    """
+    Clean and chunk a batch of documents.
+    
+    Defined at module level so it can be sent to process pool workers.
+    """
+    cleaned = [
+        Document(page_content=DocumentPreprocessor.clean_text(doc.page_content), metadata=doc.metadata)
+        for doc in documents
+        if doc.page_content
+    ]
+    chunker = TokenChunker.get(tokenizer_name)
+    
+    if strategy == "structure":
+        return chunker.split_structured(cleaned, chunk_size, embeddings, similarity_threshold)
+    if strategy == "token":
+        return chunker.split_documents(cleaned, chunk_size, chunk_overlap)
+    raise ValueError(f"Unsupported chunking strategy: {strategy}")
 
 class DocumentPreprocessor:
     """
@@ -14,53 +97,143 @@ class DocumentPreprocessor:
         """
         Clean the text by removing extra whitespace, fixing line breaks, etc.
         
+        Whitespace runs collapse to one space, except blank lines and page
+        breaks, which become a paragraph break ("\\n\\n"). Mis-decoded UTF-8
+        (mojibake) is repaired, ligatures are expanded and invisible
+        characters are dropped in one scan with a precompiled pattern, which
+        is skipped entirely for ASCII text.
+        
         Args:
             text: Raw text to clean.
             
         Returns:
             Cleaned text.
         """
-        # Remove multiple consecutive spaces
-        text = re.sub(r'\s+', ' ', text)
+        if not text.isascii():
+            text = NOISE_PATTERN.sub(_repair_noise, text)
         
-        # Remove empty lines
-        text = re.sub(r'\n\s*\n', '\n', text)
-        
-        # Fix common character encoding issues
-        text = text.replace('Â', '').replace('â', '').replace('â€™', "'")
-        
-        return text.strip()
+        # str.split() collapses whitespace in C, without a callback per line break
+        paragraphs = (" ".join(paragraph.split()) for paragraph in PARAGRAPH_BREAK.split(text))
+        return "\n\n".join(paragraph for paragraph in paragraphs if paragraph)
     
     @staticmethod
     def chunk_documents(
         documents: List[Document], 
         chunk_size: int = 512, 
-        chunk_overlap: int = 50
+        chunk_overlap: int = 50,
+        tokenizer_name: Optional[str] = None,
+        workers: Optional[int] = 1,
+        batch_size: int = 32,
+        strategy: str = "token",
+        embeddings: Optional[Any] = None,
+        similarity_threshold: float = 0.5
     ) -> List[Document]:
         """
         Split documents into chunks of specified size.
         
+        Sizes are measured with the embedding model's tokenizer and include
+        the special tokens it adds, so the default 512 fills the BGE window
+        exactly. Input documents are not modified.
+        
+        The "token" strategy cuts overlapping fixed-size windows. The
+        "structure" strategy packs whole paragraphs and never crosses a
+        document boundary (a PDF page, or a Markdown section when loaded
+        with `structured=True`); with `embeddings`, it packs sentences and
+        also breaks where adjacent sentences stop being similar.
+        
         Args:
             documents: List of documents to chunk.
             chunk_size: Size of each chunk in tokens.
             chunk_overlap: Number of tokens to overlap between chunks.
+            tokenizer_name: Tokenizer of the embedding model (BGE by default).
+            workers: Number of worker processes. 1 chunks in this process,
+                None or 0 uses one worker per CPU core.
+            batch_size: Number of documents tokenized at once.
+            strategy: Chunking strategy, one of CHUNKING_STRATEGIES.
+            embeddings: Embeddings model for the semantic merge of the
+                "structure" strategy (None disables it).
+            similarity_threshold: Minimum similarity of adjacent sentences
+                kept in one chunk by the semantic merge.
             
         Returns:
-            List of chunked documents.
+            List of chunked documents, with stable IDs and character offsets.
         """
-        # Create a text splitter with the specified parameters
-        text_splitter = RecursiveCharacterTextSplitter(
+        return list(DocumentPreprocessor.iter_chunks(
+            documents,
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap,
-            length_function=len,
-        )
+            batch_size=batch_size,
+            tokenizer_name=tokenizer_name,
+            workers=workers,
+            strategy=strategy,
+            embeddings=embeddings,
+            similarity_threshold=similarity_threshold
+        ))
+    
+    @staticmethod
+    def iter_chunks(
+        documents: Iterable[Document],
+        chunk_size: int = 512,
+        chunk_overlap: int = 50,
+        batch_size: int = 32,
+        tokenizer_name: Optional[str] = None,
+        workers: Optional[int] = 1,
+        strategy: str = "token",
+        embeddings: Optional[Any] = None,
+        similarity_threshold: float = 0.5
+    ) -> Iterator[Document]:
+        """
+        Lazily split a stream of documents into chunks.
+        
+        Documents are pulled, cleaned and chunked in small batches, so only a
+        bounded number of batches is held in memory at a time. With several
+        workers, batches are chunked across a process pool.
         
-        # Clean the document texts
-        for i, doc in enumerate(documents):
-            if doc.page_content:
-                documents[i].page_content = DocumentPreprocessor.clean_text(doc.page_content)
+        Args:
+            documents: Iterable of documents to chunk.
+            chunk_size: Size of each chunk in tokens.
+            chunk_overlap: Number of tokens to overlap between chunks.
+            batch_size: Number of documents to chunk at once.
+            tokenizer_name: Tokenizer of the embedding model (BGE by default).
+            workers: Number of worker processes. 1 chunks in this process,
+                None or 0 uses one worker per CPU core. The semantic merge
+                always runs in this process, next to the loaded model.
+            strategy: Chunking strategy, one of CHUNKING_STRATEGIES.
+            embeddings: Embeddings model for the semantic merge of the
+                "structure" strategy (None disables it).
+            similarity_threshold: Minimum similarity of adjacent sentences
+                kept in one chunk by the semantic merge.
+            
+        Yields:
+            Chunked documents, in input order.
+        """
+        # Report an oversized chunk size once, rather than in every batch and worker
+        max_chunk_size = TokenChunker.get(tokenizer_name).clamp_chunk_size(chunk_size)
+        if max_chunk_size < chunk_size:
+            print(f"Chunk size {chunk_size} exceeds the {max_chunk_size}-token window of the embedding model; using {max_chunk_size}")
+            chunk_size = max_chunk_size
+        
+        documents = iter(documents)
+        batches = iter(lambda: list(itertools.islice(documents, batch_size)), [])
+        workers = DocumentLoader.resolve_workers(workers) if embeddings is None else 1
         
-        # Split the documents into chunks
-        chunked_documents = text_splitter.split_documents(documents)
+        if workers == 1:
+            for batch in batches:
+                yield from _clean_and_chunk(
+                    batch, chunk_size, chunk_overlap, tokenizer_name, strategy, embeddings, similarity_threshold
+                )
+            return
         
-        return chunked_documents 
\ No newline at end of file
+        # Keep a bounded window of batches in flight, like file loading
+        max_in_flight = workers * 2
+        pending = deque()
+        
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for batch in batches:
+                pending.append(executor.submit(_clean_and_chunk, batch, chunk_size, chunk_overlap, tokenizer_name, strategy))
+                
+                if len(pending) >= max_in_flight:
+                    yield from pending.popleft().result()
+            
+            while pending:
+                yield from pending.popleft().result()
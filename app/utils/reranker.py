@@ -0,0 +1,163 @@
+from typing import List, Dict, Any, Optional, Tuple
+import time
+import threading
+
+import numpy as np
+from langchain.schema import Document
+
+# Small MS MARCO cross-encoder (6 layers, ~22M parameters) that runs well on CPU
+DEFAULT_RERANKER_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+class CrossEncoderReranker:
+    """
+    Rerank retrieved chunks with a local cross-encoder.
+
+    A cross-encoder reads the query and a chunk together, so it judges
+    relevance far better than comparing two independent embeddings, at the
+    cost of one forward pass per (query, chunk) pair. Pairs are scored in
+    batches on the CPU until the latency budget runs out; a running average
+    of the time per pair sizes each batch to the time left, so a budget too
+    tight for every candidate still reranks the leading ones (and refreshes
+    the average, so one slow call doesn't switch reranking off for good).
+    """
+
+    # Shared instances, one per (model name, device)
+    _instances: Dict[Tuple[str, str], "CrossEncoderReranker"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, model_name: str = DEFAULT_RERANKER_MODEL, device: str = "cpu", batch_size: int = 16):
+        """
+        Load the cross-encoder and warm it up.
+
+        Args:
+            model_name: Name of the Hugging Face cross-encoder.
+            device: Device to run the model on.
+            batch_size: Number of (query, chunk) pairs scored per forward pass.
+        """
+        from sentence_transformers import CrossEncoder
+
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.model = CrossEncoder(model_name, device=device, max_length=512)
+        self.seconds_per_pair = None
+        self.reranked = 0
+        self.partial = 0
+        self.skipped = 0
+
+        # Warm up so the first query doesn't pay for lazy initialization
+        self.model.predict([("warm-up", "warm-up")], show_progress_bar=False)
+
+    @staticmethod
+    def get(model_name: str = DEFAULT_RERANKER_MODEL, device: str = "cpu") -> "CrossEncoderReranker":
+        """
+        Get a shared reranker, loading the model on first use.
+
+        Args:
+            model_name: Name of the Hugging Face cross-encoder.
+            device: Device to run the model on.
+
+        Returns:
+            Cross-encoder reranker.
+        """
+        key = (model_name, device)
+
+        with CrossEncoderReranker._instances_lock:
+            reranker = CrossEncoderReranker._instances.get(key)
+
+            if reranker is None:
+                reranker = CrossEncoderReranker(model_name, device=device)
+                CrossEncoderReranker._instances[key] = reranker
+
+            return reranker
+
+    def rerank(
+        self,
+        query: str,
+        docs: List[Document],
+        top_n: int = 5,
+        budget_seconds: Optional[float] = None
+    ) -> Tuple[List[Document], bool]:
+        """
+        Keep the top n documents by cross-encoder score.
+
+        Candidates are scored in retrieval order, in batches sized to the
+        time left. If the budget runs out first, the scored candidates are
+        reordered by score ahead of the unscored ones, which keep their
+        retrieval order.
+
+        Args:
+            query: The query string.
+            docs: Candidate documents, best first.
+            top_n: Number of documents to keep.
+            budget_seconds: Maximum time to spend scoring (no limit if None).
+
+        Returns:
+            Tuple of (top documents, whether every candidate was reranked).
+        """
+        if len(docs) <= 1:
+            return docs[:top_n], False
+
+        if budget_seconds is not None and budget_seconds <= 0:
+            self.skipped += 1
+            return docs[:top_n], False
+
+        start = time.perf_counter()
+        deadline = start + budget_seconds if budget_seconds is not None else None
+        scores = []
+
+        while len(scores) < len(docs):
+            batch_size = min(self.batch_size, len(docs) - len(scores))
+
+            if deadline is not None:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+
+                # Always score at least one pair, which keeps the average current
+                if self.seconds_per_pair:
+                    batch_size = max(1, min(batch_size, int(remaining / self.seconds_per_pair)))
+
+            batch_start = time.perf_counter()
+            batch = docs[len(scores):len(scores) + batch_size]
+            scores.extend(self.model.predict(
+                [(query, doc.page_content) for doc in batch],
+                batch_size=self.batch_size,
+                show_progress_bar=False
+            ))
+            self._record(time.perf_counter() - batch_start, len(batch))
+
+        if len(scores) < len(docs):
+            if len(scores) <= 1:
+                self.skipped += 1
+            else:
+                self.partial += 1
+        else:
+            self.reranked += 1
+
+        order = list(np.argsort(-np.asarray(scores, dtype=np.float32), kind="stable")) + list(range(len(scores), len(docs)))
+
+        return [docs[i] for i in order[:top_n]], len(scores) == len(docs)
+
+    def _record(self, seconds: float, pairs: int):
+        """Update the running average of the scoring time per pair."""
+        per_pair = seconds / max(pairs, 1)
+
+        if self.seconds_per_pair is None:
+            self.seconds_per_pair = per_pair
+        else:
+            self.seconds_per_pair = 0.8 * self.seconds_per_pair + 0.2 * per_pair
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get rerank statistics.
+
+        Returns:
+            Dict with the number of fully reranked, partially reranked and
+            skipped queries and the average milliseconds per scored pair.
+        """
+        return {
+            "reranked": self.reranked,
+            "partial": self.partial,
+            "skipped": self.skipped,
+            "ms_per_pair": self.seconds_per_pair * 1000 if self.seconds_per_pair is not None else None,
+        }
@@ -1,23 +1,196 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import re
 import os
+import time
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 
 from langchain.schema import Document
 from langchain.retrievers import ContextualCompressionRetriever
-from langchain.retrievers.document_compressors import LLMChainExtractor
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.retrievers import BaseRetriever
 from langchain_google_genai import ChatGoogleGenerativeAI
+from pydantic import ConfigDict
 
 from .vector_store import VectorStore
+from .bm25 import BM25Index
+from .lru_cache import LRUCache
+from .context_packer import ContextPacker, source_label
+from .reranker import CrossEncoderReranker, DEFAULT_RERANKER_MODEL
+from .compressor import ExtractiveCompressor, ConcurrentLLMExtractor
+from .diversity import mmr_select
+
+# Shared pool that runs the dense and keyword searches of a query side by side
+_search_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hybrid-search")
+
+def _fusion_key(doc: Document) -> str:
+    """Identify a chunk across result lists by its source and text."""
+    key = f"{doc.metadata.get('source', '')}\0{doc.page_content}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+class HybridRetriever(BaseRetriever):
+    """
+    Retriever that fuses dense vector search with BM25 keyword search.
+    
+    Both searches run concurrently and their rankings are merged with
+    reciprocal rank fusion (RRF), so exact-term matches such as error codes
+    and names surface even when their embeddings are not the closest.
+    """
+    
+    vector_store: Any
+    keyword_index: BM25Index
+    k: int = 5
+    fetch_k: int = 20
+    rrf_k: int = 60
+    
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+    
+    def _get_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        """
+        Run dense and keyword search concurrently and fuse the rankings.
+        
+        Args:
+            query: The query string.
+            run_manager: Callback manager for the run.
+            
+        Returns:
+            Top k fused documents.
+        """
+        dense_future = _search_executor.submit(self.vector_store.similarity_search, query, self.fetch_k)
+        keyword_future = _search_executor.submit(self.keyword_index.search, query, self.fetch_k)
+        
+        # The keyword index holds no text; read the matched chunks from the store
+        keyword_ids = [doc_id for doc_id, _ in keyword_future.result()]
+        rankings = [
+            dense_future.result(),
+            VectorStore.get_documents_by_ids(self.vector_store, keyword_ids),
+        ]
+        
+        return Retriever.reciprocal_rank_fusion(rankings, k=self.k, rrf_k=self.rrf_k)
+
+class DiverseRetriever(BaseRetriever):
+    """
+    Retriever that picks a relevant but non-redundant subset of over-fetched
+    candidates with maximal marginal relevance (MMR), capping the number of
+    chunks taken from any single source.
+    
+    Candidate embeddings are read back from the vector store rather than
+    recomputed.
+    """
+    
+    base_retriever: BaseRetriever
+    vector_store: Any
+    k: int = 5
+    lambda_mult: float = 0.5
+    max_per_source: Optional[int] = None
+    
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+    
+    def _get_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        """
+        Fetch candidates and select a diverse top k.
+        
+        Args:
+            query: The query string.
+            run_manager: Callback manager for the run.
+            
+        Returns:
+            Selected documents, in selection order.
+        """
+        candidates = self.base_retriever.invoke(query)
+        if len(candidates) <= 1:
+            return candidates
+        
+        selected = mmr_select(
+            self.vector_store.embeddings.embed_query(query),
+            VectorStore.get_document_vectors(self.vector_store, candidates),
+            k=self.k,
+            lambda_mult=self.lambda_mult,
+            sources=[doc.metadata.get("source") for doc in candidates],
+            max_per_source=self.max_per_source
+        )
+        
+        return [candidates[i] for i in selected]
+
+class RerankingRetriever(BaseRetriever):
+    """
+    Retriever that over-fetches candidates and keeps the best ones by
+    cross-encoder score.
+    
+    The latency budget covers the whole retrieval: whatever the base
+    retriever leaves of it is what the reranker may spend; candidates it
+    has no time to score keep the base order, after the scored ones.
+    """
+    
+    base_retriever: BaseRetriever
+    reranker: Any
+    top_n: int = 5
+    budget_seconds: Optional[float] = None
+    
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+    
+    def _get_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        """
+        Fetch candidates and rerank them within the latency budget.
+        
+        Args:
+            query: The query string.
+            run_manager: Callback manager for the run.
+            
+        Returns:
+            Top n documents.
+        """
+        start = time.perf_counter()
+        candidates = self.base_retriever.invoke(query)
+        
+        remaining = None
+        if self.budget_seconds is not None:
+            remaining = self.budget_seconds - (time.perf_counter() - start)
+        
+        docs, _ = self.reranker.rerank(query, candidates, top_n=self.top_n, budget_seconds=remaining)
+        
+        return docs
 
 class Retriever:
     """Utility class for retrieving relevant documents."""
     
+    # Top-k results of recent queries, keyed by the caller's cache key and the
+    # query. The key includes the index version, so an ingest never serves
+    # stale results; RETRIEVAL_CACHE_MAX_ENTRIES bounds the size.
+    _result_cache = LRUCache(max_entries=int(os.getenv("RETRIEVAL_CACHE_MAX_ENTRIES", "256")))
+    
     @staticmethod
     def build_hybrid_retriever(
         vector_store,
         k: int = 5,
         use_compression: bool = False,
-        llm_model_name: str = "gemini-1.5-pro"
+        llm_model_name: str = "gemini-1.5-pro",
+        keyword_index: Optional[BM25Index] = None,
+        compression_mode: str = "extractive",
+        llm=None,
+        compression_embeddings=None,
+        rerank: bool = False,
+        rerank_fetch_k: Optional[int] = None,
+        rerank_budget_seconds: Optional[float] = None,
+        rerank_model_name: str = DEFAULT_RERANKER_MODEL,
+        diversify: bool = False,
+        mmr_lambda: float = 0.5,
+        max_per_source: Optional[int] = None
     ):
         """
         Build a hybrid retriever that combines semantic and keyword search.
@@ -27,28 +200,84 @@ class Retriever:
             k: Number of documents to retrieve.
             use_compression: Whether to use contextual compression.
             llm_model_name: Name of the LLM to use for compression.
+            keyword_index: BM25 index over the same chunks. Without one (or
+                when it is empty) retrieval is semantic only.
+            compression_mode: "extractive" keeps the sentences closest to the
+                query using the local embeddings model; "llm" asks the LLM to
+                extract the relevant parts of each chunk, concurrently.
+            llm: Shared LLM client for compression (one is created from
+                `llm_model_name` if omitted).
+            compression_embeddings: Embeddings model that scores sentences
+                for extractive compression. Pass one without the persistent
+                chunk cache, so per-query sentence vectors don't evict chunk
+                vectors (defaults to the vector store's model).
+            rerank: Whether to rerank over-fetched candidates with a cross-encoder.
+            rerank_fetch_k: Number of candidates to rerank (defaults to max(4k, 20)).
+            rerank_budget_seconds: Retrieval latency budget; reranking stops
+                when it runs out.
+            rerank_model_name: Name of the cross-encoder model.
+            diversify: Whether to select over-fetched candidates with MMR.
+            mmr_lambda: MMR trade-off, 1 for relevance only, 0 for diversity only.
+            max_per_source: Maximum number of chunks per source when diversifying.
             
         Returns:
             A hybrid retriever.
         """
+        # Over-fetch candidates for the reranker and the diversity selection
+        candidates_k = k
+        if rerank or diversify:
+            candidates_k = rerank_fetch_k or max(4 * k, 20)
+        
         # Create a base retriever
-        base_retriever = vector_store.as_retriever(
-            search_type="similarity",
-            search_kwargs={"k": k}
-        )
+        if keyword_index is not None and len(keyword_index) > 0:
+            base_retriever = HybridRetriever(
+                vector_store=vector_store,
+                keyword_index=keyword_index,
+                k=candidates_k,
+                fetch_k=max(2 * candidates_k, 10)
+            )
+        else:
+            base_retriever = vector_store.as_retriever(
+                search_type="similarity",
+                search_kwargs={"k": candidates_k}
+            )
+        
+        # Diversify first, leaving the reranker twice as many chunks as it keeps
+        if diversify:
+            base_retriever = DiverseRetriever(
+                base_retriever=base_retriever,
+                vector_store=vector_store,
+                k=2 * k if rerank else k,
+                lambda_mult=mmr_lambda,
+                max_per_source=max_per_source
+            )
+        
+        if rerank:
+            base_retriever = RerankingRetriever(
+                base_retriever=base_retriever,
+                reranker=CrossEncoderReranker.get(rerank_model_name),
+                top_n=k,
+                budget_seconds=rerank_budget_seconds
+            )
         
         if not use_compression:
             return base_retriever
         
-        # Create an LLM for compression
-        llm = ChatGoogleGenerativeAI(
-            model=llm_model_name,
-            temperature=0,
-            google_api_key=os.getenv("GOOGLE_API_KEY")
-        )
-        
         # Create a compressor
-        compressor = LLMChainExtractor.from_llm(llm)
+        if compression_mode == "extractive":
+            compressor = ExtractiveCompressor(embeddings=compression_embeddings or vector_store.embeddings)
+        elif compression_mode == "llm":
+            # Create an LLM for compression
+            if llm is None:
+                llm = ChatGoogleGenerativeAI(
+                    model=llm_model_name,
+                    temperature=0,
+                    google_api_key=os.getenv("GOOGLE_API_KEY")
+                )
+            
+            compressor = ConcurrentLLMExtractor.from_llm(llm)
+        else:
+            raise ValueError(f"Unsupported compression mode: {compression_mode}")
         
         # Create a compression retriever
         retriever = ContextualCompressionRetriever(
@@ -58,51 +287,108 @@ class Retriever:
         
         return retriever
     
+    @staticmethod
+    def reciprocal_rank_fusion(rankings: List[List[Document]], k: int = 5, rrf_k: int = 60) -> List[Document]:
+        """
+        Merge ranked result lists with reciprocal rank fusion.
+        
+        Each document scores sum(1 / (rrf_k + rank)) over the lists it appears in.
+        
+        Args:
+            rankings: Ranked lists of documents, best first.
+            k: Number of documents to return.
+            rrf_k: Rank offset dampening the weight of top ranks.
+            
+        Returns:
+            Top k fused documents.
+        """
+        scores: Dict[str, float] = {}
+        documents: Dict[str, Document] = {}
+        
+        for ranking in rankings:
+            for rank, doc in enumerate(ranking, start=1):
+                key = _fusion_key(doc)
+                scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+                documents.setdefault(key, doc)
+        
+        best = sorted(scores, key=scores.get, reverse=True)[:k]
+        
+        return [documents[key] for key in best]
+    
+    @staticmethod
+    def get_result_cache_stats() -> Dict[str, Any]:
+        """
+        Get hit/miss statistics of the retrieval result cache.
+        
+        Returns:
+            Dict with entries, capacity, hits, misses, hit rate and evictions.
+        """
+        return Retriever._result_cache.stats()
+    
+    @staticmethod
+    def invalidate_results():
+        """Drop every cached retrieval result, e.g. after ingesting documents."""
+        Retriever._result_cache.clear()
+    
     @staticmethod
     def retrieve_documents(
         query: str,
         retriever,
-        max_tokens: int = 4000
+        max_tokens: int = 4000,
+        cache_key: Optional[Tuple] = None,
+        packing: str = "greedy",
+        tokenizer_name: Optional[str] = None
     ) -> List[Document]:
         """
         Retrieve documents relevant to the query.
         
+        Overlapping chunks of the same source are deduplicated, then the
+        chunks are packed into `max_tokens` as counted by a real tokenizer.
+        Documents are returned as the retriever produced them (never
+        modified); `Generator.format_documents` adds their sources.
+        
         Args:
             query: The query string.
             retriever: The retriever to use.
             max_tokens: Maximum number of tokens to retrieve.
+            cache_key: Identity of the index and the retrieval settings, e.g.
+                (index name, index version, k). When given, results are cached
+                under it and the query.
+            packing: Chunk selection strategy, "greedy" (best first, skipping
+                chunks that don't fit) or "knapsack" (best total score).
+            tokenizer_name: Tokenizer used to count tokens (see `TokenCounter`).
             
         Returns:
             List of retrieved documents.
         """
-        # Retrieve documents using the newer invoke method
-        docs = retriever.invoke(query)
-        
-        # Count tokens (approximate method)
-        def count_tokens(text):
-            # Approximate token count (average 4 chars per token)
-            return len(text) // 4
+        # Retrieve documents using the newer invoke method, or reuse the
+        # results of the same query against the same index version
+        if cache_key is None:
+            docs = retriever.invoke(query)
+        else:
+            key = (*cache_key, query)
+            cached = Retriever._result_cache.get(key)
+            
+            if cached is None:
+                cached = retriever.invoke(query)
+                Retriever._result_cache.put(key, cached)
+            
+            docs = list(cached)
         
-        # Filter documents to stay within token limit
-        filtered_docs = []
-        current_tokens = 0
+        # Drop chunks that repeat a better-ranked chunk of the same source
+        docs = ContextPacker.deduplicate(docs)
         
-        for i, doc in enumerate(docs):
-            doc_tokens = count_tokens(doc.page_content)
-            
-            if current_tokens + doc_tokens <= max_tokens:
-                # Add source information to document metadata
-                if 'source' in doc.metadata:
-                    source_info = doc.metadata['source']
-                else:
-                    source_info = f"Document {i+1}"
-                
-                # Enrich the document content with its source info
-                doc.page_content = f"{doc.page_content}\n\nSource: {source_info}"
-                
-                filtered_docs.append(doc)
-                current_tokens += doc_tokens
-            else:
-                break
+        # Fill the token budget, counting each document's heading and source
+        # line as laid out by Generator.format_documents
+        filtered_docs, _ = ContextPacker.pack(
+            docs,
+            max_tokens=max_tokens,
+            overhead_texts=[
+                f"Document {i+1}:\n\n\nSource: {source_label(doc, i)}"
+                for i, doc in enumerate(docs)
+            ],
+            strategy=packing,
+            tokenizer_name=tokenizer_name
+        )
         
         return filtered_docs 
\ No newline at end of file
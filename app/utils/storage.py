@@ -0,0 +1,20 @@
+import os
+
+# Root directory for local state (manifests, caches, local indexes)
+DEFAULT_STATE_DIR = ".pka"
+
+def get_state_dir(*parts: str) -> str:
+    """
+    Get (and create) a directory for local assistant state.
+    
+    The root can be moved with the PKA_STATE_DIR environment variable.
+    
+    Args:
+        parts: Sub-directories below the state root.
+        
+    Returns:
+        Path to the directory.
+    """
+    path = os.path.join(os.getenv("PKA_STATE_DIR", DEFAULT_STATE_DIR), *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
@@ -1,101 +1,231 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterable, Iterator
 import os
 from dotenv import load_dotenv
 import time
+import uuid
+import itertools
+import threading
+
+import numpy as np
 
 from langchain.schema import Document
+from langchain_core.vectorstores import VectorStore as BaseVectorStore
 from langchain_pinecone import PineconeVectorStore
 from pinecone import Pinecone as PineconeClient, ServerlessSpec, Metric
 
 from .embeddings import EmbeddingGenerator
+from .manifest import IngestManifest
+from .local_vector_store import LocalVectorStore
+from .bm25 import BM25Index
+from .storage import get_state_dir
+from .pinecone_upserter import PineconeUpserter
+from .pinecone_index_manager import PineconeIndexManager
+from .index_version import IndexVersion
 
 # Load environment variables
 load_dotenv()
 
+# Supported vector store backends
+BACKENDS = ["pinecone", "local"]
+
+# One Pinecone client and index manager per process
+_pinecone_client = None
+_index_manager = None
+_pinecone_lock = threading.Lock()
+
+def batched(items: Iterable[Any], batch_size: int) -> Iterator[List[Any]]:
+    """
+    Group an iterable into lists of at most `batch_size` items.
+    
+    Args:
+        items: Iterable to group.
+        batch_size: Maximum number of items per batch.
+        
+    Yields:
+        Lists of items.
+    """
+    batch = []
+    
+    for item in items:
+        batch.append(item)
+        
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    
+    if batch:
+        yield batch
+
 class VectorStore:
     """Utility class to manage vector store operations."""
     
     @staticmethod
     def get_pinecone_client():
-        """Initialize and return Pinecone client."""
-        api_key = os.getenv("PINECONE_API_KEY")
+        """
+        Get the shared Pinecone client, creating it on first use.
         
-        if not api_key:
-            raise ValueError("Pinecone API key must be set.")
+        Set PINECONE_HOST to point the client at another control plane, such
+        as a local Pinecone emulator.
+        """
+        global _pinecone_client
         
-        return PineconeClient(api_key=api_key)
+        with _pinecone_lock:
+            if _pinecone_client is None:
+                api_key = os.getenv("PINECONE_API_KEY")
+                
+                if not api_key:
+                    raise ValueError("Pinecone API key must be set.")
+                
+                host = os.getenv("PINECONE_HOST")
+                if host:
+                    _pinecone_client = PineconeClient(api_key=api_key, host=host)
+                else:
+                    _pinecone_client = PineconeClient(api_key=api_key)
+            
+            return _pinecone_client
     
     @staticmethod
-    def delete_index(index_name: str):
+    def get_index_manager() -> PineconeIndexManager:
+        """
+        Get the shared Pinecone index manager (one client, cached index descriptions).
+        
+        Returns:
+            Index manager.
         """
-        Delete a Pinecone index if it exists.
+        global _index_manager
+        
+        client = VectorStore.get_pinecone_client()
+        with _pinecone_lock:
+            if _index_manager is None:
+                _index_manager = PineconeIndexManager(client)
+            
+            return _index_manager
+    
+    @staticmethod
+    def get_pinecone_index(index_name: str, pool_threads: int = 4):
+        """
+        Get a data-plane handle for a Pinecone index.
+        
+        The handle owns a pooled set of HTTP connections sized for
+        `pool_threads` concurrent requests. The host comes from the cached
+        index description; if the index is still being created this waits
+        until it is ready. Set PINECONE_INDEX_HOST to talk to a specific index
+        host (e.g. a local fake server).
         
         Args:
-            index_name: Name of the index to delete.
+            index_name: Name of the index.
+            pool_threads: Number of concurrent requests the connection pool serves.
+            
+        Returns:
+            Pinecone index handle.
         """
-        # Initialize Pinecone
         pinecone_client = VectorStore.get_pinecone_client()
+        host = os.getenv("PINECONE_INDEX_HOST") or VectorStore.get_index_manager().get_host(index_name)
+        
+        return pinecone_client.Index(host=host, pool_threads=pool_threads)
+    
+    @staticmethod
+    def get_keyword_index_path(index_name: str, backend: str = "pinecone") -> str:
+        """
+        Get the location of the BM25 keyword index stored alongside a vector index.
+        
+        Args:
+            index_name: Name of the index.
+            backend: Vector store backend ("pinecone" or "local").
+            
+        Returns:
+            Path to the keyword index file.
+        """
+        if backend == "local":
+            return os.path.join(LocalVectorStore.default_dir(index_name), "bm25.json")
         
-        # List all indexes
-        indexes = pinecone_client.list_indexes()
+        return os.path.join(get_state_dir("keyword_index", backend), f"{index_name}.json")
+    
+    @staticmethod
+    def load_keyword_index(index_name: str, backend: str = "pinecone") -> BM25Index:
+        """
+        Load the BM25 keyword index of a vector index (empty if none was built).
         
-        # Check if the index exists
-        if any(index.name == index_name for index in indexes):
-            # Delete the index
-            pinecone_client.delete_index(index_name)
+        Args:
+            index_name: Name of the index.
+            backend: Vector store backend ("pinecone" or "local").
+            
+        Returns:
+            BM25 keyword index.
+        """
+        return BM25Index.load(VectorStore.get_keyword_index_path(index_name, backend))
+    
+    @staticmethod
+    def delete_index(index_name: str, backend: str = "pinecone"):
+        """
+        Delete an index if it exists, along with its ingest manifest.
+        
+        Args:
+            index_name: Name of the index to delete.
+            backend: Vector store backend ("pinecone" or "local").
+        """
+        # The manifest and keyword index describe the index contents, so they go with the index
+        IngestManifest.discard(index_name, backend)
+        IndexVersion.bump(index_name, backend)
+        keyword_index_path = VectorStore.get_keyword_index_path(index_name, backend)
+        if os.path.exists(keyword_index_path):
+            os.remove(keyword_index_path)
+        
+        if backend == "local":
+            if LocalVectorStore.delete_index(index_name):
+                print(f"Deleted local index: {index_name}")
+            return
+        
+        # Delete the index and wait until the name can be reused
+        if VectorStore.get_index_manager().delete_index(index_name, wait=True):
             print(f"Deleted Pinecone index: {index_name}")
-            # Sleep to ensure the deletion completes
-            time.sleep(5)
     
     @staticmethod
-    def get_or_create_index(index_name: str, dimension: int = 384, force_recreate: bool = False):
+    def get_or_create_index(index_name: str, dimension: int = 384, force_recreate: bool = False, wait: bool = True):
         """
         Get existing Pinecone index or create a new one.
         
+        With `wait=False` a missing index is only started; the first call to
+        `get_pinecone_index` waits for it, so callers can load the embeddings
+        model while the index is being provisioned.
+        
         Args:
             index_name: Name of the Pinecone index.
             dimension: Dimension of the embeddings.
             force_recreate: Whether to force recreate the index if it exists.
+            wait: Whether to wait for the index and return a handle.
             
         Returns:
-            Pinecone index.
+            Pinecone index, or None when `wait` is False.
         """
-        # Initialize Pinecone
-        pinecone_client = VectorStore.get_pinecone_client()
+        index_manager = VectorStore.get_index_manager()
         
         # Delete the index if forced recreation
         if force_recreate:
             VectorStore.delete_index(index_name)
         
-        # List all indexes
-        indexes = pinecone_client.list_indexes()
-        
-        # Check if the index already exists
-        if not any(index.name == index_name for index in indexes):
-            # Create the index if it doesn't exist
-            pinecone_client.create_index(
-                name=index_name,
-                dimension=dimension,
-                metric="cosine",
-                spec=ServerlessSpec(
-                    cloud="aws",
-                    region="us-east-1"
-                )
-            )
+        # Create the index if it doesn't exist, asking the service rather than
+        # the cache since another process may have deleted it
+        if not index_manager.exists(index_name, refresh=True):
+            index_manager.create_index(index_name, dimension=dimension, metric="cosine")
             print(f"Created new Pinecone index: {index_name}")
         else:
             print(f"Using existing Pinecone index: {index_name}")
         
+        if not wait:
+            return None
+        
         # Return the index
-        return pinecone_client.Index(index_name)
+        return VectorStore.get_pinecone_index(index_name)
     
     @staticmethod
     def create_vector_store(
         documents: List[Document],
         embedding_model_type: str = "bge",
         embedding_model_name: Optional[str] = None,
-        index_name: str = "personal-knowledge-assistant"
-    ) -> PineconeVectorStore:
+        index_name: str = "personal-knowledge-assistant",
+        backend: str = "pinecone"
+    ) -> BaseVectorStore:
         """
         Create a vector store from documents.
         
@@ -103,55 +233,83 @@ class VectorStore:
             documents: List of documents to embed.
             embedding_model_type: Type of embeddings model.
             embedding_model_name: Name of the embeddings model.
-            index_name: Name of the Pinecone index.
+            index_name: Name of the index.
+            backend: Vector store backend ("pinecone" or "local").
             
         Returns:
-            Pinecone vector store.
+            Vector store.
         """
+        # Shared chunk IDs for the vectors and the keyword index (the chunker's
+        # stable IDs when present)
+        ids = [doc.id or str(uuid.uuid4()) for doc in documents]
+        
+        if backend == "pinecone":
+            # Recreate the index (to ensure correct dimensions) without waiting
+            # for it to be provisioned; the embeddings model loads meanwhile.
+            # BGE embeddings use 384 dimensions for bge-small-en-v1.5
+            VectorStore.delete_index(index_name)
+            VectorStore.get_or_create_index(index_name, dimension=384, wait=False)
+        
         # Get embeddings model
         embeddings = EmbeddingGenerator.get_embeddings_model(
             model_type=embedding_model_type,
             model_name=embedding_model_name
         )
         
-        # Get Pinecone client
-        pinecone_client = VectorStore.get_pinecone_client()
-        
-        # Delete existing index if it exists (to ensure correct dimensions)
-        VectorStore.delete_index(index_name)
-        
-        # Create or get the index
-        # BGE embeddings use 384 dimensions for bge-small-en-v1.5
-        dimension = 384
-        index = VectorStore.get_or_create_index(index_name, dimension)
+        if backend == "local":
+            VectorStore.delete_index(index_name, backend=backend)
+            vector_store = LocalVectorStore.from_documents(
+                documents=documents,
+                embedding=embeddings,
+                ids=ids,
+                index_name=index_name
+            )
+            VectorStore._build_keyword_index(documents, ids, index_name, backend)
+            IndexVersion.bump(index_name, backend)
+            print(f"Documents added to local index: {index_name}")
+            return vector_store
         
-        # Create the vector store
-        vector_store = PineconeVectorStore.from_documents(
-            documents=documents,
-            embedding=embeddings,
-            index_name=index_name
+        # Create the vector store and upsert through the pipelined writer
+        vector_store = PineconeVectorStore(
+            index=VectorStore.get_pinecone_index(index_name),
+            embedding=embeddings
         )
+        stats = VectorStore.add_documents_in_batches(vector_store, documents, ids=ids)
+        VectorStore._build_keyword_index(documents, ids, index_name, backend)
+        IndexVersion.bump(index_name, backend)
         
-        print(f"Documents added to Pinecone index: {index_name}")
+        print(
+            f"Documents added to Pinecone index: {index_name} "
+            f"({stats['vectors_per_second']:.0f} vectors/sec)"
+        )
         
         return vector_store
     
+    @staticmethod
+    def _build_keyword_index(documents: List[Document], ids: List[str], index_name: str, backend: str):
+        """Build and persist the BM25 keyword index of freshly ingested chunks."""
+        keyword_index = BM25Index()
+        keyword_index.add_documents(documents, ids)
+        keyword_index.save(VectorStore.get_keyword_index_path(index_name, backend))
+    
     @staticmethod
     def get_vector_store(
         embedding_model_type: str = "bge",
         embedding_model_name: Optional[str] = None,
-        index_name: str = "personal-knowledge-assistant"
-    ) -> PineconeVectorStore:
+        index_name: str = "personal-knowledge-assistant",
+        backend: str = "pinecone"
+    ) -> BaseVectorStore:
         """
         Get an existing vector store.
         
         Args:
             embedding_model_type: Type of embeddings model.
             embedding_model_name: Name of the embeddings model.
-            index_name: Name of the Pinecone index.
+            index_name: Name of the index.
+            backend: Vector store backend ("pinecone" or "local").
             
         Returns:
-            Pinecone vector store.
+            Vector store.
         """
         # Get embeddings model
         embeddings = EmbeddingGenerator.get_embeddings_model(
@@ -159,13 +317,210 @@ class VectorStore:
             model_name=embedding_model_name
         )
         
-        # Get Pinecone client
-        pinecone_client = VectorStore.get_pinecone_client()
+        if backend == "local":
+            return LocalVectorStore(embeddings, LocalVectorStore.default_dir(index_name))
         
         # Get the vector store
-        vector_store = PineconeVectorStore.from_existing_index(
-            index_name=index_name,
+        vector_store = PineconeVectorStore(
+            index=VectorStore.get_pinecone_index(index_name),
             embedding=embeddings
         )
         
-        return vector_store 
\ No newline at end of file
+        return vector_store
+    
+    @staticmethod
+    def get_documents_by_ids(vector_store: BaseVectorStore, ids: List[str]) -> List[Document]:
+        """
+        Get stored chunks by ID, e.g. to resolve keyword search results.
+        
+        Args:
+            vector_store: Vector store holding the chunks.
+            ids: Chunk IDs.
+            
+        Returns:
+            Documents in the order of `ids`, skipping IDs that aren't stored.
+        """
+        if not ids:
+            return []
+        
+        if isinstance(vector_store, PineconeVectorStore):
+            documents = {}
+            for id_batch in batched(ids, 1000):
+                response = vector_store._index.fetch(ids=id_batch, namespace=vector_store._namespace)
+                for doc_id, vector in response.vectors.items():
+                    metadata = dict(vector.metadata or {})
+                    text = metadata.pop(vector_store._text_key, "")
+                    documents[doc_id] = Document(id=doc_id, page_content=text, metadata=metadata)
+        else:
+            documents = {doc.id: doc for doc in vector_store.get_by_ids(ids)}
+        
+        return [documents[doc_id] for doc_id in ids if doc_id in documents]
+    
+    @staticmethod
+    def get_document_vectors(vector_store: BaseVectorStore, documents: List[Document]) -> np.ndarray:
+        """
+        Get the stored embeddings of retrieved documents.
+        
+        Vectors are read back by chunk ID (from the local matrix, or with one
+        Pinecone fetch); only documents without a stored vector are embedded.
+        
+        Args:
+            vector_store: Vector store the documents came from.
+            documents: Retrieved documents.
+            
+        Returns:
+            Matrix of embeddings, one row per document.
+        """
+        ids = [doc.id for doc in documents if doc.id]
+        vectors = {}
+        
+        if ids and isinstance(vector_store, LocalVectorStore):
+            vectors = vector_store.get_vectors_by_ids(ids)
+        elif ids and isinstance(vector_store, PineconeVectorStore):
+            for id_batch in batched(ids, 1000):
+                response = vector_store._index.fetch(ids=id_batch, namespace=vector_store._namespace)
+                vectors.update({doc_id: vector.values for doc_id, vector in response.vectors.items()})
+        
+        # Embed whatever has no stored vector
+        missing = [doc for doc in documents if doc.id not in vectors]
+        if missing:
+            embedded = vector_store.embeddings.embed_documents([doc.page_content for doc in missing])
+            vectors.update({id(doc): vector for doc, vector in zip(missing, embedded)})
+        
+        return np.asarray(
+            [vectors[doc.id] if doc.id in vectors else vectors[id(doc)] for doc in documents],
+            dtype=np.float32
+        )
+    
+    @staticmethod
+    def add_documents_in_batches(
+        vector_store,
+        documents: Iterable[Document],
+        batch_size: int = 100,
+        on_batch=None,
+        keyword_index: Optional[BM25Index] = None,
+        ids: Optional[Iterable[str]] = None,
+        upsert_concurrency: int = 4
+    ) -> Dict[str, Any]:
+        """
+        Embed and upsert a stream of documents in bounded batches.
+        
+        Pinecone stores go through `PineconeUpserter`, which overlaps embedding
+        with concurrent, retried upserts; other stores are written batch by batch.
+        
+        Args:
+            vector_store: Vector store to write to.
+            documents: Iterable of documents to embed.
+            batch_size: Number of documents embedded and upserted at once.
+            on_batch: Optional callback called with the running total after each batch.
+            keyword_index: Optional BM25 index that receives the same chunks.
+            ids: Optional chunk IDs, one per document (the documents' IDs, or
+                random UUIDs, by default).
+            upsert_concurrency: Maximum number of Pinecone upserts in flight.
+            
+        Returns:
+            Throughput statistics, including "vectors" and "vectors_per_second".
+        """
+        if ids is None:
+            documents, id_source = itertools.tee(documents)
+            ids = (doc.id or str(uuid.uuid4()) for doc in id_source)
+        
+        written = [0]
+        
+        def record(batch: List[Document], batch_ids: List[str]):
+            if keyword_index is not None:
+                keyword_index.add_documents(batch, batch_ids)
+            written[0] += len(batch)
+            
+            if on_batch is not None:
+                on_batch(written[0])
+        
+        if isinstance(vector_store, PineconeVectorStore):
+            upserter = PineconeUpserter(
+                vector_store._index,
+                vector_store.embeddings,
+                batch_size=batch_size,
+                max_concurrency=upsert_concurrency,
+                text_key=vector_store._text_key,
+                namespace=vector_store._namespace
+            )
+            return upserter.upsert(documents, ids, on_batch=record)
+        
+        start = time.perf_counter()
+        
+        for batch in batched(zip(documents, ids), batch_size):
+            batch_docs = [doc for doc, _ in batch]
+            batch_ids = [doc_id for _, doc_id in batch]
+            vector_store.add_documents(batch_docs, ids=batch_ids)
+            record(batch_docs, batch_ids)
+        
+        seconds = time.perf_counter() - start
+        
+        return {
+            "vectors": written[0],
+            "seconds": seconds,
+            "vectors_per_second": written[0] / seconds if seconds else 0.0,
+        }
+    
+    @staticmethod
+    def create_vector_store_streaming(
+        documents: Iterable[Document],
+        embedding_model_type: str = "bge",
+        embedding_model_name: Optional[str] = None,
+        index_name: str = "personal-knowledge-assistant",
+        batch_size: int = 100,
+        on_batch=None,
+        backend: str = "pinecone",
+        upsert_concurrency: int = 4
+    ) -> BaseVectorStore:
+        """
+        Create a vector store from a stream of documents.
+        
+        Unlike `create_vector_store`, documents are consumed lazily and written
+        batch by batch, so vectors land as soon as the first batch is embedded
+        and no chunk text is held beyond its batch; the keyword index only
+        keeps term postings and chunk lengths.
+        
+        Args:
+            documents: Iterable of documents to embed.
+            embedding_model_type: Type of embeddings model.
+            embedding_model_name: Name of the embeddings model.
+            index_name: Name of the index.
+            batch_size: Number of documents embedded and upserted at once.
+            on_batch: Optional callback called with the running total after each batch.
+            backend: Vector store backend ("pinecone" or "local").
+            upsert_concurrency: Maximum number of Pinecone upserts in flight.
+            
+        Returns:
+            Vector store.
+        """
+        # Recreate the index (to ensure correct dimensions)
+        VectorStore.delete_index(index_name, backend=backend)
+        if backend == "pinecone":
+            VectorStore.get_or_create_index(index_name, dimension=384, wait=False)
+        
+        # Stream the documents into the index
+        vector_store = VectorStore.get_vector_store(
+            embedding_model_type=embedding_model_type,
+            embedding_model_name=embedding_model_name,
+            index_name=index_name,
+            backend=backend
+        )
+        keyword_index = BM25Index()
+        stats = VectorStore.add_documents_in_batches(
+            vector_store,
+            documents,
+            batch_size=batch_size,
+            on_batch=on_batch,
+            keyword_index=keyword_index,
+            upsert_concurrency=upsert_concurrency
+        )
+        keyword_index.save(VectorStore.get_keyword_index_path(index_name, backend))
+        IndexVersion.bump(index_name, backend)
+        
+        print(
+            f"{stats['vectors']} documents added to {backend} index: {index_name} "
+            f"({stats['vectors_per_second']:.0f} vectors/sec)"
+        )
+        
+        return vector_store
@@ -0,0 +1,90 @@
+"""
+Recall-vs-latency benchmark of the IVF-PQ index against exact search.
+
+Chunks a document directory with DocumentPreprocessor.chunk_documents, embeds
+the chunks into a temporary local vector store and compares approximate
+top-k results with exact top-k results for a range of nprobe values.
+
+Usage:
+    python benchmarks/ann_recall.py --data-dir path/to/docs
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from utils.document_loaders import DocumentLoader
+from utils.preprocessor import DocumentPreprocessor
+from utils.embeddings import EmbeddingGenerator
+from utils.local_vector_store import LocalVectorStore
+
+def percentile_ms(timings, percentile):
+    """Percentile of a list of durations in seconds, in milliseconds."""
+    return float(np.percentile(timings, percentile)) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ANN recall and latency against exact search.")
+    parser.add_argument("--data-dir", type=str, required=True, help="Directory containing documents")
+    parser.add_argument("--chunk-size", type=int, default=512, help="Size of each chunk in tokens")
+    parser.add_argument("--chunk-overlap", type=int, default=50, help="Number of tokens to overlap between chunks")
+    parser.add_argument("--workers", type=int, default=0, help="Number of processes for parsing files (0 = one per CPU core)")
+    parser.add_argument("--k", type=int, default=10, help="Number of neighbours per query")
+    parser.add_argument("--queries", type=int, default=200, help="Number of sampled queries")
+    parser.add_argument("--nlist", type=int, default=None, help="Number of inverted lists (default 4 * sqrt(chunks))")
+    parser.add_argument("--m", type=int, default=48, help="Number of PQ sub-quantizers")
+    parser.add_argument("--nprobe", type=str, default="1,2,4,8,16,32,64", help="Comma-separated nprobe values")
+    args = parser.parse_args()
+
+    documents = DocumentLoader.load_from_directory(args.data_dir, workers=args.workers)
+    chunks = DocumentPreprocessor.chunk_documents(documents, args.chunk_size, args.chunk_overlap)
+    print(f"{len(documents)} documents, {len(chunks)} chunks")
+
+    embeddings = EmbeddingGenerator.get_embeddings_model()
+    rng = np.random.default_rng(0)
+
+    with tempfile.TemporaryDirectory() as persist_dir:
+        store = LocalVectorStore(embeddings, persist_dir)
+        start = time.perf_counter()
+        store.add_documents(chunks)
+        print(f"Embedded and stored {len(store)} chunks in {time.perf_counter() - start:.1f}s")
+
+        # Queries are the opening words of randomly sampled chunks
+        sampled = rng.choice(len(chunks), min(args.queries, len(chunks)), replace=False)
+        query_texts = [" ".join(chunks[i].page_content.split()[:16]) for i in sampled]
+        query_vectors = np.asarray(embeddings.embed_documents(query_texts), dtype=np.float32)
+
+        exact_results, exact_timings = [], []
+        for query in query_vectors:
+            start = time.perf_counter()
+            rows, _ = store.search_rows(query, k=args.k, exact=True)
+            exact_timings.append(time.perf_counter() - start)
+            exact_results.append(set(rows.tolist()))
+
+        start = time.perf_counter()
+        store.build_ann_index(nlist=args.nlist, m=args.m)
+        print(f"Built IVF-PQ index ({store.ann_index.nlist} lists, m={args.m}) in {time.perf_counter() - start:.1f}s")
+
+        print(f"\n{'mode':>12} {'recall@' + str(args.k):>10} {'p50 ms':>8} {'p99 ms':>8}")
+        print(f"{'exact':>12} {1.0:>10.3f} {percentile_ms(exact_timings, 50):>8.2f} {percentile_ms(exact_timings, 99):>8.2f}")
+
+        for nprobe in (int(value) for value in args.nprobe.split(",")):
+            recalls, timings = [], []
+
+            for query, expected in zip(query_vectors, exact_results):
+                start = time.perf_counter()
+                rows, _ = store.search_rows(query, k=args.k, nprobe=nprobe)
+                timings.append(time.perf_counter() - start)
+                recalls.append(len(expected & set(rows.tolist())) / max(1, len(expected)))
+
+            print(
+                f"{'nprobe=' + str(nprobe):>12} {np.mean(recalls):>10.3f} "
+                f"{percentile_ms(timings, 50):>8.2f} {percentile_ms(timings, 99):>8.2f}"
+            )
+
+if __name__ == "__main__":
+    main()
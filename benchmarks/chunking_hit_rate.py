@@ -0,0 +1,111 @@
+"""
+Retrieval hit-rate benchmark of the chunking strategies.
+
+Chunks a document directory with each strategy ("token", "structure" and,
+for each --semantic-threshold, "structure" with the semantic sentence
+merge), embeds the chunks into a temporary local vector store and runs the
+same sampled queries against each store.
+
+Queries are sentences sampled from the documents; a query is a hit at k when
+one of its top-k chunks contains both the sentence and the one after it, i.e.
+when the answer arrives with its context instead of needing more results.
+For each strategy the script reports the number of chunks indexed, their
+mean token count, the chunking time and the hit rate at each k.
+
+Usage:
+    python benchmarks/chunking_hit_rate.py --data-dir path/to/docs
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from utils.document_loaders import DocumentLoader
+from utils.preprocessor import DocumentPreprocessor
+from utils.embeddings import EmbeddingGenerator
+from utils.local_vector_store import LocalVectorStore
+from utils.chunker import SENTENCE_END, PARAGRAPH_END
+
+def normalize(text):
+    """Text with whitespace collapsed, for containment checks across loaders."""
+    return " ".join(text.split())
+
+def sample_queries(documents, count, rng):
+    """Sample (query sentence, sentence + next sentence) pairs from the documents."""
+    pairs = []
+
+    for doc in documents:
+        for paragraph in PARAGRAPH_END.split(DocumentPreprocessor.clean_text(doc.page_content)):
+            bounds = [0] + [match.end() for match in SENTENCE_END.finditer(paragraph)] + [len(paragraph)]
+            bounds = sorted(set(bounds))
+
+            for start, middle, end in zip(bounds, bounds[1:], bounds[2:]):
+                if len(paragraph[start:middle].split()) >= 8:
+                    pairs.append((normalize(paragraph[start:middle]), normalize(paragraph[start:end])))
+
+    chosen = rng.choice(len(pairs), min(count, len(pairs)), replace=False)
+    return [pairs[i] for i in chosen]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark retrieval hit rate and chunk count of the chunking strategies.")
+    parser.add_argument("--data-dir", type=str, required=True, help="Directory containing documents")
+    parser.add_argument("--chunk-size", type=int, default=512, help="Size of each chunk in tokens")
+    parser.add_argument("--chunk-overlap", type=int, default=50, help="Number of tokens to overlap between chunks (token strategy)")
+    parser.add_argument("--semantic-threshold", type=str, default="0.5", help="Comma-separated thresholds of the semantic merge (empty to skip)")
+    parser.add_argument("--queries", type=int, default=200, help="Number of sampled queries")
+    parser.add_argument("--k", type=str, default="1,3,5", help="Comma-separated numbers of retrieved chunks")
+    args = parser.parse_args()
+
+    ks = [int(value) for value in args.k.split(",")]
+    thresholds = [float(value) for value in args.semantic_threshold.split(",") if value]
+    rng = np.random.default_rng(0)
+
+    embeddings = EmbeddingGenerator.get_embeddings_model(use_cache=False)
+    documents = DocumentLoader.load_from_directory(args.data_dir, workers=0)
+    structured_documents = DocumentLoader.load_from_directory(args.data_dir, workers=0, structured=True)
+    queries = sample_queries(documents, args.queries, rng)
+    query_vectors = [embeddings.embed_query(query) for query, _ in queries]
+    print(f"{len(documents)} documents, {len(queries)} queries")
+
+    strategies = [("token", documents, {"strategy": "token"}), ("structure", structured_documents, {"strategy": "structure"})]
+    for threshold in thresholds:
+        strategies.append((
+            f"semantic@{threshold:g}",
+            structured_documents,
+            {"strategy": "structure", "embeddings": embeddings, "similarity_threshold": threshold}
+        ))
+
+    header = " ".join(f"{f'hit@{k}':>7}" for k in ks)
+    print(f"{'strategy':>14} {'chunks':>7} {'tokens':>7} {'seconds':>8} {header}")
+    for name, strategy_documents, options in strategies:
+        start = time.perf_counter()
+        chunks = DocumentPreprocessor.chunk_documents(
+            strategy_documents,
+            chunk_size=args.chunk_size,
+            chunk_overlap=args.chunk_overlap,
+            **options
+        )
+        seconds = time.perf_counter() - start
+
+        store = LocalVectorStore(embeddings, tempfile.mkdtemp())
+        store.add_documents(chunks)
+
+        hits = {k: 0 for k in ks}
+        for (_, passage), query_vector in zip(queries, query_vectors):
+            results = store.similarity_search_by_vector(query_vector, k=max(ks))
+            result_texts = [normalize(doc.page_content) for doc in results]
+
+            for k in ks:
+                hits[k] += any(passage in text for text in result_texts[:k])
+
+        rates = " ".join(f"{hits[k] / max(len(queries), 1):>7.3f}" for k in ks)
+        mean_tokens = np.mean([chunk.metadata["token_count"] for chunk in chunks]) if chunks else 0.0
+        print(f"{name:>14} {len(chunks):>7} {mean_tokens:>7.0f} {seconds:>8.2f} {rates}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Added-latency and redundancy benchmark of MMR / per-source diversity selection.
+
+Without --data-dir, candidates are synthetic: groups of near-duplicate
+vectors per source, mimicking overlapping chunks of the same file. With
+--data-dir, a document directory is chunked and embedded into a temporary
+local vector store and candidates come from real similarity searches; the
+timing then includes reading the stored candidate vectors back.
+
+For each fetch_k and lambda the script reports the p50/p99 selection time,
+the mean pairwise similarity of the selected chunks (lower is less
+redundant) and the mean number of distinct sources among them.
+
+Usage:
+    python benchmarks/mmr_latency.py
+    python benchmarks/mmr_latency.py --data-dir path/to/docs
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from utils.diversity import mmr_select
+
+def percentile_ms(timings, percentile):
+    """Percentile of a list of durations in seconds, in milliseconds."""
+    return float(np.percentile(timings, percentile)) * 1000
+
+def redundancy(vectors):
+    """Mean pairwise cosine similarity of a set of vectors."""
+    if len(vectors) < 2:
+        return 0.0
+
+    vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    similarities = vectors @ vectors.T
+    return float((similarities.sum() - len(vectors)) / (len(vectors) * (len(vectors) - 1)))
+
+def synthetic_queries(args, rng):
+    """Yield (query vector, candidate vectors, sources) from clustered random data."""
+    for _ in range(args.queries):
+        query = rng.standard_normal(args.dimension).astype(np.float32)
+        centers = query + rng.standard_normal((args.sources, args.dimension)).astype(np.float32) * 1.5
+        per_source = args.max_fetch_k // args.sources + 1
+        candidates = np.repeat(centers, per_source, axis=0)
+        candidates += rng.standard_normal(candidates.shape).astype(np.float32) * 0.3
+        sources = np.repeat(np.arange(args.sources), per_source)
+
+        # Candidates arrive ranked by similarity, like a vector search result
+        order = np.argsort(-(candidates @ query))
+        yield query, candidates[order], list(sources[order]), None
+
+def real_queries(args, rng):
+    """Yield (query vector, None, sources, documents) from a local vector store."""
+    from utils.document_loaders import DocumentLoader
+    from utils.preprocessor import DocumentPreprocessor
+    from utils.embeddings import EmbeddingGenerator
+    from utils.local_vector_store import LocalVectorStore
+
+    documents = DocumentLoader.load_from_directory(args.data_dir, workers=0)
+    chunks = DocumentPreprocessor.chunk_documents(documents, args.chunk_size, args.chunk_overlap)
+    print(f"{len(documents)} documents, {len(chunks)} chunks")
+
+    embeddings = EmbeddingGenerator.get_embeddings_model()
+    persist_dir = tempfile.mkdtemp()
+    store = LocalVectorStore(embeddings, persist_dir)
+    store.add_documents(chunks)
+
+    sampled = rng.choice(len(chunks), min(args.queries, len(chunks)), replace=False)
+    for i in sampled:
+        query = embeddings.embed_query(" ".join(chunks[i].page_content.split()[:16]))
+        docs = store.similarity_search_by_vector(query, k=args.max_fetch_k)
+        yield np.asarray(query, dtype=np.float32), store, [doc.metadata.get("source") for doc in docs], docs
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the latency and redundancy of MMR selection.")
+    parser.add_argument("--data-dir", type=str, default=None, help="Directory containing documents (synthetic data if omitted)")
+    parser.add_argument("--chunk-size", type=int, default=512, help="Size of each chunk in tokens")
+    parser.add_argument("--chunk-overlap", type=int, default=50, help="Number of tokens to overlap between chunks")
+    parser.add_argument("--queries", type=int, default=200, help="Number of queries")
+    parser.add_argument("--k", type=int, default=5, help="Number of selected chunks")
+    parser.add_argument("--fetch-k", type=str, default="20,50,100", help="Comma-separated numbers of candidates")
+    parser.add_argument("--lambdas", type=str, default="1.0,0.7,0.5,0.3", help="Comma-separated MMR lambdas")
+    parser.add_argument("--max-per-source", type=int, default=None, help="Per-source cap")
+    parser.add_argument("--sources", type=int, default=8, help="Number of sources (synthetic data)")
+    parser.add_argument("--dimension", type=int, default=384, help="Embedding dimension (synthetic data)")
+    args = parser.parse_args()
+
+    fetch_ks = [int(value) for value in args.fetch_k.split(",")]
+    lambdas = [float(value) for value in args.lambdas.split(",")]
+    args.max_fetch_k = max(fetch_ks)
+    rng = np.random.default_rng(0)
+
+    if args.data_dir:
+        from utils.vector_store import VectorStore
+        queries = list(real_queries(args, rng))
+    else:
+        queries = list(synthetic_queries(args, rng))
+
+    print(f"{'fetch_k':>7} {'lambda':>6} {'p50 ms':>8} {'p99 ms':>8} {'redundancy':>10} {'sources':>7}")
+    for fetch_k in fetch_ks:
+        for lambda_mult in lambdas:
+            timings, redundancies, distinct_sources = [], [], []
+
+            for query, candidates, sources, docs in queries:
+                sources = sources[:fetch_k]
+                start = time.perf_counter()
+
+                # With a real store, reading the candidate vectors back is part of the cost
+                if docs is not None:
+                    vectors = VectorStore.get_document_vectors(candidates, docs[:fetch_k])
+                else:
+                    vectors = candidates[:fetch_k]
+
+                selected = mmr_select(query, vectors, args.k, lambda_mult, sources, args.max_per_source)
+                timings.append(time.perf_counter() - start)
+
+                redundancies.append(redundancy(np.asarray(vectors)[selected]))
+                distinct_sources.append(len({sources[i] for i in selected}))
+
+            print(
+                f"{fetch_k:>7} {lambda_mult:>6.2f} {percentile_ms(timings, 50):>8.3f} {percentile_ms(timings, 99):>8.3f} "
+                f"{np.mean(redundancies):>10.3f} {np.mean(distinct_sources):>7.2f}"
+            )
+
+if __name__ == "__main__":
+    main()